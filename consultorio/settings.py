@@ -27,6 +27,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'turnos.middleware.PerfilMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,6 +72,30 @@ DATABASES = {
 #     }
 # }
 
+# Cache (memoria local por defecto; en producción conviene Redis o Memcached)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'consultorio',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+# Segundos que se guardan en cache los horarios disponibles de un médico por día
+CACHE_HORARIOS_TIMEOUT = config('CACHE_HORARIOS_TIMEOUT', default=300, cast=int)
+
+# Segundos que se guardan en cache los totales del tablero (médicos activos, pacientes)
+CACHE_TOTALES_TIMEOUT = config('CACHE_TOTALES_TIMEOUT', default=60, cast=int)
+
+# Segundos que se guardan las fichas de médicos renderizadas. Las claves incluyen la
+# fecha de modificación del médico, así que un cambio nunca muestra una ficha vieja
+CACHE_FICHAS_TIMEOUT = config('CACHE_FICHAS_TIMEOUT', default=3600, cast=int)
+
+# Segundos que un proceso usa su copia en memoria de los catálogos (médicos, coberturas)
+# antes de recargarla aunque la versión no haya cambiado. Acota lo que tarda en verse
+# un cambio hecho por otro proceso cuando el cache no es compartido (LocMemCache)
+CACHE_CATALOGO_TIMEOUT = config('CACHE_CATALOGO_TIMEOUT', default=60, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -104,6 +129,26 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Días hacia adelante que cubre la tabla de horarios materializados
+HORIZONTE_HORARIOS_DIAS = config('HORIZONTE_HORARIOS_DIAS', default=90, cast=int)
+
+# Minutos que un paciente retiene un horario mientras completa la reserva
+RESERVA_TEMPORAL_MINUTOS = config('RESERVA_TEMPORAL_MINUTOS', default=5, cast=int)
+
+# Horas que se espera después de un turno antes de que `manage.py cerrar_turnos` lo
+# pase a completado o ausente, para que la secretaría alcance a marcarlo a mano
+CIERRE_TURNOS_GRACIA_HORAS = config('CIERRE_TURNOS_GRACIA_HORAS', default=2, cast=int)
+
+# Notificaciones a pacientes (confirmaciones y recordatorios), enviadas por
+# `manage.py procesar_notificaciones`. El enviador es una ruta de importación a una
+# subclase de turnos.notificaciones.Enviador; EnviadorArchivo escribe en NOTIFICACIONES_ARCHIVO.
+NOTIFICACIONES_ENVIADOR = config('NOTIFICACIONES_ENVIADOR', default='turnos.notificaciones.EnviadorConsola')
+NOTIFICACIONES_ARCHIVO = config('NOTIFICACIONES_ARCHIVO', default=str(BASE_DIR / 'notificaciones.jsonl'))
+NOTIFICACIONES_RECORDATORIO_HORAS = config('NOTIFICACIONES_RECORDATORIO_HORAS', default=24, cast=int)
+NOTIFICACIONES_MAX_INTENTOS = config('NOTIFICACIONES_MAX_INTENTOS', default=5, cast=int)
+NOTIFICACIONES_ESPERA_SEGUNDOS = config('NOTIFICACIONES_ESPERA_SEGUNDOS', default=60, cast=int)
+NOTIFICACIONES_RESERVA_SEGUNDOS = config('NOTIFICACIONES_RESERVA_SEGUNDOS', default=300, cast=int)
+
 # Login/Logout URLs
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -1,5 +1,19 @@
 from django.contrib import admin
-from .models import Cobertura, Paciente, Medico, DisponibilidadMedico, Turno
+from .busqueda import buscar_texto
+from .models import Cobertura, Paciente, Medico, DisponibilidadMedico, ExcepcionDisponibilidad, Turno, CambioEstadoTurno, Notificacion
+
+class BusquedaIndexadaMixin:
+    """
+    Busca con el índice de texto de documento_busqueda (ver busqueda.py) en lugar de
+    icontains sobre campos de tablas unidas. `search_fields` solo hace aparecer la caja.
+    """
+    search_fields = ['documento_busqueda']
+    search_help_text = 'Nombre, DNI, afiliado, email o médico; sin importar acentos'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return buscar_texto(queryset, search_term), False
 
 @admin.register(Cobertura)
 class CoberturaAdmin(admin.ModelAdmin):
@@ -8,10 +22,10 @@ class CoberturaAdmin(admin.ModelAdmin):
     search_fields = ['nombre']
 
 @admin.register(Paciente)
-class PacienteAdmin(admin.ModelAdmin):
+class PacienteAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ['nombre_completo', 'dni', 'telefono', 'cobertura', 'categoria', 'fecha_registro']
     list_filter = ['cobertura', 'categoria', 'fecha_registro']
-    search_fields = ['user__first_name', 'user__last_name', 'dni', 'user__email']
+    list_select_related = ['user', 'cobertura']
     date_hierarchy = 'fecha_registro'
     
     def nombre_completo(self, obj):
@@ -40,15 +54,40 @@ class DisponibilidadMedicoAdmin(admin.ModelAdmin):
     list_filter = ['dia_semana', 'medico']
     search_fields = ['medico__nombre', 'medico__apellido']
 
+@admin.register(ExcepcionDisponibilidad)
+class ExcepcionDisponibilidadAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'fecha_desde', 'fecha_hasta', 'hora_desde', 'hora_hasta', 'motivo']
+    list_filter = ['medico']
+    search_fields = ['motivo', 'medico__nombre', 'medico__apellido']
+    date_hierarchy = 'fecha_desde'
+    list_select_related = ['medico']
+
 @admin.register(Turno)
-class TurnoAdmin(admin.ModelAdmin):
+class TurnoAdmin(BusquedaIndexadaMixin, admin.ModelAdmin):
     list_display = ['get_paciente', 'medico', 'fecha', 'hora', 'estado', 'fecha_creacion']
     list_filter = ['estado', 'fecha', 'medico']
-    search_fields = ['paciente__user__first_name', 'paciente__user__last_name', 'paciente_nombre', 'medico__nombre', 'medico__apellido']
+    list_select_related = ['paciente__user', 'medico']
     date_hierarchy = 'fecha'
     
     def get_paciente(self, obj):
         if obj.paciente:
             return obj.paciente.nombre_completo
         return obj.paciente_nombre
-    get_paciente.short_description = 'Paciente'
\ No newline at end of file
+    get_paciente.short_description = 'Paciente'
+
+@admin.register(CambioEstadoTurno)
+class CambioEstadoTurnoAdmin(admin.ModelAdmin):
+    list_display = ['turno', 'estado_anterior', 'estado_nuevo', 'origen', 'ejecucion', 'fecha']
+    list_filter = ['estado_nuevo', 'origen']
+    search_fields = ['ejecucion']
+    date_hierarchy = 'fecha'
+    raw_id_fields = ['turno']
+
+@admin.register(Notificacion)
+class NotificacionAdmin(admin.ModelAdmin):
+    list_display = ['destinatario', 'tipo', 'canal', 'estado', 'programada_para', 'intentos', 'enviada_en']
+    list_filter = ['estado', 'tipo', 'canal']
+    search_fields = ['destinatario', 'clave']
+    date_hierarchy = 'programada_para'
+    raw_id_fields = ['turno']
+    readonly_fields = ['clave', 'ultimo_error', 'tomada_por', 'tomada_hasta', 'enviada_en', 'fecha_creacion']
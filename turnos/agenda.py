@@ -0,0 +1,96 @@
+from collections import defaultdict
+from datetime import timedelta
+from .models import DisponibilidadMedico, Medico, Turno
+from .excepciones import horario_bloqueado, indices_excepciones
+
+# Estado de las celdas de la agenda que no corresponden a un turno
+LIBRE = 'libre'
+NO_ATIENDE = 'no-atiende'
+BLOQUEADO = 'bloqueado'
+
+def rango_agenda(fecha, vista='dia'):
+    """Días que muestra la agenda: solo `fecha`, o de lunes a domingo de su semana"""
+    if vista == 'semana':
+        lunes = fecha - timedelta(days=fecha.weekday())
+        return [lunes + timedelta(days=i) for i in range(7)]
+    return [fecha]
+
+def armar_agenda(dias):
+    """
+    Grilla médicos × horarios de los días pedidos para todos los médicos activos.
+    Usa una consulta de DisponibilidadMedico (con el médico por JOIN), una de Turno y
+    una de excepciones, y las combina en memoria. Devuelve una lista por día de
+    {'fecha', 'horas', 'filas'}, donde cada fila es (médico, celdas) y cada celda es
+    (estado, paciente, columnas): estado es el del turno, LIBRE, BLOQUEADO o NO_ATIENDE,
+    y las horas seguidas sin atención se agrupan en una celda que ocupa varias columnas.
+    """
+    desde, hasta = dias[0], dias[-1]
+
+    disponibilidades = DisponibilidadMedico.objects.filter(
+        medico__activo=True,
+        dia_semana__in={dia.weekday() for dia in dias}
+    ).select_related('medico')
+
+    medicos = {}
+    horarios = defaultdict(dict)  # (medico_id, dia_semana) -> {hora: duración}
+    for disp in disponibilidades:
+        medicos[disp.medico_id] = disp.medico
+        horarios[disp.medico_id, disp.dia_semana].update(
+            (hora, disp.duracion_turno) for hora in disp.generar_horarios()
+        )
+
+    turnos = Turno.objects.filter(
+        medico__activo=True,
+        fecha__range=(desde, hasta)
+    ).exclude(estado='cancelado').values_list(
+        'medico_id', 'medico__apellido', 'medico__nombre', 'medico__especialidad',
+        'fecha', 'hora', 'estado',
+        'paciente__user__last_name', 'paciente__user__first_name', 'paciente_nombre'
+    )
+
+    ocupados = defaultdict(dict)  # fecha -> {(medico_id, hora): celda}
+    for (medico_id, medico_apellido, medico_nombre, especialidad,
+         fecha, hora, estado, apellido, nombre, paciente_nombre) in turnos:
+        if medico_id not in medicos:
+            # Turno cargado fuera de la disponibilidad del médico en el rango
+            medicos[medico_id] = Medico(
+                pk=medico_id, apellido=medico_apellido, nombre=medico_nombre, especialidad=especialidad
+            )
+        paciente = f'{apellido}, {nombre}' if apellido else paciente_nombre
+        ocupados[fecha][medico_id, hora] = (estado, paciente)
+
+    excepciones = indices_excepciones(list(medicos), desde, hasta)
+    orden = sorted(medicos.values(), key=lambda medico: (medico.apellido, medico.nombre))
+    agenda = []
+    for fecha in dias:
+        turnos_dia = ocupados.get(fecha, {})
+        atiende = {medico.pk: horarios.get((medico.pk, fecha.weekday()), {}) for medico in orden}
+        con_turnos = {medico_id for medico_id, _ in turnos_dia}
+        horas = sorted(set().union(*atiende.values(), (hora for _, hora in turnos_dia)))
+
+        filas = []
+        for medico in orden:
+            if not atiende[medico.pk] and medico.pk not in con_turnos:
+                continue
+            celdas = []
+            for hora in horas:
+                celda = turnos_dia.get((medico.pk, hora))
+                if celda:
+                    celdas.append((*celda, 1))
+                    continue
+                if hora not in atiende[medico.pk]:
+                    estado = NO_ATIENDE
+                elif horario_bloqueado(excepciones[medico.pk], fecha, hora, atiende[medico.pk][hora]):
+                    estado = BLOQUEADO
+                else:
+                    celdas.append((LIBRE, '', 1))
+                    continue
+                if celdas and celdas[-1][0] == estado:
+                    # Las horas seguidas sin atención o bloqueadas van en una sola celda
+                    celdas[-1] = (estado, '', celdas[-1][2] + 1)
+                else:
+                    celdas.append((estado, '', 1))
+            filas.append((medico, celdas))
+
+        agenda.append({'fecha': fecha, 'horas': horas, 'filas': filas})
+    return agenda
@@ -0,0 +1,256 @@
+import hashlib
+from datetime import datetime
+from functools import wraps
+from django.db.models import Count, Max
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponseNotAllowed, JsonResponse
+from django.views.decorators.http import condition, require_GET
+from . import catalogo
+from .disponibilidad import horarios_disponibles_en_cache
+from .exportacion import filtrar_turnos
+from .forms import TurnoForm, TurnoSecretariaForm
+from .models import Turno
+from .paginacion import paginar_turnos
+from .permissions import cargar_turno, perfil_del_request, ROL_PACIENTE
+from .reservas import HorarioOcupadoError, horas_retenidas, liberar_horarios, reservar_turno
+
+# API JSON versionada (/api/v1/) para el kiosco de recepción y la app. Usa la misma
+# sesión que el sitio. Los listados aceptan `campos=a,b,c` para achicar la respuesta y
+# devuelven ETag, así que un cliente que consulta seguido recibe 304 si nada cambió.
+
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+# campo: (select_related que necesita, cómo se obtiene)
+CAMPOS_TURNO = {
+    'id': (None, lambda turno: turno.pk),
+    'fecha': (None, lambda turno: turno.fecha.isoformat()),
+    'hora': (None, lambda turno: turno.hora.strftime('%H:%M')),
+    'estado': (None, lambda turno: turno.estado),
+    'motivo': (None, lambda turno: turno.motivo),
+    'medico_id': (None, lambda turno: turno.medico_id),
+    'medico': ('medico', lambda turno: turno.medico.nombre_completo),
+    'especialidad': ('medico', lambda turno: turno.medico.especialidad),
+    'paciente_id': (None, lambda turno: turno.paciente_id),
+    'paciente': ('paciente__user', lambda turno: turno.paciente.nombre_completo if turno.paciente_id else turno.paciente_nombre),
+    'fecha_modificacion': (None, lambda turno: turno.fecha_modificacion.isoformat()),
+}
+# select_related de CAMPOS_TURNO: fecha de modificación que entra en el ETag cuando se
+# piden campos de esa relación, así un cambio de nombre del médico o del paciente lo cambia
+VERSIONES_RELACIONADAS = {
+    'medico': 'medico__fecha_modificacion',
+    'paciente__user': 'paciente__fecha_modificacion',
+}
+CAMPOS_MEDICO = {
+    'id': (None, lambda medico: medico.pk),
+    'nombre': (None, lambda medico: medico.nombre),
+    'apellido': (None, lambda medico: medico.apellido),
+    'nombre_completo': (None, lambda medico: medico.nombre_completo),
+    'especialidad': (None, lambda medico: medico.especialidad),
+    'coberturas': (None, lambda medico: [cobertura.pk for cobertura in medico.coberturas.all()]),
+    'fecha_modificacion': (None, lambda medico: medico.fecha_modificacion.isoformat()),
+}
+CAMPOS_COBERTURA = {
+    'id': (None, lambda cobertura: cobertura.pk),
+    'nombre': (None, lambda cobertura: cobertura.nombre),
+}
+
+def _error(mensaje, status, **extra):
+    return JsonResponse({'error': mensaje, **extra}, status=status)
+
+def _campos(request, disponibles):
+    """Campos pedidos en `campos`, o todos; ValueError si alguno no existe"""
+    pedidos = [campo.strip() for campo in request.GET.get('campos', '').split(',') if campo.strip()]
+    invalidos = [campo for campo in pedidos if campo not in disponibles]
+    if invalidos:
+        raise ValueError(f"Campos inválidos: {', '.join(invalidos)}")
+    return pedidos or list(disponibles)
+
+def _serializar(objeto, campos, disponibles):
+    return {campo: disponibles[campo][1](objeto) for campo in campos}
+
+def _etag(request, *partes):
+    """ETag de una colección: sus datos de versión más el usuario y los parámetros del pedido"""
+    perfil = perfil_del_request(request)
+    paciente_id = perfil.paciente.pk if perfil.paciente else None
+    texto = '|'.join(map(str, [perfil.rol, paciente_id, *partes, sorted(request.GET.lists())]))
+    return hashlib.md5(texto.encode(), usedforsecurity=False).hexdigest()
+
+def api_login_required(view_func):
+    """401 sin sesión y 403 para usuarios sin rol, en JSON en lugar de redirigir al login"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error('Autenticación requerida', 401)
+        if perfil_del_request(request).rol is None:
+            return _error('Usuario sin rol asignado', 403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
+def api_errores_json(view_func):
+    """Los 404 y PermissionDenied de los decoradores de carga (cargar_turno) como errores JSON"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view_func(request, *args, **kwargs)
+        except Http404:
+            return _error('No encontrado', 404)
+        except PermissionDenied as e:
+            return _error(str(e) or 'Permiso denegado', 403)
+    return wrapper
+
+# ============= TURNOS =============
+
+def _turnos_visibles(request):
+    """Turnos que puede ver el usuario (los suyos si es paciente), con los filtros del pedido"""
+    turnos = filtrar_turnos(
+        medico_id=request.GET.get('medico'),
+        fecha=request.GET.get('fecha'),
+        estado=request.GET.get('estado'),
+        desde=request.GET.get('desde'),
+        hasta=request.GET.get('hasta')
+    )
+    perfil = perfil_del_request(request)
+    if perfil.rol == ROL_PACIENTE:
+        turnos = turnos.filter(paciente=perfil.paciente)
+    return turnos
+
+def _etag_turnos(request):
+    """
+    Una consulta agregada: cambia si se crea, modifica o borra alguno de los turnos
+    filtrados, o si cambia el médico o el paciente de alguno cuando se piden sus campos
+    """
+    try:
+        campos = _campos(request, CAMPOS_TURNO)
+    except ValueError:
+        campos = []
+    relacionados = sorted({CAMPOS_TURNO[campo][0] for campo in campos} - {None})
+    agregado = _turnos_visibles(request).aggregate(
+        ultima=Max('fecha_modificacion'),
+        cantidad=Count('pk'),
+        **{f'version_{i}': Max(VERSIONES_RELACIONADAS[relacion]) for i, relacion in enumerate(relacionados)}
+    )
+    versiones = [agregado[f'version_{i}'] for i in range(len(relacionados))]
+    return _etag(request, agregado['ultima'], agregado['cantidad'], *versiones)
+
+@api_login_required
+def turnos_api(request):
+    """GET lista turnos paginados por cursor (`despues`/`antes`, `limite`); POST reserva uno"""
+    if request.method == 'GET':
+        return _listar_turnos(request)
+    if request.method == 'POST':
+        return _crear_turno(request)
+    return HttpResponseNotAllowed(['GET', 'POST'])
+
+@condition(etag_func=_etag_turnos)
+def _listar_turnos(request):
+    try:
+        campos = _campos(request, CAMPOS_TURNO)
+        limite = int(request.GET.get('limite', LIMITE_POR_DEFECTO))
+        if not 1 <= limite <= LIMITE_MAXIMO:
+            raise ValueError(f'El límite debe estar entre 1 y {LIMITE_MAXIMO}')
+    except ValueError as e:
+        return _error(str(e), 400)
+
+    relacionados = {CAMPOS_TURNO[campo][0] for campo in campos} - {None}
+    turnos, anterior, siguiente = paginar_turnos(
+        _turnos_visibles(request).select_related(*relacionados),
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=limite
+    )
+    return JsonResponse({
+        'resultados': [_serializar(turno, campos, CAMPOS_TURNO) for turno in turnos],
+        'anterior': anterior,
+        'siguiente': siguiente,
+    })
+
+def _crear_turno(request):
+    """
+    Reserva con las mismas validaciones que los formularios: TurnoForm para pacientes
+    (que además solo pueden elegir horarios libres) y TurnoSecretariaForm para la secretaría.
+    """
+    perfil = perfil_del_request(request)
+    if perfil.rol == ROL_PACIENTE:
+        form = TurnoForm(request.POST, paciente=perfil.paciente)
+    else:
+        datos = request.POST.copy()
+        datos.setdefault('estado', 'pendiente')
+        form = TurnoSecretariaForm(datos)
+    if not form.is_valid():
+        errores = {campo: [error['message'] for error in lista] for campo, lista in form.errors.get_json_data().items()}
+        return _error('Datos inválidos', 400, campos=errores)
+
+    turno = form.save(commit=False)
+    turno.creado_por = request.user
+    if datetime.combine(turno.fecha, turno.hora) <= datetime.now():
+        return _error('El horario ya pasó', 400)
+    if perfil.rol == ROL_PACIENTE:
+        turno.paciente = perfil.paciente
+        libres = horarios_disponibles_en_cache(turno.medico_id, turno.fecha)
+        retenidas = horas_retenidas(turno.medico_id, turno.fecha, excepto_usuario=request.user)
+        if turno.hora not in libres or turno.hora in retenidas:
+            return _error('Este horario ya está ocupado. Por favor elegí otro.', 409)
+
+    try:
+        reservar_turno(turno)
+    except HorarioOcupadoError as e:
+        return _error(str(e), 409)
+    liberar_horarios(request.user)
+    return JsonResponse(_serializar(turno, CAMPOS_TURNO, CAMPOS_TURNO), status=201)
+
+@api_login_required
+@api_errores_json
+@cargar_turno('medico', 'paciente__user')
+def cancelar_turno_api(request, turno):
+    """Cancela un turno; repetir el pedido sobre uno ya cancelado no es un error"""
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    if turno.estado != 'cancelado':
+        if turno.estado not in Turno.ESTADOS_ACTIVOS:
+            return _error(f'El turno ya está {turno.get_estado_display().lower()}', 409)
+        if perfil_del_request(request).rol == ROL_PACIENTE and not turno.puede_cancelar():
+            return _error('Los turnos se cancelan con al menos 24hs de anticipación', 400)
+        turno.estado = 'cancelado'
+        turno.save()
+    return JsonResponse(_serializar(turno, CAMPOS_TURNO, CAMPOS_TURNO))
+
+# ============= CATÁLOGOS =============
+# Salen del catálogo en memoria (catalogo.py): ni el listado ni el ETag consultan la base.
+
+def _medicos_pedidos(request):
+    cobertura_id = request.GET.get('cobertura')
+    medicos = catalogo.medicos(cobertura_id=int(cobertura_id) if cobertura_id and cobertura_id.isdigit() else None)
+    especialidad = request.GET.get('especialidad')
+    if especialidad:
+        medicos = [medico for medico in medicos if medico.especialidad.lower() == especialidad.lower()]
+    return medicos
+
+def _etag_medicos(request):
+    medicos = _medicos_pedidos(request)
+    return _etag(request, max((medico.fecha_modificacion for medico in medicos), default=None), len(medicos))
+
+def _etag_coberturas(request):
+    # Cobertura no tiene fecha de modificación: la versión es su propio contenido
+    return _etag(request, [(cobertura.pk, cobertura.nombre) for cobertura in catalogo.coberturas()])
+
+def _listar(request, objetos, disponibles):
+    try:
+        campos = _campos(request, disponibles)
+    except ValueError as e:
+        return _error(str(e), 400)
+    return JsonResponse({'resultados': [_serializar(objeto, campos, disponibles) for objeto in objetos]})
+
+@api_login_required
+@require_GET
+@condition(etag_func=_etag_medicos)
+def medicos_api(request):
+    """Médicos activos, filtrables por `especialidad` y `cobertura`"""
+    return _listar(request, _medicos_pedidos(request), CAMPOS_MEDICO)
+
+@api_login_required
+@require_GET
+@condition(etag_func=_etag_coberturas)
+def coberturas_api(request):
+    """Coberturas activas"""
+    return _listar(request, catalogo.coberturas(), CAMPOS_COBERTURA)
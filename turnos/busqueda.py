@@ -0,0 +1,177 @@
+import unicodedata
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from .models import Paciente, Turno
+
+# ============= AUTOCOMPLETAR PACIENTES =============
+# Con decenas de miles de pacientes no se puede listar a todos en un <select>: la
+# secretaría escribe el DNI, el apellido o el número de afiliado y se buscan los
+# primeros que empiezan así. El nombre se guarda normalizado en
+# Paciente.nombre_busqueda (ver signals.py) para que la búsqueda use un índice.
+
+RESULTADOS = 10
+RESULTADOS_MAXIMO = 20
+LARGO_MINIMO = 2
+
+def normalizar(texto):
+    """Minúsculas, sin acentos y con los espacios colapsados: 'Pérez  José' -> 'perez jose'"""
+    sin_acentos = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(sin_acentos.lower().split())
+
+def nombre_busqueda(user):
+    """Valor de Paciente.nombre_busqueda para un usuario: apellido y nombre normalizados"""
+    return normalizar(f'{user.last_name} {user.first_name}')[:200]
+
+def _prefijo(campo, termino):
+    """
+    Filtro "empieza con `termino`" escrito como rango: a diferencia de LIKE/ILIKE, una
+    comparación >= y < usa el índice común del campo en SQLite y en PostgreSQL.
+    """
+    return Q(**{f'{campo}__gte': termino, f'{campo}__lt': termino + '\uffff'})
+
+def buscar_pacientes(termino, limite=RESULTADOS):
+    """
+    Primeros `limite` pacientes cuyo apellido y nombre, DNI o número de afiliado empiezan
+    con `termino`, ordenados por apellido. Términos más cortos que LARGO_MINIMO no buscan.
+    """
+    termino = (termino or '').strip()
+    if len(termino) < LARGO_MINIMO:
+        return []
+    filtro = _prefijo('nombre_busqueda', normalizar(termino)) | _prefijo('numero_afiliado', termino)
+    if termino.isdigit():
+        filtro |= _prefijo('dni', termino)
+    pacientes = Paciente.objects.filter(filtro).select_related('user', 'cobertura')
+    return list(pacientes.order_by('nombre_busqueda', 'pk')[:limite])
+
+# ============= BÚSQUEDA DE TEXTO =============
+# Pacientes y turnos guardan un documento de búsqueda desnormalizado (nombre, DNI,
+# afiliado, médico...) normalizado con `normalizar`, así una búsqueda lee una sola
+# columna indexada en lugar de recorrer con icontains las tablas unidas. Las señales lo
+# recalculan al guardar (ver signals.py). El índice depende de la base: en SQLite una
+# tabla FTS5 `<tabla>_fts` que mantienen triggers (migración 0011), y en PostgreSQL un
+# índice GIN de trigramas (IndiceTrigramas en models.py). En SQLite cada palabra busca
+# por prefijo; en PostgreSQL, en cualquier parte del documento. Si una migración rehace
+# la tabla en SQLite se pierden los triggers: el check turnos.W001 lo avisa y
+# `manage.py indexar_busqueda` los vuelve a crear.
+
+# Triggers que mantienen `<tabla>_fts`, por sufijo del nombre; `{tabla}` es la tabla
+# indexada. La migración 0011 tiene una copia congelada que no debe seguir a esta.
+_BORRAR_FTS = (
+    "INSERT INTO {tabla}_fts({tabla}_fts, rowid, documento_busqueda) "
+    "VALUES ('delete', old.id, old.documento_busqueda);"
+)
+_INSERTAR_FTS = "INSERT INTO {tabla}_fts(rowid, documento_busqueda) VALUES (new.id, new.documento_busqueda);"
+TRIGGERS_FTS = {
+    'ai': f'AFTER INSERT ON {{tabla}} BEGIN {_INSERTAR_FTS} END',
+    'ad': f'AFTER DELETE ON {{tabla}} BEGIN {_BORRAR_FTS} END',
+    'au': f'AFTER UPDATE OF documento_busqueda ON {{tabla}} BEGIN {_BORRAR_FTS} {_INSERTAR_FTS} END',
+}
+
+def documento_paciente(paciente):
+    user = paciente.user
+    return normalizar(' '.join([
+        user.last_name, user.first_name, paciente.dni, paciente.numero_afiliado, user.email, paciente.telefono
+    ]))
+
+def documento_turno(turno):
+    if turno.paciente_id:
+        user = turno.paciente.user
+        paciente = f'{user.last_name} {user.first_name} {turno.paciente.dni}'
+    else:
+        paciente = f'{turno.paciente_nombre} {turno.paciente_telefono}'
+    medico = turno.medico
+    return normalizar(f'{paciente} {medico.apellido} {medico.nombre} {medico.especialidad}')
+
+def buscar_texto(queryset, texto):
+    """Filtra un queryset de pacientes o turnos a los que contienen todas las palabras de `texto`"""
+    terminos = normalizar(texto).split()
+    if not terminos:
+        return queryset.none()
+    if connections[queryset.db].vendor == 'sqlite':
+        tabla = f'{queryset.model._meta.db_table}_fts'
+        # Cada término entre comillas (sin operadores de FTS5) y con * para buscar por prefijo
+        consulta = ' '.join('"{}"*'.format(termino.replace('"', '""')) for termino in terminos)
+        return queryset.filter(pk__in=RawSQL(f'SELECT rowid FROM {tabla} WHERE {tabla} MATCH %s', [consulta]))
+    filtro = Q()
+    for termino in terminos:
+        filtro &= Q(documento_busqueda__contains=termino)
+    return queryset.filter(filtro)
+
+def _indexar(objetos, calcular, campos, lote):
+    cambiados = 0
+    pendientes = []
+    for objeto in objetos.iterator(chunk_size=lote):
+        valores = calcular(objeto)
+        if any(getattr(objeto, campo) != valor for campo, valor in zip(campos, valores)):
+            for campo, valor in zip(campos, valores):
+                setattr(objeto, campo, valor)
+            pendientes.append(objeto)
+        if len(pendientes) >= lote:
+            objetos.model.objects.bulk_update(pendientes, campos)
+            cambiados += len(pendientes)
+            pendientes = []
+    objetos.model.objects.bulk_update(pendientes, campos)
+    return cambiados + len(pendientes)
+
+def indexar_pacientes(pacientes, lote=2000):
+    """
+    Recalcula nombre y documento de búsqueda de los pacientes dados, en lotes, y guarda
+    solo los que cambiaron. Es lo que hay que llamar después de un bulk_create o update.
+    """
+    return _indexar(
+        pacientes.select_related('user'),
+        lambda paciente: (nombre_busqueda(paciente.user), documento_paciente(paciente)),
+        ['nombre_busqueda', 'documento_busqueda'],
+        lote
+    )
+
+def indexar_turnos(turnos, lote=2000):
+    """Como indexar_pacientes, para el documento de búsqueda de los turnos dados"""
+    return _indexar(
+        turnos.select_related('paciente__user', 'medico'),
+        lambda turno: (documento_turno(turno),),
+        ['documento_busqueda'],
+        lote
+    )
+
+def _tablas_fts():
+    return [modelo._meta.db_table for modelo in (Paciente, Turno)]
+
+def triggers_faltantes(connection=None):
+    """
+    Triggers de las tablas FTS5 que no están en la base. Solo mira las tablas cuyo
+    `<tabla>_fts` existe (en una base sin migrar no falta nada); en otras bases, ninguno.
+    """
+    connection = connection or connections['default']
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s", ['%_fts%'])
+        existentes = {nombre for nombre, in cursor.fetchall()}
+    return [
+        f'{tabla}_fts_{sufijo}'
+        for tabla in _tablas_fts() if f'{tabla}_fts' in existentes
+        for sufijo in TRIGGERS_FTS if f'{tabla}_fts_{sufijo}' not in existentes
+    ]
+
+def crear_triggers(connection=None):
+    """Vuelve a crear los triggers de TRIGGERS_FTS que falten"""
+    connection = connection or connections['default']
+    faltantes = set(triggers_faltantes(connection))
+    with connection.cursor() as cursor:
+        for tabla in _tablas_fts():
+            for sufijo, definicion in TRIGGERS_FTS.items():
+                if f'{tabla}_fts_{sufijo}' in faltantes:
+                    cursor.execute(f'CREATE TRIGGER {tabla}_fts_{sufijo} {definicion.format(tabla=tabla)}')
+    return sorted(faltantes)
+
+def reconstruir_indice():
+    """En SQLite vuelve a armar las tablas FTS5 desde documento_busqueda; en otras bases no hace falta"""
+    connection = connections['default']
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for modelo in (Paciente, Turno):
+            tabla = f'{modelo._meta.db_table}_fts'
+            cursor.execute(f"INSERT INTO {tabla}({tabla}) VALUES ('rebuild')")
@@ -0,0 +1,151 @@
+import copy
+import time
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.exceptions import ValidationError
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils.safestring import mark_safe
+from django.forms.models import ModelChoiceField, ModelChoiceIterator
+from .models import Cobertura, DisponibilidadMedico, Medico
+
+# ============= FICHAS DE MÉDICOS =============
+# Las fichas de gestionar_medicos y reservar_turno se cachean por médico con
+# {% cache %}, versionadas con medico.fecha_modificacion (ver signals.py). Estos
+# Prefetch traen lo que muestran con una consulta por relación, sin importar cuántos
+# médicos haya en la página.
+
+def prefetch_coberturas():
+    return Prefetch('coberturas', queryset=Cobertura.objects.only('id', 'nombre'))
+
+def prefetch_dias_atencion():
+    """Disponibilidades ordenadas por día, en la lista `medico.dias_atencion`"""
+    return Prefetch(
+        'disponibilidades',
+        queryset=DisponibilidadMedico.objects.order_by('dia_semana', 'hora_inicio'),
+        to_attr='dias_atencion'
+    )
+
+def cargar_fichas(medicos, fragmento, *prefetches):
+    """
+    Busca las fichas `fragmento` de los médicos en el cache con un solo get_many y las
+    deja en `medico.ficha`; los `prefetches` corren solo para los que no la tienen, así
+    con todas las fichas en cache el listado no consulta las relaciones. La plantilla
+    muestra `medico.ficha` si está y si no renderiza la ficha dentro de {% cache %}.
+    """
+    medicos = list(medicos)
+    claves = {
+        medico.pk: make_template_fragment_key(fragmento, [medico.pk, medico.fecha_modificacion.timestamp()])
+        for medico in medicos
+    }
+    fichas = cache.get_many(claves.values())
+    faltantes = []
+    for medico in medicos:
+        ficha = fichas.get(claves[medico.pk])
+        medico.ficha = mark_safe(ficha) if ficha is not None else None
+        if ficha is None:
+            faltantes.append(medico)
+    prefetch_related_objects(faltantes, *prefetches)
+    return medicos
+
+# ============= CATÁLOGOS EN MEMORIA =============
+# Coberturas y médicos cambian pocas veces por mes pero se leen en cada formulario.
+# Se guardan en memoria del proceso junto con una versión que vive en el cache de
+# Django; las señales la cambian al modificar médicos o coberturas y cada proceso
+# recarga el catálogo en el próximo uso. La versión es aleatoria y no un contador:
+# si el cache la pierde, la nueva nunca coincide con la de un catálogo viejo. Con un
+# cache por proceso (LocMemCache) la versión no se comparte entre workers ni comandos,
+# así que además cada copia se recarga pasados CACHE_CATALOGO_TIMEOUT segundos; las
+# reservas vuelven a validar el médico contra la base (ver TurnoForm.clean_medico).
+
+_catalogos = {}
+
+def _version(nombre):
+    clave = f'catalogo:version:{nombre}'
+    cache.add(clave, uuid.uuid4().hex, timeout=None)
+    return cache.get(clave)
+
+def invalidar_catalogo(nombre):
+    cache.set(f'catalogo:version:{nombre}', uuid.uuid4().hex, timeout=None)
+
+def _cargar_coberturas():
+    return list(Cobertura.objects.all())
+
+def _cargar_medicos():
+    return list(Medico.objects.prefetch_related(prefetch_coberturas()))
+
+CARGADORES = {
+    'coberturas': _cargar_coberturas,
+    'medicos': _cargar_medicos,
+}
+
+def catalogo(nombre):
+    """Lista cacheada en memoria del catálogo `nombre`; la recarga si cambió la versión o venció"""
+    version = _version(nombre)
+    ahora = time.monotonic()
+    guardado = _catalogos.get(nombre)
+    if guardado is None or guardado[0] != version or ahora - guardado[1] >= settings.CACHE_CATALOGO_TIMEOUT:
+        guardado = (version, ahora, CARGADORES[nombre]())
+        _catalogos[nombre] = guardado
+    return guardado[2]
+
+def coberturas(activas=True):
+    return [cobertura for cobertura in catalogo('coberturas') if cobertura.activa or not activas]
+
+def medicos(activos=True, cobertura_id=None):
+    """Médicos del catálogo, con sus coberturas ya cargadas en medico.coberturas.all"""
+    return [
+        medico for medico in catalogo('medicos')
+        if (medico.activo or not activos)
+        and (cobertura_id is None or any(c.pk == cobertura_id for c in medico.coberturas.all()))
+    ]
+
+# ============= CAMPOS DE FORMULARIO =============
+
+class _OpcionesCatalogo(ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for objeto in self.field.opciones():
+            yield self.choice(objeto)
+
+    def __len__(self):
+        return len(self.field.opciones()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.opciones())
+
+class CatalogoChoiceField(ModelChoiceField):
+    """
+    ModelChoiceField que arma las opciones y valida contra un catálogo en memoria, sin
+    consultar la base. `opciones` es una función que devuelve los objetos válidos; por
+    defecto, los activos del catálogo del modelo del queryset. Se puede usar en
+    Meta.field_classes de un ModelForm.
+    """
+    iterator = _OpcionesCatalogo
+
+    def __init__(self, queryset, *, opciones=None, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self.opciones = opciones or OPCIONES_POR_MODELO[queryset.model]
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        campo = self.to_field_name or 'pk'
+        if isinstance(value, self.queryset.model):
+            value = getattr(value, campo)
+        for objeto in self.opciones():
+            if str(getattr(objeto, campo)) == str(value):
+                # Copia: el objeto del catálogo se comparte entre requests
+                return copy.copy(objeto)
+        raise ValidationError(
+            self.error_messages['invalid_choice'],
+            code='invalid_choice',
+            params={'value': value},
+        )
+
+OPCIONES_POR_MODELO = {
+    Cobertura: coberturas,
+    Medico: medicos,
+}
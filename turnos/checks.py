@@ -0,0 +1,22 @@
+from django.core.checks import Tags, Warning, register
+from django.db import DatabaseError, connections
+
+
+@register(Tags.database)
+def verificar_triggers_busqueda(app_configs, databases=None, **kwargs):
+    """Avisa si faltan los triggers que mantienen el índice de texto en SQLite (ver busqueda.py)"""
+    if not databases or 'default' not in databases:
+        return []
+    from .busqueda import triggers_faltantes
+    try:
+        faltantes = triggers_faltantes(connections['default'])
+    except DatabaseError:
+        return []
+    if not faltantes:
+        return []
+    return [Warning(
+        f"Faltan triggers del índice de texto: {', '.join(faltantes)}. Las búsquedas no van a "
+        "encontrar los pacientes y turnos que se carguen o modifiquen desde ahora.",
+        hint='Correr `python manage.py indexar_busqueda`, que los vuelve a crear y reconstruye el índice.',
+        id='turnos.W001',
+    )]
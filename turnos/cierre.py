@@ -0,0 +1,89 @@
+import time
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .disponibilidad import invalidar_horarios
+from .models import CambioEstadoTurno, Turno
+
+# Estado final de los turnos vencidos según cómo quedaron: un turno confirmado se da
+# por atendido y uno que nunca se confirmó, por ausente
+TRANSICIONES = {
+    'confirmado': 'completado',
+    'pendiente': 'ausente',
+}
+ORIGEN = 'cierre_automatico'
+
+def filtro_vencidos(ahora=None, gracia=None):
+    """Turnos que empezaron hace más de `gracia` horas (CIERRE_TURNOS_GRACIA_HORAS)"""
+    ahora = ahora or timezone.now()
+    if gracia is None:
+        gracia = settings.CIERRE_TURNOS_GRACIA_HORAS
+    limite = timezone.localtime(ahora - timedelta(hours=gracia))
+    return Q(fecha__lt=limite.date()) | Q(fecha=limite.date(), hora__lt=limite.time())
+
+def _cerrar_lote(vencidos, estado_anterior, estado_nuevo, lote, ejecucion):
+    """
+    Pasa un lote de turnos de `estado_anterior` a `estado_nuevo` con un UPDATE por ids
+    y deja constancia en CambioEstadoTurno, todo en una transacción corta. En bases con
+    bloqueo por fila se saltean los turnos que una vista está modificando en ese
+    momento, y el UPDATE repite la condición de estado para no pisar un cambio manual;
+    por eso se vuelven a leer los que realmente cambiaron y solo esos se auditan.
+    Devuelve (filas movidas, cantidad de filas elegidas para el lote).
+    """
+    with transaction.atomic():
+        filas = list(
+            Turno.objects.filter(vencidos, estado=estado_anterior)
+            .select_for_update(skip_locked=True)
+            .order_by('fecha', 'hora', 'id')
+            .values_list('pk', 'medico_id', 'fecha')[:lote]
+        )
+        if not filas:
+            return [], 0
+        ids = [pk for pk, _, _ in filas]
+        momento = timezone.now()
+        Turno.objects.filter(pk__in=ids, estado=estado_anterior).update(
+            estado=estado_nuevo, fecha_modificacion=momento
+        )
+        movidas = list(
+            Turno.objects.filter(pk__in=ids, estado=estado_nuevo, fecha_modificacion=momento)
+            .order_by('fecha', 'hora', 'id')
+            .values_list('pk', 'medico_id', 'fecha')
+        )
+        CambioEstadoTurno.objects.bulk_create([
+            CambioEstadoTurno(
+                turno_id=pk, estado_anterior=estado_anterior, estado_nuevo=estado_nuevo,
+                origen=ORIGEN, ejecucion=ejecucion
+            )
+            for pk, _, _ in movidas
+        ])
+    return movidas, len(filas)
+
+def cerrar_turnos_vencidos(ahora=None, gracia=None, lote=500, pausa=0):
+    """
+    Lleva los turnos vencidos que siguen pendientes o confirmados a su estado final, en
+    lotes de `lote` turnos con `pausa` segundos entre uno y otro para no competir con el
+    tráfico. Como UPDATE no dispara señales, invalida a mano el cache de horarios de
+    los días tocados que todavía pueden estar cacheados. Devuelve (ejecucion, cantidad
+    de turnos movidos por estado final).
+    """
+    ahora = ahora or timezone.now()
+    vencidos = filtro_vencidos(ahora, gracia)
+    hoy = timezone.localtime(ahora).date()
+    ejecucion = uuid.uuid4().hex
+    movidos = {estado_nuevo: 0 for estado_nuevo in TRANSICIONES.values()}
+
+    for estado_anterior, estado_nuevo in TRANSICIONES.items():
+        while True:
+            filas, elegidas = _cerrar_lote(vencidos, estado_anterior, estado_nuevo, lote, ejecucion)
+            movidos[estado_nuevo] += len(filas)
+            for medico_id, fecha in {(medico_id, fecha) for _, medico_id, fecha in filas if fecha >= hoy}:
+                invalidar_horarios(medico_id, fecha)
+            # Un lote con turnos que cambiaron por otro lado igual puede tener más detrás
+            if elegidas < lote:
+                break
+            if pausa:
+                time.sleep(pausa)
+    return ejecucion, movidos
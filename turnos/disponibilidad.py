@@ -0,0 +1,240 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from .models import DisponibilidadMedico, Horario, Turno
+from .excepciones import horario_bloqueado, indices_excepciones
+
+# Días de la primera ventana de proximos_horarios; cada ventana siguiente duplica la anterior
+VENTANA_PROXIMOS_DIAS = 7
+
+def _fechas(desde, hasta):
+    return [desde + timedelta(days=dias) for dias in range((hasta - desde).days + 1)]
+
+def horarios_disponibles_en_rango(medico_ids, desde, hasta):
+    """
+    Calcula los horarios libres de varios médicos entre dos fechas, como
+    {(medico_id, fecha): horas ordenadas}. Lee los horarios materializados (o los
+    genera desde DisponibilidadMedico para los días sin materializar), descarta los que
+    caen en una excepción de disponibilidad y resta en memoria los turnos activos, con
+    una cantidad de consultas que no depende de cuántos médicos, días ni horarios haya.
+    """
+    fechas = _fechas(desde, hasta)
+    # (medico_id, fecha) -> hora -> duración del turno en minutos
+    horarios = {(medico_id, fecha): {} for medico_id in medico_ids for fecha in fechas}
+    materializados = Horario.objects.filter(
+        medico_id__in=medico_ids,
+        fecha__range=(desde, hasta)
+    ).values_list('medico_id', 'fecha', 'hora', 'disponibilidad__duracion_turno')
+    for medico_id, fecha, hora, duracion in materializados:
+        horarios[medico_id, fecha][hora] = duracion
+
+    sin_materializar = [clave for clave, horas in horarios.items() if not horas]
+    if sin_materializar:
+        # medico_id -> día de semana -> {hora: duración}
+        por_dia = defaultdict(lambda: defaultdict(dict))
+        disponibilidades = DisponibilidadMedico.objects.filter(
+            medico_id__in={medico_id for medico_id, _ in sin_materializar},
+            dia_semana__in={fecha.weekday() for _, fecha in sin_materializar}
+        )
+        for disp in disponibilidades:
+            por_dia[disp.medico_id][disp.dia_semana].update(
+                (hora, disp.duracion_turno) for hora in disp.generar_horarios()
+            )
+        for medico_id, fecha in sin_materializar:
+            horarios[medico_id, fecha].update(por_dia[medico_id][fecha.weekday()])
+
+    excepciones = indices_excepciones(medico_ids, desde, hasta)
+    ocupados = set(Turno.objects.filter(
+        medico_id__in=medico_ids,
+        fecha__range=(desde, hasta),
+        estado__in=Turno.ESTADOS_ACTIVOS
+    ).values_list('medico_id', 'fecha', 'hora'))
+
+    return {
+        (medico_id, fecha): sorted(
+            hora for hora, duracion in horas.items()
+            if (medico_id, fecha, hora) not in ocupados
+            and not horario_bloqueado(excepciones[medico_id], fecha, hora, duracion)
+        )
+        for (medico_id, fecha), horas in horarios.items()
+    }
+
+def horarios_disponibles(medico_id, fecha):
+    """Horarios libres de un médico para una fecha (ver horarios_disponibles_en_rango)"""
+    return horarios_disponibles_en_rango([medico_id], fecha, fecha)[medico_id, fecha]
+
+def proximos_horarios(medicos, desde, hasta, cantidad, excepto_usuario=None):
+    """
+    Devuelve los primeros `cantidad` horarios libres entre todos los médicos dados,
+    como tuplas (fecha, hora, medico_id) ordenadas cronológicamente, sin los retenidos
+    por otros usuarios. Sale del mismo cache que la consulta de un día
+    (horarios_disponibles_en_cache), leído en ventanas de días que se duplican hasta
+    juntar la cantidad: las consultas crecen con el logaritmo del rango, no con sus días.
+    """
+    # reservas importa este módulo
+    from .reservas import horarios_retenidos
+
+    medico_ids = [medico.pk for medico in medicos]
+    if not medico_ids:
+        return []
+    retenidos = horarios_retenidos(medico_ids, desde, hasta, excepto_usuario)
+    ahora = datetime.now()
+
+    encontrados = []
+    inicio, dias = desde, VENTANA_PROXIMOS_DIAS
+    while inicio <= hasta and len(encontrados) < cantidad:
+        fin = min(inicio + timedelta(days=dias - 1), hasta)
+        libres = horarios_disponibles_en_cache_en_rango(medico_ids, inicio, fin)
+        encontrados.extend(sorted(
+            (fecha, hora, medico_id)
+            for (medico_id, fecha), horas in libres.items()
+            for hora in horas
+            if (medico_id, fecha, hora) not in retenidos and datetime.combine(fecha, hora) > ahora
+        ))
+        inicio, dias = fin + timedelta(days=1), dias * 2
+    return encontrados[:cantidad]
+
+# ============= HORARIOS MATERIALIZADOS =============
+
+def horizonte_horarios(desde=None):
+    """Devuelve el rango de fechas (desde, hasta) que cubre la tabla de horarios"""
+    desde = desde or date.today()
+    return desde, desde + timedelta(days=settings.HORIZONTE_HORARIOS_DIAS - 1)
+
+def materializar_horarios(disponibilidades, desde, hasta):
+    """Crea las filas de Horario de las disponibilidades dadas entre dos fechas"""
+    total = 0
+    for disp in disponibilidades:
+        horas = disp.generar_horarios()
+        fecha = desde + timedelta(days=(disp.dia_semana - desde.weekday()) % 7)
+        nuevos = []
+        while fecha <= hasta:
+            nuevos.extend(
+                Horario(medico_id=disp.medico_id, disponibilidad=disp, fecha=fecha, hora=hora)
+                for hora in horas
+            )
+            fecha += timedelta(days=7)
+        Horario.objects.bulk_create(nuevos, batch_size=1000, ignore_conflicts=True)
+        total += len(nuevos)
+    return total
+
+def regenerar_horarios(medico_id, dia_semana):
+    """Regenera los horarios futuros de un médico solo para el día de semana afectado"""
+    desde, hasta = horizonte_horarios()
+    with transaction.atomic():
+        Horario.objects.filter(
+            medico_id=medico_id,
+            fecha__gte=desde,
+            fecha__iso_week_day=dia_semana + 1
+        ).delete()
+        disponibilidades = DisponibilidadMedico.objects.filter(medico_id=medico_id, dia_semana=dia_semana)
+        creados = materializar_horarios(disponibilidades, desde, hasta)
+    invalidar_horarios(medico_id)
+    return creados
+
+# ============= CACHE DE HORARIOS =============
+
+def _version_medico(medico_id):
+    """Versión de cache del médico; incrementarla invalida todos sus días a la vez"""
+    clave = f'horarios:version:{medico_id}'
+    cache.add(clave, 1, timeout=None)
+    return cache.get(clave, 1)
+
+def _contar(evento, cantidad=1):
+    if not cantidad:
+        return
+    clave = f'horarios:{evento}'
+    cache.add(clave, 0, timeout=None)
+    try:
+        cache.incr(clave, cantidad)
+    except ValueError:
+        # La clave pudo expulsarse entre add e incr; se pierden solo estas cuentas
+        pass
+
+def horarios_disponibles_en_cache(medico_id, fecha):
+    """Igual que horarios_disponibles, pero resuelto desde el cache cuando es posible"""
+    clave = f'horarios:{medico_id}:{fecha}'
+    version = _version_medico(medico_id)
+    horarios = cache.get(clave, version=version)
+    if horarios is not None:
+        _contar('aciertos')
+        return horarios
+
+    _contar('fallos')
+    horarios = horarios_disponibles(medico_id, fecha)
+    cache.set(clave, horarios, timeout=settings.CACHE_HORARIOS_TIMEOUT, version=version)
+    return horarios
+
+def horarios_disponibles_en_cache_en_rango(medico_ids, desde, hasta):
+    """
+    Igual que horarios_disponibles_en_rango, pero resuelto desde el cache cuando es
+    posible. Comparte las claves con horarios_disponibles_en_cache; las lee y las guarda
+    con get_many y set_many (una vez por versión de médico distinta) y calcula juntos
+    los días que faltan.
+    """
+    claves_version = {f'horarios:version:{medico_id}': medico_id for medico_id in medico_ids}
+    versiones = cache.get_many(claves_version)
+    for clave in claves_version.keys() - versiones.keys():
+        cache.add(clave, 1, timeout=None)
+        versiones[clave] = cache.get(clave, 1)
+
+    fechas = _fechas(desde, hasta)
+    por_version = defaultdict(dict)
+    for clave, medico_id in claves_version.items():
+        for fecha in fechas:
+            por_version[versiones[clave]][f'horarios:{medico_id}:{fecha}'] = (medico_id, fecha)
+
+    horarios = {}
+    for version, claves in por_version.items():
+        for clave, valor in cache.get_many(claves, version=version).items():
+            horarios[claves[clave]] = valor
+
+    faltantes = [(medico_id, fecha) for medico_id in medico_ids for fecha in fechas
+                 if (medico_id, fecha) not in horarios]
+    _contar('aciertos', len(horarios))
+    _contar('fallos', len(faltantes))
+    if faltantes:
+        calculados = horarios_disponibles_en_rango(
+            list({medico_id for medico_id, _ in faltantes}),
+            min(fecha for _, fecha in faltantes),
+            max(fecha for _, fecha in faltantes)
+        )
+        for version, claves in por_version.items():
+            nuevos = {clave: calculados[dia] for clave, dia in claves.items() if dia not in horarios}
+            if nuevos:
+                cache.set_many(nuevos, timeout=settings.CACHE_HORARIOS_TIMEOUT, version=version)
+        horarios.update((dia, calculados[dia]) for dia in faltantes)
+    return horarios
+
+def horarios_disponibles_en_cache_por_medico(medico_ids, fecha):
+    """horarios_disponibles_en_cache de varios médicos en una fecha, como {medico_id: horas}"""
+    horarios = horarios_disponibles_en_cache_en_rango(medico_ids, fecha, fecha)
+    return {medico_id: horarios[medico_id, fecha] for medico_id in medico_ids}
+
+def invalidar_horarios(medico_id, fecha=None):
+    """
+    Invalida los horarios cacheados de un médico: solo el día indicado si se pasa
+    `fecha` (cambios en un Turno), o todos sus días (cambios de disponibilidad).
+    """
+    if fecha is not None:
+        cache.delete(f'horarios:{medico_id}:{fecha}', version=_version_medico(medico_id))
+        return
+    clave = f'horarios:version:{medico_id}'
+    cache.add(clave, 1, timeout=None)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 2, timeout=None)
+
+def estadisticas_cache():
+    """Devuelve aciertos, fallos y tasa de aciertos del cache de horarios"""
+    aciertos = cache.get('horarios:aciertos', 0)
+    fallos = cache.get('horarios:fallos', 0)
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total, 4) if total else None,
+    }
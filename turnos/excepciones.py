@@ -0,0 +1,71 @@
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+from django.db.models import Q
+from .models import ExcepcionDisponibilidad
+
+class IndiceIntervalos:
+    """
+    Intervalos [inicio, fin) ordenados por inicio junto con el mayor fin acumulado,
+    para responder en O(log n) si un intervalo se superpone con alguno. Sirve para
+    cualquier valor comparable (datetime para excepciones, time para disponibilidades);
+    cada intervalo puede llevar un dato asociado como tercer elemento.
+    """
+    def __init__(self, intervalos=()):
+        self.intervalos = sorted(intervalos, key=lambda intervalo: (intervalo[0], intervalo[1]))
+        self.inicios = [intervalo[0] for intervalo in self.intervalos]
+        self.fines_maximos = list(accumulate((intervalo[1] for intervalo in self.intervalos), max))
+
+    def __bool__(self):
+        return bool(self.intervalos)
+
+    def __len__(self):
+        return len(self.intervalos)
+
+    def superpone(self, inicio, fin):
+        """Indica si [inicio, fin) se superpone con algún intervalo del índice"""
+        # Solo pueden superponerse los que empiezan antes de `fin`
+        i = bisect_left(self.inicios, fin)
+        return i > 0 and self.fines_maximos[i - 1] > inicio
+
+    def superpuestos(self, inicio, fin):
+        """Intervalos que se superponen con [inicio, fin), recorriendo solo los candidatos"""
+        encontrados = []
+        i = bisect_left(self.inicios, fin) - 1
+        # fines_maximos no decrece: al llegar a uno <= inicio, ninguno anterior termina después
+        while i >= 0 and self.fines_maximos[i] > inicio:
+            if self.intervalos[i][1] > inicio:
+                encontrados.append(self.intervalos[i])
+            i -= 1
+        return encontrados[::-1]
+
+def excepciones_en_rango(medico_ids, desde, hasta):
+    """Excepciones de los médicos dados y de toda la clínica que tocan el rango de fechas"""
+    return ExcepcionDisponibilidad.objects.filter(
+        Q(medico_id__in=medico_ids) | Q(medico__isnull=True),
+        fecha_desde__lte=hasta,
+        fecha_hasta__gte=desde
+    )
+
+def armar_indices(excepciones, medico_ids, desde, hasta):
+    """Índice de intervalos por médico; los feriados de toda la clínica van en el de cada uno"""
+    intervalos = {medico_id: [] for medico_id in medico_ids}
+    generales = []
+    for excepcion in excepciones:
+        destino = generales if excepcion.medico_id is None else intervalos[excepcion.medico_id]
+        destino.extend(excepcion.intervalos(desde, hasta))
+    return {medico_id: IndiceIntervalos(propios + generales) for medico_id, propios in intervalos.items()}
+
+def indices_excepciones(medico_ids, desde, hasta):
+    """Índice de excepciones por médico entre dos fechas, con una sola consulta"""
+    return armar_indices(excepciones_en_rango(medico_ids, desde, hasta), medico_ids, desde, hasta)
+
+def indice_excepciones(medico_id, desde, hasta):
+    return indices_excepciones([medico_id], desde, hasta)[medico_id]
+
+def horario_bloqueado(indice, fecha, hora, duracion):
+    """Indica si el turno de `duracion` minutos que empieza en fecha y hora cae en una excepción"""
+    if not indice:
+        return False
+    inicio = datetime.combine(fecha, hora)
+    return indice.superpone(inicio, inicio + timedelta(minutes=duracion))
@@ -0,0 +1,66 @@
+import csv
+from datetime import date
+from .models import Turno
+
+COLUMNAS = [
+    ('Fecha', 'fecha'),
+    ('Hora', 'hora'),
+    ('Estado', 'estado'),
+    ('Matrícula', 'medico__matricula'),
+    ('Médico apellido', 'medico__apellido'),
+    ('Médico nombre', 'medico__nombre'),
+    ('Especialidad', 'medico__especialidad'),
+    ('DNI', 'paciente__dni'),
+    ('Paciente apellido', 'paciente__user__last_name'),
+    ('Paciente nombre', 'paciente__user__first_name'),
+    ('Paciente sin registro', 'paciente_nombre'),
+    ('Cobertura', 'paciente__cobertura__nombre'),
+    ('Número de afiliado', 'paciente__numero_afiliado'),
+    ('Motivo', 'motivo'),
+]
+
+class _Eco:
+    """Objeto tipo archivo que devuelve lo escrito en lugar de guardarlo"""
+    def write(self, valor):
+        return valor
+
+def _fecha(valor):
+    """Convierte un parámetro AAAA-MM-DD en fecha; los valores inválidos se ignoran"""
+    if not valor or isinstance(valor, date):
+        return valor
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        return None
+
+def filtrar_turnos(medico_id=None, fecha=None, estado=None, desde=None, hasta=None):
+    """
+    Turnos a exportar, con los mismos filtros que el listado de la secretaría más un rango
+    de fechas. Los parámetros inválidos se descartan acá: la respuesta se genera de a poco
+    y un error en medio de la descarga dejaría el archivo cortado.
+    """
+    turnos = Turno.objects.all()
+    if medico_id and str(medico_id).isdigit():
+        turnos = turnos.filter(medico_id=medico_id)
+    if _fecha(fecha):
+        turnos = turnos.filter(fecha=_fecha(fecha))
+    if estado:
+        turnos = turnos.filter(estado=estado)
+    if _fecha(desde):
+        turnos = turnos.filter(fecha__gte=_fecha(desde))
+    if _fecha(hasta):
+        turnos = turnos.filter(fecha__lte=_fecha(hasta))
+    return turnos
+
+def filas_csv(turnos, chunk_size=2000):
+    """
+    Genera el CSV de los turnos línea por línea. Usa values_list sobre un JOIN para no
+    instanciar modelos y .iterator() para leer de a `chunk_size` filas, de modo que la
+    memoria es constante y la primera línea sale antes de terminar la consulta.
+    """
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow([titulo for titulo, _ in COLUMNAS])
+
+    filas = turnos.order_by('fecha', 'hora', 'pk').values_list(*[campo for _, campo in COLUMNAS])
+    for fila in filas.iterator(chunk_size=chunk_size):
+        yield escritor.writerow(['' if valor is None else valor for valor in fila])
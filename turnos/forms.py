@@ -1,7 +1,11 @@
+import codecs
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import Paciente, Medico, DisponibilidadMedico, Turno, Cobertura
+from django.utils.functional import cached_property
+from .models import Paciente, Medico, DisponibilidadMedico, ExcepcionDisponibilidad, Turno, Cobertura
+from .excepciones import IndiceIntervalos
+from .catalogo import CatalogoChoiceField, coberturas, medicos
 from datetime import date, datetime
 
 class RegistroPacienteForm(UserCreationForm):
@@ -29,7 +33,7 @@ class RegistroPacienteForm(UserCreationForm):
         'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
         'placeholder': 'Calle Falsa 123'
     }))
-    cobertura = forms.ModelChoiceField(
+    cobertura = CatalogoChoiceField(
         queryset=Cobertura.objects.filter(activa=True),
         widget=forms.Select(attrs={
             'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
@@ -98,6 +102,7 @@ class EditarPerfilForm(forms.ModelForm):
     class Meta:
         model = Paciente
         fields = ['telefono', 'domicilio', 'cobertura', 'numero_afiliado', 'categoria']
+        field_classes = {'cobertura': CatalogoChoiceField}
         widgets = {
             'telefono': forms.TextInput(attrs={
                 'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
@@ -118,6 +123,8 @@ class EditarPerfilForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Como antes, también se puede conservar una cobertura dada de baja
+        self.fields['cobertura'].opciones = lambda: coberturas(activas=False)
         if self.instance and self.instance.user:
             self.fields['email'].initial = self.instance.user.email
             self.fields['nombre'].initial = self.instance.user.first_name
@@ -173,11 +180,68 @@ class DisponibilidadForm(forms.ModelForm):
                 'step': 15
             })
         }
+    
+    def __init__(self, *args, **kwargs):
+        self.medico = kwargs.pop('medico', None)
+        super().__init__(*args, **kwargs)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        dia_semana = cleaned_data.get('dia_semana')
+        hora_inicio = cleaned_data.get('hora_inicio')
+        hora_fin = cleaned_data.get('hora_fin')
+        if hora_inicio is None or hora_fin is None or dia_semana is None:
+            return cleaned_data
+        
+        if hora_fin <= hora_inicio:
+            raise forms.ValidationError('La hora de fin debe ser posterior a la de inicio.')
+        
+        if self.medico:
+            # Solo las franjas del mismo médico y día, indexadas por horario
+            existentes = DisponibilidadMedico.objects.filter(
+                medico=self.medico, dia_semana=dia_semana
+            ).exclude(pk=self.instance.pk)
+            indice = IndiceIntervalos((disp.hora_inicio, disp.hora_fin, disp) for disp in existentes)
+            superpuestas = indice.superpuestos(hora_inicio, hora_fin)
+            if superpuestas:
+                disp = superpuestas[0][2]
+                raise forms.ValidationError(
+                    f'Se superpone con el horario de {disp.hora_inicio:%H:%M} a {disp.hora_fin:%H:%M} del mismo día.'
+                )
+        return cleaned_data
+
+class ExcepcionDisponibilidadForm(forms.ModelForm):
+    class Meta:
+        model = ExcepcionDisponibilidad
+        fields = ['fecha_desde', 'fecha_hasta', 'hora_desde', 'hora_hasta', 'motivo']
+        widgets = {
+            'fecha_desde': forms.DateInput(attrs={
+                'type': 'date',
+                'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
+            }),
+            'fecha_hasta': forms.DateInput(attrs={
+                'type': 'date',
+                'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
+            }),
+            'hora_desde': forms.TimeInput(attrs={
+                'type': 'time',
+                'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
+            }),
+            'hora_hasta': forms.TimeInput(attrs={
+                'type': 'time',
+                'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
+            }),
+            'motivo': forms.TextInput(attrs={
+                'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
+                'placeholder': 'Vacaciones, licencia, congreso...'
+            })
+        }
 
 class TurnoForm(forms.ModelForm):
     class Meta:
         model = Turno
         fields = ['medico', 'fecha', 'hora', 'motivo']
+        field_classes = {'medico': CatalogoChoiceField}
         widgets = {
             'medico': forms.Select(attrs={
                 'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
@@ -201,13 +265,20 @@ class TurnoForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Filtrar médicos que acepten la cobertura del paciente
-        if paciente and paciente.cobertura:
-            self.fields['medico'].queryset = Medico.objects.filter(
-                coberturas=paciente.cobertura,
-                activo=True
-            )
-        else:
-            self.fields['medico'].queryset = Medico.objects.filter(activo=True)
+        cobertura_id = paciente.cobertura_id if paciente else None
+        self.cobertura_id = cobertura_id
+        self.fields['medico'].opciones = lambda: medicos(cobertura_id=cobertura_id)
+
+    def clean_medico(self):
+        medico = self.cleaned_data['medico']
+        # El catálogo en memoria puede estar atrasado respecto de otro proceso: antes de
+        # reservar se confirma en la base que el médico sigue activo y con la cobertura
+        vigentes = Medico.objects.filter(pk=medico.pk, activo=True)
+        if self.cobertura_id:
+            vigentes = vigentes.filter(coberturas=self.cobertura_id)
+        if not vigentes.exists():
+            raise forms.ValidationError('El médico elegido ya no está disponible.')
+        return medico
 
 class TurnoSecretariaForm(forms.ModelForm):
     paciente_nombre = forms.CharField(
@@ -230,10 +301,10 @@ class TurnoSecretariaForm(forms.ModelForm):
     class Meta:
         model = Turno
         fields = ['paciente', 'paciente_nombre', 'paciente_telefono', 'medico', 'fecha', 'hora', 'motivo', 'observaciones', 'estado']
+        field_classes = {'medico': CatalogoChoiceField}
         widgets = {
-            'paciente': forms.Select(attrs={
-                'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
-            }),
+            # Se elige con el autocompletar (api/pacientes/): un <select> listaría a todos
+            'paciente': forms.HiddenInput,
             'medico': forms.Select(attrs={
                 'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
             }),
@@ -256,4 +327,52 @@ class TurnoSecretariaForm(forms.ModelForm):
             'estado': forms.Select(attrs={
                 'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
             })
-        }
\ No newline at end of file
+        }
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Validar el id elegido es un solo SELECT por pk; el queryset nunca se recorre
+        self.fields['paciente'].queryset = Paciente.objects.select_related('user')
+        # La secretaría puede dar turnos también con médicos inactivos
+        self.fields['medico'].opciones = lambda: medicos(activos=False)
+    
+    @cached_property
+    def paciente_elegido(self):
+        """Paciente cargado en el campo oculto, para mostrar su nombre al volver a dibujar el formulario"""
+        if 'paciente' in getattr(self, 'cleaned_data', {}):
+            return self.cleaned_data['paciente']
+        valor = self['paciente'].value()
+        if isinstance(valor, Paciente):
+            return valor
+        try:
+            return self.fields['paciente'].queryset.filter(pk=valor).first() if valor else None
+        except (TypeError, ValueError):
+            return None
+
+class ImportarCSVForm(forms.Form):
+    TIPOS = [
+        ('pacientes', 'Pacientes'),
+        ('turnos', 'Turnos'),
+    ]
+    
+    tipo = forms.ChoiceField(choices=TIPOS, widget=forms.Select(attrs={
+        'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent'
+    }))
+    archivo = forms.FileField(widget=forms.ClearableFileInput(attrs={
+        'class': 'w-full px-4 py-2 border border-gray-300 rounded-lg focus:ring-2 focus:ring-blue-500 focus:border-transparent',
+        'accept': '.csv'
+    }))
+
+    def clean_archivo(self):
+        archivo = self.cleaned_data['archivo']
+        # Se decodifica entero (de a bloques) antes de importar: un error a mitad del
+        # archivo dejaría los lotes anteriores guardados
+        decodificador = codecs.getincrementaldecoder('utf-8-sig')()
+        try:
+            for bloque in archivo.chunks():
+                decodificador.decode(bloque)
+            decodificador.decode(b'', final=True)
+        except UnicodeDecodeError:
+            raise forms.ValidationError('El archivo tiene que estar codificado en UTF-8.')
+        archivo.seek(0)
+        return archivo
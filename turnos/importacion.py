@@ -0,0 +1,278 @@
+import csv
+import io
+from datetime import datetime
+from itertools import islice
+from django.contrib.auth.models import User
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import DatabaseError, IntegrityError, transaction
+from .models import Cobertura, Medico, Paciente, Turno
+from .disponibilidad import invalidar_horarios
+from .busqueda import documento_paciente, indexar_turnos, nombre_busqueda
+from .tablero import invalidar_totales
+
+COLUMNAS_PACIENTES = ['dni', 'nombre', 'apellido', 'email', 'telefono', 'domicilio',
+                      'cobertura', 'numero_afiliado', 'categoria']
+COLUMNAS_TURNOS = ['matricula', 'fecha', 'hora', 'dni', 'paciente_nombre', 'paciente_telefono',
+                   'estado', 'motivo']
+
+# Columna: campo del modelo que la guarda, para validar el largo antes del bulk_create
+CAMPOS_PACIENTES = {
+    'nombre': User._meta.get_field('first_name'),
+    'apellido': User._meta.get_field('last_name'),
+    'email': User._meta.get_field('email'),
+    'telefono': Paciente._meta.get_field('telefono'),
+    'domicilio': Paciente._meta.get_field('domicilio'),
+    'numero_afiliado': Paciente._meta.get_field('numero_afiliado'),
+}
+CAMPOS_TURNOS = {
+    'paciente_nombre': Turno._meta.get_field('paciente_nombre'),
+    'paciente_telefono': Turno._meta.get_field('paciente_telefono'),
+}
+
+class ResultadoImportacion:
+    """Resumen de una importación: filas creadas y errores por número de línea"""
+    MAXIMO_ERRORES = 500
+
+    def __init__(self):
+        self.creados = 0
+        self.total_errores = 0
+        self.errores = []
+
+    def error(self, linea, mensaje):
+        self.total_errores += 1
+        # Se guardan solo los primeros para que la memoria no crezca con archivos malos
+        if len(self.errores) < self.MAXIMO_ERRORES:
+            self.errores.append((linea, mensaje))
+
+def leer_csv(archivo):
+    """Lee un archivo CSV binario o de texto fila por fila, como diccionarios"""
+    if not isinstance(archivo, io.TextIOBase):
+        archivo = io.TextIOWrapper(archivo, encoding='utf-8-sig', newline='')
+    return csv.DictReader(archivo)
+
+def _lotes(filas, tamanio):
+    """Agrupa las filas de a `tamanio`, numerándolas con su línea en el archivo"""
+    numeradas = enumerate(filas, start=2)
+    while True:
+        lote = list(islice(numeradas, tamanio))
+        if not lote:
+            return
+        yield lote
+
+def _limpiar(fila, columnas):
+    return {columna: (fila.get(columna) or '').strip() for columna in columnas}
+
+def _error_de_largo(datos, campos):
+    """Mensaje para la primera columna que no entra en su campo, o None"""
+    for columna, campo in campos.items():
+        if len(datos[columna]) > campo.max_length:
+            return f"'{columna}' supera los {campo.max_length} caracteres"
+    return None
+
+def _email_invalido(email):
+    try:
+        validate_email(email)
+    except ValidationError:
+        return True
+    return False
+
+# ============= PACIENTES =============
+
+def _dnis_existentes(dnis):
+    """DNI del lote que ya tienen paciente o usuario, con una consulta por tabla"""
+    existentes = set(Paciente.objects.filter(dni__in=dnis).values_list('dni', flat=True))
+    existentes |= set(User.objects.filter(username__in=dnis).values_list('username', flat=True))
+    return existentes
+
+def _guardar_pacientes(pacientes, resultado):
+    """
+    Inserta un lote de pacientes con sus usuarios; si falla (otro proceso registró el
+    mismo DNI o la base rechazó alguna fila) reintenta fila por fila para reportar solo
+    las que no entran.
+    """
+    try:
+        with transaction.atomic():
+            usuarios = [paciente.user for _, paciente in pacientes]
+            User.objects.bulk_create(usuarios)
+            ids = dict(User.objects.filter(
+                username__in=[usuario.username for usuario in usuarios]
+            ).values_list('username', 'pk'))
+            for usuario in usuarios:
+                usuario.pk = ids[usuario.username]
+            Paciente.objects.bulk_create([paciente for _, paciente in pacientes])
+        resultado.creados += len(pacientes)
+    except DatabaseError:
+        for linea, paciente in pacientes:
+            usuario = paciente.user
+            usuario.pk = paciente.pk = None
+            try:
+                with transaction.atomic():
+                    usuario.save(force_insert=True)
+                    paciente.user = usuario
+                    paciente.save(force_insert=True)
+                resultado.creados += 1
+            except IntegrityError:
+                resultado.error(linea, f'Ya existe un paciente con DNI {paciente.dni}')
+            except DatabaseError as e:
+                resultado.error(linea, f'La base rechazó la fila: {e}')
+
+def importar_pacientes(filas, lote=1000, resultado=None):
+    """
+    Importa pacientes (User + Paciente) desde filas de CSV en lotes, cada uno en su
+    propia transacción. Las coberturas se resuelven por nombre con un mapa en memoria y
+    los DNI ya existentes se buscan con una consulta por lote. Los usuarios se crean sin
+    contraseña usable; cada paciente la define después con la recuperación de clave.
+    Si se pasa `resultado` se completa ese, que conserva lo importado aunque la lectura
+    del archivo se corte a mitad de camino.
+    """
+    resultado = resultado if resultado is not None else ResultadoImportacion()
+    coberturas = {nombre.lower(): pk for pk, nombre in Cobertura.objects.values_list('pk', 'nombre')}
+    categorias = {clave for clave, _ in Paciente.CATEGORIAS}
+    sin_clave = make_password(None)
+
+    for filas_lote in _lotes(filas, lote):
+        validas = []
+        existentes = _dnis_existentes({_limpiar(fila, ['dni'])['dni'] for _, fila in filas_lote})
+
+        for linea, fila in filas_lote:
+            datos = _limpiar(fila, COLUMNAS_PACIENTES)
+            if not datos['dni'].isdigit() or len(datos['dni']) > 8:
+                resultado.error(linea, f"DNI inválido: '{datos['dni']}'")
+            elif datos['dni'] in existentes:
+                resultado.error(linea, f"Ya existe un paciente con DNI {datos['dni']}")
+            elif not datos['nombre'] or not datos['apellido']:
+                resultado.error(linea, 'Faltan nombre o apellido')
+            elif _error_de_largo(datos, CAMPOS_PACIENTES):
+                resultado.error(linea, _error_de_largo(datos, CAMPOS_PACIENTES))
+            elif datos['email'] and _email_invalido(datos['email']):
+                resultado.error(linea, f"Email inválido: '{datos['email']}'")
+            elif datos['cobertura'] and datos['cobertura'].lower() not in coberturas:
+                resultado.error(linea, f"Cobertura desconocida: '{datos['cobertura']}'")
+            elif datos['categoria'] and datos['categoria'] not in categorias:
+                resultado.error(linea, f"Categoría inválida: '{datos['categoria']}'")
+            else:
+                existentes.add(datos['dni'])
+                usuario = User(username=datos['dni'], first_name=datos['nombre'], last_name=datos['apellido'],
+                               email=datos['email'], password=sin_clave)
+                paciente = Paciente(
+                    user=usuario,
+                    dni=datos['dni'],
+                    telefono=datos['telefono'],
+                    domicilio=datos['domicilio'],
+                    cobertura_id=coberturas.get(datos['cobertura'].lower()),
+                    numero_afiliado=datos['numero_afiliado'],
+                    categoria=datos['categoria'] or 'A'
+                )
+                # bulk_create no dispara pre_save: los campos de búsqueda van a mano
+                paciente.nombre_busqueda = nombre_busqueda(usuario)
+                paciente.documento_busqueda = documento_paciente(paciente)
+                validas.append((linea, paciente))
+
+        if validas:
+            _guardar_pacientes(validas, resultado)
+
+    # bulk_create no dispara señales: se recalculan los totales del tablero a mano
+    if resultado.creados:
+        invalidar_totales()
+    return resultado
+
+# ============= TURNOS =============
+
+def _guardar_turnos(turnos, resultado):
+    """
+    Inserta un lote de turnos; si falla (otro proceso ocupó un horario o la base rechazó
+    alguna fila) reintenta fila por fila para reportar solo las que no entran.
+    """
+    try:
+        with transaction.atomic():
+            Turno.objects.bulk_create([turno for _, turno in turnos])
+        resultado.creados += len(turnos)
+    except DatabaseError:
+        for linea, turno in turnos:
+            turno.pk = None
+            try:
+                with transaction.atomic():
+                    turno.save(force_insert=True)
+                resultado.creados += 1
+            except IntegrityError:
+                resultado.error(linea, 'El horario ya está ocupado')
+            except DatabaseError as e:
+                resultado.error(linea, f'La base rechazó la fila: {e}')
+
+def importar_turnos(filas, creado_por=None, lote=1000, resultado=None):
+    """
+    Importa turnos desde filas de CSV en lotes. Los médicos se resuelven por matrícula
+    con un mapa en memoria; los pacientes por DNI y los horarios ya ocupados con una
+    consulta por lote cada uno, así la memoria no depende del tamaño del archivo.
+    `resultado` funciona como en importar_pacientes.
+    """
+    resultado = resultado if resultado is not None else ResultadoImportacion()
+    medicos = dict(Medico.objects.values_list('matricula', 'pk'))
+    estados = {clave for clave, _ in Turno.ESTADOS}
+
+    for filas_lote in _lotes(filas, lote):
+        filas_lote = [(linea, _limpiar(fila, COLUMNAS_TURNOS)) for linea, fila in filas_lote]
+        pacientes = dict(Paciente.objects.filter(
+            dni__in={datos['dni'] for _, datos in filas_lote if datos['dni']}
+        ).values_list('dni', 'pk'))
+
+        candidatos = []
+        for linea, datos in filas_lote:
+            try:
+                fecha = datetime.strptime(datos['fecha'], '%Y-%m-%d').date()
+                hora = datetime.strptime(datos['hora'], '%H:%M').time()
+            except ValueError:
+                resultado.error(linea, 'Fecha u hora inválida (formato AAAA-MM-DD y HH:MM)')
+                continue
+            estado = datos['estado'] or 'pendiente'
+            if datos['matricula'] not in medicos:
+                resultado.error(linea, f"Médico desconocido: matrícula '{datos['matricula']}'")
+            elif datos['dni'] and datos['dni'] not in pacientes:
+                resultado.error(linea, f"Paciente desconocido: DNI '{datos['dni']}'")
+            elif not datos['dni'] and not datos['paciente_nombre']:
+                resultado.error(linea, 'Falta DNI o nombre del paciente')
+            elif _error_de_largo(datos, CAMPOS_TURNOS):
+                resultado.error(linea, _error_de_largo(datos, CAMPOS_TURNOS))
+            elif estado not in estados:
+                resultado.error(linea, f"Estado inválido: '{estado}'")
+            else:
+                candidatos.append((linea, Turno(
+                    medico_id=medicos[datos['matricula']],
+                    paciente_id=pacientes.get(datos['dni']),
+                    paciente_nombre=datos['paciente_nombre'],
+                    paciente_telefono=datos['paciente_telefono'],
+                    fecha=fecha,
+                    hora=hora,
+                    estado=estado,
+                    motivo=datos['motivo'],
+                    creado_por=creado_por
+                )))
+
+        # Horarios ya ocupados en la base o repetidos dentro del mismo lote
+        activos = [turno for _, turno in candidatos if turno.estado in Turno.ESTADOS_ACTIVOS]
+        ocupados = set(Turno.objects.filter(
+            medico_id__in={turno.medico_id for turno in activos},
+            fecha__in={turno.fecha for turno in activos},
+            estado__in=Turno.ESTADOS_ACTIVOS
+        ).values_list('medico_id', 'fecha', 'hora')) if activos else set()
+
+        turnos = []
+        for linea, turno in candidatos:
+            if turno.estado in Turno.ESTADOS_ACTIVOS:
+                clave = (turno.medico_id, turno.fecha, turno.hora)
+                if clave in ocupados:
+                    resultado.error(linea, 'El horario ya está ocupado')
+                    continue
+                ocupados.add(clave)
+            turnos.append((linea, turno))
+
+        if turnos:
+            _guardar_turnos(turnos, resultado)
+            # bulk_create no dispara señales: se invalida el cache y se indexan a mano
+            for medico_id, fecha in {(turno.medico_id, turno.fecha) for _, turno in turnos}:
+                invalidar_horarios(medico_id, fecha)
+            indexar_turnos(Turno.objects.filter(pk__in=[turno.pk for _, turno in turnos if turno.pk]))
+
+    return resultado
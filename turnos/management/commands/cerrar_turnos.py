@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from turnos.cierre import TRANSICIONES, cerrar_turnos_vencidos, filtro_vencidos
+from turnos.models import Turno
+
+
+class Command(BaseCommand):
+    help = (
+        'Pasa los turnos vencidos a su estado final (confirmados a completado, pendientes '
+        'a ausente) en lotes, dejando registro de cada cambio'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Turnos por lote (default: 500)')
+        parser.add_argument('--gracia', type=float,
+                            help='Horas después del turno antes de cerrarlo (default: CIERRE_TURNOS_GRACIA_HORAS)')
+        parser.add_argument('--pausa', type=float, default=0.05,
+                            help='Segundos de espera entre lotes (default: 0.05)')
+        parser.add_argument('--simular', action='store_true', help='Solo contar los turnos que se cerrarían')
+
+    def handle(self, *args, **options):
+        if options['simular']:
+            vencidos = Turno.objects.filter(filtro_vencidos(gracia=options['gracia']))
+            for estado_anterior, estado_nuevo in TRANSICIONES.items():
+                cantidad = vencidos.filter(estado=estado_anterior).count()
+                self.stdout.write(f'{cantidad} turno(s) {estado_anterior}(s) pasarían a {estado_nuevo}')
+            return
+
+        ejecucion, movidos = cerrar_turnos_vencidos(
+            gracia=options['gracia'], lote=options['lote'], pausa=options['pausa']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Turnos cerrados: {movidos['completado']} completado(s), {movidos['ausente']} ausente(s) "
+            f"(ejecución {ejecucion})."
+        ))
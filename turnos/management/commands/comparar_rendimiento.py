@@ -0,0 +1,47 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Compara dos reportes de rendimiento de vistas generados por los tests (REPORTE_RENDIMIENTO)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('base', help='Reporte JSON de referencia (por ejemplo, del commit anterior)')
+        parser.add_argument('nuevo', help='Reporte JSON a comparar')
+        parser.add_argument(
+            '--tolerancia', type=float, default=25.0,
+            help='Porcentaje de aumento del tiempo mediano que se considera regresión (default: 25)'
+        )
+
+    def handle(self, *args, **options):
+        base = self.cargar(options['base'])
+        nuevo = self.cargar(options['nuevo'])
+
+        regresiones = []
+        for nombre in sorted(set(base) | set(nuevo)):
+            if nombre not in base or nombre not in nuevo:
+                self.stdout.write(f'{nombre:32} solo en {"nuevo" if nombre in nuevo else "base"}')
+                continue
+
+            antes, despues = base[nombre], nuevo[nombre]
+            variacion = (despues['ms_mediana'] - antes['ms_mediana']) / antes['ms_mediana'] * 100 if antes['ms_mediana'] else 0
+            linea = (
+                f"{nombre:32} consultas {antes['consultas']:>3} -> {despues['consultas']:<3} "
+                f"ms {antes['ms_mediana']:>8.2f} -> {despues['ms_mediana']:<8.2f} ({variacion:+.0f}%)"
+            )
+            if despues['consultas'] > antes['consultas'] or variacion > options['tolerancia']:
+                regresiones.append(nombre)
+                self.stdout.write(self.style.ERROR(linea))
+            else:
+                self.stdout.write(linea)
+
+        if regresiones:
+            raise CommandError(f'Regresiones en: {", ".join(regresiones)}')
+        self.stdout.write(self.style.SUCCESS('Sin regresiones.'))
+
+    def cargar(self, ruta):
+        try:
+            with open(ruta) as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'No se pudo leer {ruta}: {e}')
@@ -0,0 +1,110 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from statistics import median
+from time import perf_counter
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+from turnos.disponibilidad import horarios_disponibles_en_cache
+from turnos.models import DisponibilidadMedico, Paciente
+
+
+class Command(BaseCommand):
+    help = (
+        'Compara consultas por segundo de horarios por el camino WSGI (vista sincrónica) y '
+        'el ASGI (vista asíncrona), con un pedido por médico en los dos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=300, help='Consultas por camino (default: 300)')
+        parser.add_argument('--concurrencia', type=int, default=8,
+                            help='Hilos WSGI y pedidos ASGI simultáneos (default: 8)')
+        parser.add_argument('--medicos', type=int, default=3, help='Médicos por consulta (default: 3)')
+        parser.add_argument('--cache-caliente', action='store_true',
+                            help='Precalcular en el cache los horarios de todas las consultas antes de cada '
+                                 'camino (por defecto se vacía el cache)')
+        parser.add_argument('--semilla', type=int, default=None)
+
+    def handle(self, *args, **options):
+        paciente = Paciente.objects.select_related('user').first()
+        medicos = list(DisponibilidadMedico.objects.values_list('medico_id', flat=True).distinct()[:200])
+        if paciente is None or not medicos:
+            raise CommandError('No hay pacientes o médicos con disponibilidad; correr antes seed_clinic.')
+
+        azar = random.Random(options['semilla'])
+        hoy = date.today()
+        consultas = [
+            (azar.sample(medicos, min(options['medicos'], len(medicos))),
+             (hoy + timedelta(days=azar.randrange(14))).isoformat())
+            for _ in range(options['pedidos'])
+        ]
+
+        resultados = {}
+        for nombre, medir in [('WSGI', self.medir_wsgi), ('ASGI', self.medir_asgi)]:
+            # Los dos caminos arrancan con el mismo cache: vacío o con todas las consultas
+            cache.clear()
+            if options['cache_caliente']:
+                for medico_ids, fecha in consultas:
+                    for medico_id in medico_ids:
+                        horarios_disponibles_en_cache(medico_id, date.fromisoformat(fecha))
+            # Los clientes de prueba de Django piden con Host: testserver
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                total, tiempos = medir(paciente.user, consultas, options['concurrencia'])
+            resultados[nombre] = len(consultas) / total
+            self.stdout.write(
+                f'{nombre}: {resultados[nombre]:.1f} consultas/s, '
+                f'mediana {median(tiempos):.1f} ms por consulta de {options["medicos"]} médico(s)'
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'ASGI/WSGI: {resultados["ASGI"] / resultados["WSGI"]:.2f}x'))
+
+    def medir_wsgi(self, usuario, consultas, concurrencia):
+        """Un hilo por worker; cada consulta pide los médicos de a uno, como hoy el navegador"""
+        url = reverse('obtener_horarios')
+        locales = threading.local()
+
+        def consultar(consulta):
+            if not hasattr(locales, 'cliente'):
+                locales.cliente = Client()
+                locales.cliente.force_login(usuario)
+            medico_ids, fecha = consulta
+            inicio = perf_counter()
+            for medico_id in medico_ids:
+                response = locales.cliente.get(url, {'medico_id': medico_id, 'fecha': fecha})
+                if response.status_code != 200:
+                    raise CommandError(f'WSGI respondió {response.status_code}')
+            return (perf_counter() - inicio) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            inicio = perf_counter()
+            tiempos = list(pool.map(consultar, consultas))
+            return perf_counter() - inicio, tiempos
+
+    def medir_asgi(self, usuario, consultas, concurrencia):
+        """Un solo event loop con `concurrencia` consultas en curso; cada una pide los médicos de a uno"""
+        url = reverse('obtener_horarios_async')
+        cliente = AsyncClient()
+        cliente.force_login(usuario)
+
+        async def consultar(limite, consulta):
+            medico_ids, fecha = consulta
+            async with limite:
+                inicio = perf_counter()
+                for medico_id in medico_ids:
+                    response = await cliente.get(url, {'medico_id': medico_id, 'fecha': fecha})
+                    if response.status_code != 200:
+                        raise CommandError(f'ASGI respondió {response.status_code}')
+                return (perf_counter() - inicio) * 1000
+
+        async def todas():
+            limite = asyncio.Semaphore(concurrencia)
+            return await asyncio.gather(*(consultar(limite, consulta) for consulta in consultas))
+
+        inicio = perf_counter()
+        tiempos = asyncio.run(todas())
+        return perf_counter() - inicio, tiempos
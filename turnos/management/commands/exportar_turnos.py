@@ -0,0 +1,34 @@
+from datetime import date
+from django.core.management.base import BaseCommand
+from turnos.exportacion import filtrar_turnos, filas_csv
+
+
+class Command(BaseCommand):
+    help = 'Exporta turnos a CSV leyendo por bloques, con memoria constante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medico', type=int, help='ID del médico')
+        parser.add_argument('--fecha', type=date.fromisoformat, help='Fecha exacta (AAAA-MM-DD)')
+        parser.add_argument('--estado', help='Estado del turno')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial inclusive (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final inclusive (AAAA-MM-DD)')
+        parser.add_argument('--salida', help='Archivo de salida (por defecto, la salida estándar)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Filas leídas por bloque (default: 2000)')
+
+    def handle(self, *args, **options):
+        turnos = filtrar_turnos(
+            medico_id=options['medico'],
+            fecha=options['fecha'],
+            estado=options['estado'],
+            desde=options['desde'],
+            hasta=options['hasta']
+        )
+
+        if not options['salida']:
+            for linea in filas_csv(turnos, chunk_size=options['chunk_size']):
+                self.stdout.write(linea, ending='')
+            return
+
+        with open(options['salida'], 'w', encoding='utf-8', newline='') as salida:
+            salida.writelines(filas_csv(turnos, chunk_size=options['chunk_size']))
+        self.stderr.write(f"Turnos exportados a {options['salida']}")
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from turnos.disponibilidad import horizonte_horarios, materializar_horarios
+from turnos.models import DisponibilidadMedico, Horario
+
+
+class Command(BaseCommand):
+    help = 'Genera la tabla de horarios materializados a partir de las disponibilidades de los médicos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--medico', type=int, help='Regenerar solo los horarios de este médico')
+
+    def handle(self, *args, **options):
+        desde, hasta = horizonte_horarios()
+        disponibilidades = DisponibilidadMedico.objects.all()
+        horarios = Horario.objects.all()
+        if options['medico']:
+            disponibilidades = disponibilidades.filter(medico_id=options['medico'])
+            horarios = horarios.filter(medico_id=options['medico'])
+
+        with transaction.atomic():
+            # Se reemplaza la ventana completa, descartando también los horarios ya pasados
+            borrados, _ = horarios.delete()
+            creados = materializar_horarios(disponibilidades, desde, hasta)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Horarios generados del {desde} al {hasta}: {creados} creados, {borrados} reemplazados.'
+        ))
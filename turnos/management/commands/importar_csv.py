@@ -0,0 +1,60 @@
+import codecs
+import csv
+from django.core.management.base import BaseCommand, CommandError
+from turnos.importacion import ResultadoImportacion, importar_pacientes, importar_turnos, leer_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa pacientes o turnos desde un archivo CSV, en lotes y sin cargarlo entero en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=['pacientes', 'turnos'])
+        parser.add_argument('archivo', help='Ruta del archivo CSV (UTF-8, con encabezado)')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción (default: 1000)')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        try:
+            self.verificar_codificacion(ruta)
+            archivo = open(ruta, encoding='utf-8-sig', newline='')
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir {ruta}: {e}')
+
+        resultado = ResultadoImportacion()
+        importar = importar_pacientes if options['tipo'] == 'pacientes' else importar_turnos
+        with archivo:
+            filas = leer_csv(archivo)
+            try:
+                importar(filas, lote=options['lote'], resultado=resultado)
+            except (UnicodeDecodeError, csv.Error) as e:
+                self.informar_errores(resultado)
+                raise CommandError(
+                    f'Se cortó la lectura después de la línea {filas.line_num}: {e}. '
+                    f'Quedaron importados {resultado.creados} {options["tipo"]} de los lotes anteriores.'
+                )
+
+        self.informar_errores(resultado)
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado.creados} {options["tipo"]} importados, {resultado.total_errores} filas con errores.'
+        ))
+
+    def verificar_codificacion(self, ruta):
+        """
+        Decodifica el archivo entero (de a una línea) antes de importar, como
+        ImportarCSVForm: un error a mitad del archivo dejaría los lotes anteriores guardados.
+        """
+        decodificador = codecs.getincrementaldecoder('utf-8-sig')()
+        with open(ruta, 'rb') as archivo:
+            linea = 0
+            try:
+                for linea, renglon in enumerate(archivo, start=1):
+                    decodificador.decode(renglon)
+                decodificador.decode(b'', final=True)
+            except UnicodeDecodeError:
+                raise CommandError(f'{ruta} no está codificado en UTF-8 (línea {linea}); no se importó nada.')
+
+    def informar_errores(self, resultado):
+        for linea, mensaje in resultado.errores:
+            self.stderr.write(f'Línea {linea}: {mensaje}')
+        if resultado.total_errores > len(resultado.errores):
+            self.stderr.write(f'... y {resultado.total_errores - len(resultado.errores)} errores más')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from turnos.busqueda import crear_triggers, indexar_pacientes, indexar_turnos, reconstruir_indice
+from turnos.models import Paciente, Turno
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula el documento de búsqueda de pacientes y turnos (solo guarda los que '
+        'cambiaron) y reconstruye el índice de texto, volviendo a crear sus triggers si '
+        'faltan. Para después de cargas con update o SQL'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por lote (default: 2000)')
+
+    def handle(self, *args, **options):
+        recreados = crear_triggers()
+        if recreados:
+            self.stdout.write(self.style.WARNING(
+                f"Faltaban triggers del índice de texto, se volvieron a crear: {', '.join(recreados)}"
+            ))
+        pacientes = indexar_pacientes(Paciente.objects.all(), lote=options['lote'])
+        turnos = indexar_turnos(Turno.objects.all(), lote=options['lote'])
+        reconstruir_indice()
+        self.stdout.write(self.style.SUCCESS(
+            f'Documentos actualizados: {pacientes} paciente(s), {turnos} turno(s).'
+        ))
@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand
+from turnos.notificaciones import obtener_enviador, procesar_notificaciones, programar_recordatorios
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker de notificaciones: programa los recordatorios de turnos próximos y envía '
+        'las confirmaciones y recordatorios pendientes en lotes, con reintentos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Notificaciones por lote (default: 500)')
+        parser.add_argument('--intervalo', type=float, default=10,
+                            help='Segundos de espera cuando no queda nada por enviar (default: 10)')
+        parser.add_argument('--una-vez', action='store_true', help='Vaciar la cola una vez y salir')
+        parser.add_argument('--enviador', help='Ruta del enviador (por defecto, NOTIFICACIONES_ENVIADOR)')
+
+    def handle(self, *args, **options):
+        enviador = obtener_enviador(options['enviador'])
+        while True:
+            programados = programar_recordatorios()
+            totales = {'enviadas': 0, 'reintentos': 0, 'fallidas': 0, 'canceladas': 0}
+            while True:
+                resultado = procesar_notificaciones(enviador, lote=options['lote'])
+                for clave, cantidad in resultado.items():
+                    totales[clave] += cantidad
+                if sum(resultado.values()) < options['lote']:
+                    break
+
+            if programados or any(totales.values()):
+                self.stdout.write(
+                    f"{programados} recordatorio(s) programado(s); {totales['enviadas']} enviada(s), "
+                    f"{totales['reintentos']} a reintentar, {totales['fallidas']} fallida(s), "
+                    f"{totales['canceladas']} cancelada(s)"
+                )
+            if options['una_vez']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,239 @@
+import random
+from datetime import date, datetime, time, timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from turnos.busqueda import nombre_busqueda
+from turnos.catalogo import invalidar_catalogo
+from turnos.models import Cobertura, DisponibilidadMedico, Medico, Paciente, Turno
+from turnos.tablero import invalidar_totales
+
+NOMBRES = [
+    'María', 'Juan', 'Ana', 'Carlos', 'Laura', 'Jorge', 'Lucía', 'Diego', 'Sofía', 'Martín',
+    'Valentina', 'Pablo', 'Camila', 'Federico', 'Julieta', 'Santiago', 'Florencia', 'Nicolás',
+    'Agustina', 'Matías', 'Paula', 'Gustavo', 'Carolina', 'Ramón', 'Inés', 'Héctor', 'Mónica',
+]
+APELLIDOS = [
+    'González', 'Rodríguez', 'Gómez', 'Fernández', 'López', 'Díaz', 'Martínez', 'Pérez',
+    'García', 'Sánchez', 'Romero', 'Sosa', 'Álvarez', 'Torres', 'Ruiz', 'Ramírez', 'Flores',
+    'Benítez', 'Acosta', 'Medina', 'Herrera', 'Suárez', 'Aguirre', 'Giménez', 'Gutiérrez', 'Peña',
+]
+# Especialidad y peso relativo (hay muchos más clínicos que especialistas)
+ESPECIALIDADES = [
+    ('Clínica Médica', 30), ('Pediatría', 15), ('Ginecología', 10), ('Cardiología', 8),
+    ('Traumatología', 8), ('Dermatología', 6), ('Oftalmología', 5), ('Otorrinolaringología', 4),
+    ('Neurología', 3), ('Endocrinología', 3), ('Gastroenterología', 3), ('Urología', 3),
+    ('Psiquiatría', 2),
+]
+COBERTURAS = ['OSDE', 'Swiss Medical', 'IOMA', 'Galeno', 'Medifé', 'PAMI', 'OSECAC', 'Sancor Salud',
+              'Omint', 'Accord Salud', 'Hospital Italiano', 'OSPe', 'Unión Personal', 'Federada Salud']
+FRANJAS = [(time(8), time(12)), (time(9), time(13)), (time(14), time(18)), (time(15), time(20))]
+MOTIVOS = ['Control', 'Consulta', 'Dolor', 'Resultados de estudios', 'Receta', 'Chequeo anual', '']
+# Límite de historia hacia atrás: si no alcanza para la cantidad pedida, se generan menos turnos
+ANIOS_HISTORIA = 30
+
+
+class Command(BaseCommand):
+    help = 'Genera datos sintéticos de volumen realista para pruebas de rendimiento'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--coberturas', type=int, default=10)
+        parser.add_argument('--medicos', type=int, default=200)
+        parser.add_argument('--pacientes', type=int, default=100000)
+        parser.add_argument('--turnos', type=int, default=2000000)
+        parser.add_argument('--dias-futuros', type=int, default=60,
+                            help='Días hacia adelante con turnos pendientes (default: 60)')
+        parser.add_argument('--ocupacion', type=float, default=0.8,
+                            help='Fracción de horarios ocupados por día (default: 0.8)')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por bulk_create (default: 5000)')
+        parser.add_argument('--semilla', type=int, default=None, help='Semilla aleatoria para reproducir datos')
+        parser.add_argument('--clave', default='consultorio', help='Contraseña común de los pacientes')
+
+    def handle(self, *args, **options):
+        if not 0 < options['ocupacion'] <= 1:
+            raise CommandError('--ocupacion debe estar entre 0 (excluido) y 1')
+        self.random = random.Random(options['semilla'])
+        self.lote = options['lote']
+
+        coberturas = self.crear_coberturas(options['coberturas'])
+        medicos = self.crear_medicos(options['medicos'], coberturas)
+        self.crear_disponibilidades(medicos)
+        pacientes = self.crear_pacientes(options['pacientes'], coberturas, options['clave'])
+        self.crear_turnos(options['turnos'], medicos, pacientes, options['dias_futuros'], options['ocupacion'])
+
+        call_command('generar_horarios', stdout=self.stdout)
+        # Los turnos se insertan con bulk_create sin paciente ni médico cargados
+        call_command('indexar_busqueda', lote=self.lote, stdout=self.stdout)
+        # bulk_create no dispara señales: los totales del tablero y los catálogos se invalidan a mano
+        invalidar_totales()
+        invalidar_catalogo('medicos')
+        invalidar_catalogo('coberturas')
+        self.stdout.write(self.style.SUCCESS('Datos generados.'))
+
+    def log(self, mensaje):
+        self.stdout.write(f'[{datetime.now():%H:%M:%S}] {mensaje}')
+
+    def nombre(self):
+        return self.random.choice(NOMBRES), self.random.choice(APELLIDOS)
+
+    def crear_coberturas(self, cantidad):
+        existentes = set(Cobertura.objects.values_list('nombre', flat=True))
+        nombres = COBERTURAS[:cantidad] + [f'Cobertura {i}' for i in range(len(COBERTURAS), cantidad)]
+        Cobertura.objects.bulk_create([Cobertura(nombre=n) for n in nombres if n not in existentes])
+        coberturas = list(Cobertura.objects.filter(nombre__in=nombres))
+        self.log(f'{len(coberturas)} coberturas')
+        return coberturas
+
+    def crear_medicos(self, cantidad, coberturas):
+        inicio = Medico.objects.count()
+        especialidades, pesos = zip(*ESPECIALIDADES)
+        nuevos = []
+        for i in range(cantidad):
+            nombre, apellido = self.nombre()
+            nuevos.append(Medico(
+                nombre=nombre,
+                apellido=apellido,
+                especialidad=self.random.choices(especialidades, pesos)[0],
+                matricula=f'MS{inicio + i:07d}',
+                email=f'medico{inicio + i}@consultorio.com',
+                telefono=f'11-{self.random.randint(1000, 9999)}-{self.random.randint(1000, 9999)}',
+            ))
+        with transaction.atomic():
+            Medico.objects.bulk_create(nuevos, batch_size=self.lote)
+            medicos = list(Medico.objects.filter(matricula__in=[m.matricula for m in nuevos]))
+            relacion = Medico.coberturas.through
+            relacion.objects.bulk_create([
+                relacion(medico_id=medico.pk, cobertura_id=cobertura.pk)
+                for medico in medicos
+                for cobertura in self.random.sample(coberturas, self.random.randint(1, len(coberturas)))
+            ], batch_size=self.lote)
+        self.log(f'{len(medicos)} médicos')
+        return medicos
+
+    def crear_disponibilidades(self, medicos):
+        nuevas = []
+        for medico in medicos:
+            duracion = self.random.choice([15, 20, 20, 30, 30, 30, 45, 60])
+            for dia in sorted(self.random.sample(range(6), self.random.randint(2, 5))):
+                inicio, fin = self.random.choice(FRANJAS)
+                nuevas.append(DisponibilidadMedico(
+                    medico=medico, dia_semana=dia, hora_inicio=inicio, hora_fin=fin, duracion_turno=duracion
+                ))
+        DisponibilidadMedico.objects.bulk_create(nuevas, batch_size=self.lote)
+        self.log(f'{len(nuevas)} disponibilidades')
+
+    def crear_pacientes(self, cantidad, coberturas, clave):
+        # Un solo hash para todos: hashear por fila llevaría horas con 100k pacientes
+        clave_hash = make_password(clave)
+        inicio = User.objects.count()
+        pesos_coberturas = [1 / (i + 1) for i in range(len(coberturas))]
+        paciente_ids = []
+
+        for desde in range(0, cantidad, self.lote):
+            usuarios = []
+            for i in range(desde, min(desde + self.lote, cantidad)):
+                nombre, apellido = self.nombre()
+                usuarios.append(User(
+                    username=f'paciente{inicio + i}',
+                    first_name=nombre,
+                    last_name=apellido,
+                    email=f'paciente{inicio + i}@example.com',
+                    password=clave_hash,
+                ))
+            with transaction.atomic():
+                User.objects.bulk_create(usuarios)
+                if any(u.pk is None for u in usuarios):
+                    ids = dict(User.objects.filter(
+                        username__in=[u.username for u in usuarios]
+                    ).values_list('username', 'pk'))
+                    for usuario in usuarios:
+                        usuario.pk = ids[usuario.username]
+
+                pacientes = [
+                    Paciente(
+                        user_id=usuario.pk,
+                        nombre_busqueda=nombre_busqueda(usuario),
+                        dni=str(50000000 + inicio + desde + j),
+                        telefono=f'11-{self.random.randint(1000, 9999)}-{self.random.randint(1000, 9999)}',
+                        domicilio=f'{self.random.choice(APELLIDOS)} {self.random.randint(1, 9999)}',
+                        cobertura=self.random.choices(coberturas, pesos_coberturas)[0],
+                        numero_afiliado=str(self.random.randint(10 ** 8, 10 ** 10)),
+                        categoria=self.random.choices('ABC', [70, 20, 10])[0],
+                    )
+                    for j, usuario in enumerate(usuarios)
+                ]
+                Paciente.objects.bulk_create(pacientes)
+            paciente_ids.extend(Paciente.objects.filter(
+                user_id__in=[u.pk for u in usuarios]
+            ).values_list('pk', flat=True))
+            self.log(f'{len(paciente_ids)}/{cantidad} pacientes')
+
+        return paciente_ids
+
+    def horarios_por_dia(self, medicos):
+        horarios = {}
+        for disp in DisponibilidadMedico.objects.filter(medico__in=medicos):
+            horarios.setdefault(disp.medico_id, {}).setdefault(disp.dia_semana, []).extend(disp.generar_horarios())
+        return horarios
+
+    def estado_turno(self, fecha, hoy):
+        if fecha < hoy:
+            return self.random.choices(['completado', 'cancelado', 'confirmado'], [82, 13, 5])[0]
+        return self.random.choices(['pendiente', 'confirmado', 'cancelado'], [60, 30, 10])[0]
+
+    def crear_turnos(self, cantidad, medicos, paciente_ids, dias_futuros, ocupacion):
+        """
+        Recorre los días desde el futuro hacia el pasado llenando los horarios de cada médico
+        con la ocupación pedida, hasta llegar a la cantidad de turnos o a ANIOS_HISTORIA atrás.
+        Así no se repiten horarios activos y los turnos quedan concentrados en la historia reciente.
+        """
+        if not paciente_ids:
+            return
+        hoy = date.today()
+        horarios = self.horarios_por_dia(medicos)
+        fecha = hoy + timedelta(days=dias_futuros)
+        limite = hoy - timedelta(days=ANIOS_HISTORIA * 365)
+        creados = 0
+        lote = []
+
+        while creados + len(lote) < cantidad and horarios and fecha >= limite:
+            for medico_id, por_dia in horarios.items():
+                for hora in por_dia.get(fecha.weekday(), ()):
+                    if self.random.random() > ocupacion:
+                        continue
+                    sin_registro = self.random.random() < 0.05
+                    lote.append(Turno(
+                        paciente_id=None if sin_registro else self.random.choice(paciente_ids),
+                        paciente_nombre=' '.join(self.nombre()) if sin_registro else '',
+                        paciente_telefono='11-5555-0000' if sin_registro else '',
+                        medico_id=medico_id,
+                        fecha=fecha,
+                        hora=hora,
+                        estado=self.estado_turno(fecha, hoy),
+                        motivo=self.random.choice(MOTIVOS),
+                    ))
+                    if len(lote) >= self.lote:
+                        creados += self.guardar_turnos(lote, cantidad - creados)
+                        lote = []
+                    if creados + len(lote) >= cantidad:
+                        break
+                if creados + len(lote) >= cantidad:
+                    break
+            fecha -= timedelta(days=1)
+
+        creados += self.guardar_turnos(lote, cantidad - creados)
+        self.log(f'{creados} turnos')
+        if creados < cantidad:
+            self.stdout.write(self.style.WARNING(
+                f'Los horarios de {ANIOS_HISTORIA} años solo alcanzaron para {creados} de {cantidad} turnos'
+            ))
+
+    def guardar_turnos(self, lote, restantes):
+        lote = lote[:restantes]
+        with transaction.atomic():
+            Turno.objects.bulk_create(lote)
+        if lote:
+            self.log(f'  ... hasta {lote[-1].fecha}')
+        return len(lote)
@@ -0,0 +1,78 @@
+from datetime import date, time, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from turnos.models import ExcepcionDisponibilidad, Horario, ReservaTemporal, Turno
+from turnos.tablero import consulta_resumen_del_dia
+
+
+def consultas_principales():
+    """Consulta principal de cada vista, con valores de ejemplo para los parámetros"""
+    hoy = date.today()
+    activos = Turno.ESTADOS_ACTIVOS
+    return {
+        # horarios_disponibles_en_rango, que usan la consulta de un día y proximos_horarios
+        'horarios_disponibles (turnos)': Turno.objects.filter(
+            medico_id__in=[1, 2], fecha__range=(hoy, hoy + timedelta(days=7)), estado__in=activos
+        ).values_list('medico_id', 'fecha', 'hora'),
+        'horarios_disponibles (horarios)': Horario.objects.filter(
+            medico_id__in=[1, 2], fecha__range=(hoy, hoy + timedelta(days=7))
+        ).values_list('medico_id', 'fecha', 'hora', 'disponibilidad__duracion_turno'),
+        'excepciones': ExcepcionDisponibilidad.objects.filter(
+            Q(medico_id__in=[1, 2]) | Q(medico__isnull=True), fecha_desde__lte=hoy, fecha_hasta__gte=hoy
+        ),
+        'horas_retenidas': ReservaTemporal.objects.filter(
+            medico_id__in=[1, 2], fecha__range=(hoy, hoy + timedelta(days=7)), expira__gt=timezone.now()
+        ).values_list('medico_id', 'fecha', 'hora'),
+        'paciente_dashboard': Turno.objects.filter(
+            paciente_id=1, fecha__gte=hoy, estado__in=activos
+        ).order_by('fecha', 'hora')[:5],
+        'mis_turnos': Turno.objects.filter(paciente_id=1).order_by('-fecha', '-hora'),
+        # La misma consulta que arma el tablero, no una aproximación
+        'secretaria_dashboard': consulta_resumen_del_dia(hoy),
+        'gestionar_turnos': Turno.objects.order_by('-fecha', '-hora', '-pk')[:51],
+        'gestionar_turnos (por médico)': Turno.objects.filter(
+            medico_id=1, fecha__lt=hoy
+        ).order_by('-fecha', '-hora', '-pk')[:51],
+        'gestionar_turnos (por fecha)': Turno.objects.filter(
+            fecha=hoy, hora__lt=time(12)
+        ).order_by('-fecha', '-hora', '-pk')[:51],
+    }
+
+
+def usa_indice(plan):
+    """Indica si un plan de EXPLAIN (SQLite o PostgreSQL) resuelve la consulta con un índice"""
+    if connection.vendor == 'postgresql':
+        return 'Index' in plan and 'Seq Scan' not in plan
+    # SQLite: 'SEARCH t USING INDEX ...' o 'SCAN t USING INDEX ...'; un 'SCAN t' solo es lectura completa
+    lineas = [linea for linea in plan.splitlines() if 'SCAN' in linea or 'SEARCH' in linea]
+    return bool(lineas) and all('USING' in linea for linea in lineas)
+
+
+class Command(BaseCommand):
+    help = 'Verifica con EXPLAIN que la consulta principal de cada vista use un índice'
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(f'Motor no soportado: {connection.vendor}')
+
+        fallidas = []
+        for nombre, queryset in consultas_principales().items():
+            with transaction.atomic():
+                if connection.vendor == 'postgresql':
+                    # Con tablas chicas PostgreSQL prefiere leer todo; se fuerza a mostrar si el índice sirve
+                    with connection.cursor() as cursor:
+                        cursor.execute('SET LOCAL enable_seqscan = off')
+                plan = queryset.explain()
+
+            if usa_indice(plan):
+                self.stdout.write(self.style.SUCCESS(f'OK     {nombre}'))
+            else:
+                fallidas.append(nombre)
+                self.stdout.write(self.style.ERROR(f'FALLA  {nombre}'))
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+
+        if fallidas:
+            raise CommandError(f'{len(fallidas)} consulta(s) sin índice: {", ".join(fallidas)}')
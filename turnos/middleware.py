@@ -0,0 +1,12 @@
+from django.utils.deprecation import MiddlewareMixin
+from .permissions import perfil_lazy
+
+
+class PerfilMiddleware(MiddlewareMixin):
+    """
+    Adjunta `request.perfil` (rol y Paciente del usuario) para que decoradores y vistas
+    lo resuelvan una sola vez por request. Es perezoso: las páginas que no lo usan no
+    hacen la consulta. Va después de AuthenticationMiddleware.
+    """
+    def process_request(self, request):
+        request.perfil = perfil_lazy(request)
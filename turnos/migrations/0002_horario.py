@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Horario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField()),
+                ('disponibilidad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='turnos.disponibilidadmedico')),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='horarios', to='turnos.medico')),
+            ],
+            options={
+                'verbose_name': 'Horario',
+                'verbose_name_plural': 'Horarios',
+                'ordering': ['fecha', 'hora'],
+                'unique_together': {('medico', 'fecha', 'hora')},
+            },
+        ),
+    ]
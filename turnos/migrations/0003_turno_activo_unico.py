@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0002_horario'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='turno',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='turno',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pendiente', 'confirmado'])), fields=('medico', 'fecha', 'hora'), name='turno_activo_unico', violation_error_message='Este horario ya está ocupado.'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('turnos', '0003_turno_activo_unico'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaTemporal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField()),
+                ('expira', models.DateTimeField(db_index=True)),
+                ('medico', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_temporales', to='turnos.medico')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_temporales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Reserva temporal',
+                'verbose_name_plural': 'Reservas temporales',
+                'unique_together': {('medico', 'fecha', 'hora')},
+            },
+        ),
+    ]
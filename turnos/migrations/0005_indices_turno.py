@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0004_reservatemporal'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['medico', 'fecha', 'estado', 'hora'], name='turno_medico_fecha_estado'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['paciente', 'fecha', 'hora'], name='turno_paciente_fecha_hora'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(fields=['fecha', 'hora', 'id'], name='turno_fecha_hora_id'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'confirmado'])), fields=['paciente', 'fecha'], name='turno_activo_paciente_fecha'),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'confirmado'])), fields=['fecha', 'hora'], name='turno_activo_fecha_hora'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0005_indices_turno'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcepcionDisponibilidad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_desde', models.DateField()),
+                ('fecha_hasta', models.DateField()),
+                ('hora_desde', models.TimeField(blank=True, null=True)),
+                ('hora_hasta', models.TimeField(blank=True, null=True)),
+                ('motivo', models.CharField(blank=True, max_length=200)),
+                ('medico', models.ForeignKey(blank=True, help_text='Dejar vacío para un feriado o cierre de toda la clínica', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='excepciones', to='turnos.medico')),
+            ],
+            options={
+                'verbose_name': 'Excepción de disponibilidad',
+                'verbose_name_plural': 'Excepciones de disponibilidad',
+                'ordering': ['fecha_desde', 'hora_desde'],
+                'indexes': [models.Index(fields=['medico', 'fecha_hasta', 'fecha_desde'], name='excepcion_medico_fechas')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0006_excepciondisponibilidad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=100, unique=True)),
+                ('tipo', models.CharField(choices=[('confirmacion', 'Confirmación'), ('recordatorio', 'Recordatorio')], max_length=20)),
+                ('canal', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS')], max_length=10)),
+                ('destinatario', models.CharField(max_length=254)),
+                ('asunto', models.CharField(blank=True, max_length=200)),
+                ('mensaje', models.TextField()),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviada', 'Enviada'), ('fallida', 'Fallida'), ('cancelada', 'Cancelada')], default='pendiente', max_length=20)),
+                ('programada_para', models.DateTimeField()),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('tomada_por', models.CharField(blank=True, max_length=40)),
+                ('tomada_hasta', models.DateTimeField(blank=True, null=True)),
+                ('enviada_en', models.DateTimeField(blank=True, null=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('turno', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones', to='turnos.turno')),
+            ],
+            options={
+                'verbose_name': 'Notificación',
+                'verbose_name_plural': 'Notificaciones',
+                'ordering': ['programada_para'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'pendiente')), fields=['programada_para'], name='notificacion_pendiente')],
+            },
+        ),
+    ]
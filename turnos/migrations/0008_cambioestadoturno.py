@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0007_notificacion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='turno',
+            name='estado',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('cancelado', 'Cancelado'), ('completado', 'Completado'), ('ausente', 'Ausente')], default='pendiente', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='CambioEstadoTurno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('estado_anterior', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('cancelado', 'Cancelado'), ('completado', 'Completado'), ('ausente', 'Ausente')], max_length=20)),
+                ('estado_nuevo', models.CharField(choices=[('pendiente', 'Pendiente'), ('confirmado', 'Confirmado'), ('cancelado', 'Cancelado'), ('completado', 'Completado'), ('ausente', 'Ausente')], max_length=20)),
+                ('origen', models.CharField(help_text='Proceso que hizo el cambio', max_length=50)),
+                ('ejecucion', models.CharField(db_index=True, help_text='Identificador de la corrida', max_length=32)),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('turno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cambios_estado', to='turnos.turno')),
+            ],
+            options={
+                'verbose_name': 'Cambio de estado de turno',
+                'verbose_name_plural': 'Cambios de estado de turnos',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:10
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0008_cambioestadoturno'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medico',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
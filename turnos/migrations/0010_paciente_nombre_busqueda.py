@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:13
+
+import unicodedata
+from django.db import migrations, models
+
+
+def completar_nombre_busqueda(apps, schema_editor):
+    # Copia de busqueda.nombre_busqueda: las migraciones no importan código de la app
+    Paciente = apps.get_model('turnos', 'Paciente')
+    pacientes = Paciente.objects.select_related('user').only('pk', 'user__first_name', 'user__last_name')
+    lote = []
+    for paciente in pacientes.iterator(chunk_size=2000):
+        texto = f'{paciente.user.last_name} {paciente.user.first_name}'
+        texto = unicodedata.normalize('NFKD', texto).encode('ascii', 'ignore').decode()
+        paciente.nombre_busqueda = ' '.join(texto.lower().split())[:200]
+        lote.append(paciente)
+        if len(lote) >= 2000:
+            Paciente.objects.bulk_update(lote, ['nombre_busqueda'])
+            lote = []
+    Paciente.objects.bulk_update(lote, ['nombre_busqueda'])
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0009_medico_fecha_modificacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='nombre_busqueda',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='paciente',
+            name='numero_afiliado',
+            field=models.CharField(db_index=True, max_length=50),
+        ),
+        migrations.RunPython(completar_nombre_busqueda, migrations.RunPython.noop),
+    ]
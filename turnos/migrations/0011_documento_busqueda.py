@@ -0,0 +1,111 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:16
+
+import unicodedata
+from django.db import migrations, models
+
+TABLAS = ['turnos_paciente', 'turnos_turno']
+
+
+def normalizar(texto):
+    # Copia de busqueda.normalizar: las migraciones no importan código de la app
+    sin_acentos = unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode()
+    return ' '.join(sin_acentos.lower().split())
+
+
+def completar_documentos(apps, schema_editor):
+    Paciente = apps.get_model('turnos', 'Paciente')
+    Turno = apps.get_model('turnos', 'Turno')
+
+    pacientes = []
+    for paciente in Paciente.objects.select_related('user').iterator(chunk_size=2000):
+        user = paciente.user
+        paciente.documento_busqueda = normalizar(' '.join([
+            user.last_name, user.first_name, paciente.dni, paciente.numero_afiliado, user.email, paciente.telefono
+        ]))
+        pacientes.append(paciente)
+        if len(pacientes) >= 2000:
+            Paciente.objects.bulk_update(pacientes, ['documento_busqueda'])
+            pacientes = []
+    Paciente.objects.bulk_update(pacientes, ['documento_busqueda'])
+
+    turnos = []
+    for turno in Turno.objects.select_related('paciente__user', 'medico').iterator(chunk_size=2000):
+        if turno.paciente_id:
+            user = turno.paciente.user
+            paciente = f'{user.last_name} {user.first_name} {turno.paciente.dni}'
+        else:
+            paciente = f'{turno.paciente_nombre} {turno.paciente_telefono}'
+        medico = turno.medico
+        turno.documento_busqueda = normalizar(f'{paciente} {medico.apellido} {medico.nombre} {medico.especialidad}')
+        turnos.append(turno)
+        if len(turnos) >= 2000:
+            Turno.objects.bulk_update(turnos, ['documento_busqueda'])
+            turnos = []
+    Turno.objects.bulk_update(turnos, ['documento_busqueda'])
+
+
+def crear_triggers(schema_editor, tabla):
+    """
+    Triggers de SQLite que mantienen {tabla}_fts; también los usan migraciones posteriores.
+    Es una copia congelada de busqueda.TRIGGERS_FTS: las migraciones no importan código
+    de la app, y esta tiene que crear los triggers como eran al escribirse aunque la
+    definición de la app cambie después (ese cambio iría en una migración nueva).
+    """
+    borrar = f"INSERT INTO {tabla}_fts({tabla}_fts, rowid, documento_busqueda) VALUES ('delete', old.id, old.documento_busqueda);"
+    insertar = f"INSERT INTO {tabla}_fts(rowid, documento_busqueda) VALUES (new.id, new.documento_busqueda);"
+    schema_editor.execute(f"CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ai AFTER INSERT ON {tabla} BEGIN {insertar} END")
+    schema_editor.execute(f"CREATE TRIGGER IF NOT EXISTS {tabla}_fts_ad AFTER DELETE ON {tabla} BEGIN {borrar} END")
+    schema_editor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {tabla}_fts_au AFTER UPDATE OF documento_busqueda ON {tabla} BEGIN {borrar} {insertar} END"
+    )
+    schema_editor.execute(f"INSERT INTO {tabla}_fts({tabla}_fts) VALUES ('rebuild')")
+
+
+def crear_indices(apps, schema_editor):
+    """
+    SQLite: tabla FTS5 con el contenido en la tabla original (no duplica el texto) y
+    triggers que la mantienen, incluso con bulk_create. Los UPDATE que no tocan
+    documento_busqueda, como los cambios de estado, no la tocan. Si una migración futura
+    rehace alguna de estas tablas en SQLite, hay que volver a crear sus triggers con
+    crear_triggers (ver 0012_paciente_fecha_modificacion). En PostgreSQL el índice es
+    un GinIndex de trigramas declarado en los modelos (migración 0013).
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for tabla in TABLAS:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {tabla}_fts USING fts5(documento_busqueda, content='{tabla}', "
+            f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+        )
+        crear_triggers(schema_editor, tabla)
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for tabla in TABLAS:
+        for sufijo in ['ai', 'ad', 'au']:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {tabla}_fts_{sufijo}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {tabla}_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0010_paciente_nombre_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paciente',
+            name='documento_busqueda',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='turno',
+            name='documento_busqueda',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(completar_documentos, migrations.RunPython.noop),
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
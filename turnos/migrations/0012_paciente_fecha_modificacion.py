@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:32
+
+from importlib import import_module
+from django.db import migrations, models
+
+documento_busqueda = import_module('turnos.migrations.0011_documento_busqueda')
+
+
+def recrear_triggers(apps, schema_editor):
+    # En SQLite AddField (y RemoveField al revertir) rehace turnos_paciente, y con la
+    # tabla vieja se van los triggers que mantienen turnos_paciente_fts
+    if schema_editor.connection.vendor == 'sqlite':
+        documento_busqueda.crear_triggers(schema_editor, 'turnos_paciente')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0011_documento_busqueda'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, recrear_triggers),
+        migrations.AddField(
+            model_name='paciente',
+            name='fecha_modificacion',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(recrear_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:35
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+import turnos.models
+
+
+class ExtensionTrigramas(TrigramExtension):
+    # TrigramExtension solo hace algo en PostgreSQL, pero en Django 4.2 al revertir
+    # consulta pg_extension sin mirar la base
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turnos', '0012_paciente_fecha_modificacion'),
+    ]
+
+    operations = [
+        ExtensionTrigramas(),
+        migrations.AddIndex(
+            model_name='paciente',
+            index=turnos.models.IndiceTrigramas(fields=['documento_busqueda'], name='paciente_documento_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='turno',
+            index=turnos.models.IndiceTrigramas(fields=['documento_busqueda'], name='turno_documento_trgm', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -1,8 +1,26 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
 from datetime import time, datetime, timedelta
 
+class IndiceTrigramas(GinIndex):
+    """
+    GinIndex para LIKE '%...%' en PostgreSQL (con opclasses=['gin_trgm_ops'] y la
+    extensión pg_trgm). En otras bases no crea nada: SQLite ignora el método y el
+    opclass y dejaría un B-tree sobre texto largo que la búsqueda, que ahí usa FTS5, no lee.
+    """
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().remove_sql(model, schema_editor, **kwargs)
+
 class Cobertura(models.Model):
     nombre = models.CharField(max_length=100, unique=True)
     activa = models.BooleanField(default=True)
@@ -27,14 +45,25 @@ class Paciente(models.Model):
     telefono = models.CharField(max_length=20)
     domicilio = models.CharField(max_length=200)
     cobertura = models.ForeignKey(Cobertura, on_delete=models.SET_NULL, null=True, related_name='pacientes')
-    numero_afiliado = models.CharField(max_length=50)
+    numero_afiliado = models.CharField(max_length=50, db_index=True)
     categoria = models.CharField(max_length=1, choices=CATEGORIAS, default='A')
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    # También cambia cuando cambian el nombre o el email de su User (ver signals.py);
+    # la usa el ETag de la API de turnos
+    fecha_modificacion = models.DateTimeField(auto_now=True)
+    # Apellido y nombre del User normalizados para el autocompletar (ver busqueda.py);
+    # lo mantienen al día las señales y se completa a mano en las cargas masivas
+    nombre_busqueda = models.CharField(max_length=200, blank=True, db_index=True, editable=False)
+    # Texto indexado de la búsqueda de la secretaría y el admin (ver busqueda.py)
+    documento_busqueda = models.TextField(blank=True, editable=False)
     
     class Meta:
         verbose_name = "Paciente"
         verbose_name_plural = "Pacientes"
         ordering = ['-fecha_registro']
+        indexes = [
+            IndiceTrigramas(fields=['documento_busqueda'], opclasses=['gin_trgm_ops'], name='paciente_documento_trgm'),
+        ]
     
     def __str__(self):
         return f"{self.user.get_full_name()} - DNI: {self.dni}"
@@ -62,6 +91,9 @@ class Medico(models.Model):
     telefono = models.CharField(max_length=20, blank=True, null=True)
     coberturas = models.ManyToManyField(Cobertura, related_name='medicos', blank=True)
     activo = models.BooleanField(default=True)
+    # También se actualiza al cambiar sus coberturas o disponibilidades (ver signals.py);
+    # versiona los fragmentos cacheados del catálogo de médicos
+    fecha_modificacion = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Médico"
@@ -116,13 +148,85 @@ class DisponibilidadMedico(models.Model):
         
         return horarios
 
+class ExcepcionDisponibilidad(models.Model):
+    """
+    Bloqueo de la disponibilidad de un médico (vacaciones, licencia) o de toda la
+    clínica (feriado, si no tiene médico) entre dos fechas inclusive. Sin horas bloquea
+    los días completos; con horas, solo esa franja en cada día del rango.
+    """
+    medico = models.ForeignKey(
+        Medico, on_delete=models.CASCADE, related_name='excepciones', null=True, blank=True,
+        help_text="Dejar vacío para un feriado o cierre de toda la clínica"
+    )
+    fecha_desde = models.DateField()
+    fecha_hasta = models.DateField()
+    hora_desde = models.TimeField(null=True, blank=True)
+    hora_hasta = models.TimeField(null=True, blank=True)
+    motivo = models.CharField(max_length=200, blank=True)
+    
+    class Meta:
+        verbose_name = "Excepción de disponibilidad"
+        verbose_name_plural = "Excepciones de disponibilidad"
+        ordering = ['fecha_desde', 'hora_desde']
+        indexes = [
+            models.Index(fields=['medico', 'fecha_hasta', 'fecha_desde'], name='excepcion_medico_fechas'),
+        ]
+    
+    def __str__(self):
+        quien = self.medico.nombre_completo if self.medico_id else 'Toda la clínica'
+        return f"{quien} - {self.fecha_desde} a {self.fecha_hasta} {self.motivo}"
+    
+    @property
+    def dia_completo(self):
+        return self.hora_desde is None
+    
+    def clean(self):
+        if self.fecha_desde and self.fecha_hasta and self.fecha_hasta < self.fecha_desde:
+            raise ValidationError({'fecha_hasta': 'La fecha final no puede ser anterior a la inicial.'})
+        if (self.hora_desde is None) != (self.hora_hasta is None):
+            raise ValidationError('Indicá ambas horas para bloquear una franja, o ninguna para el día completo.')
+        if self.hora_desde is not None and self.hora_hasta <= self.hora_desde:
+            raise ValidationError({'hora_hasta': 'La hora final debe ser posterior a la inicial.'})
+    
+    def intervalos(self, desde=None, hasta=None):
+        """Intervalos [inicio, fin) que bloquea la excepción, recortados al rango de fechas si se indica"""
+        desde = max(self.fecha_desde, desde) if desde else self.fecha_desde
+        hasta = min(self.fecha_hasta, hasta) if hasta else self.fecha_hasta
+        if self.dia_completo:
+            return [(
+                datetime.combine(desde, time.min),
+                datetime.combine(hasta + timedelta(days=1), time.min)
+            )]
+        return [
+            (datetime.combine(fecha, self.hora_desde), datetime.combine(fecha, self.hora_hasta))
+            for fecha in (desde + timedelta(days=i) for i in range((hasta - desde).days + 1))
+        ]
+
+class Horario(models.Model):
+    """Horario materializado de un médico, generado a partir de su DisponibilidadMedico"""
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='horarios')
+    disponibilidad = models.ForeignKey(DisponibilidadMedico, on_delete=models.CASCADE, related_name='horarios')
+    fecha = models.DateField()
+    hora = models.TimeField()
+    
+    class Meta:
+        verbose_name = "Horario"
+        verbose_name_plural = "Horarios"
+        unique_together = ['medico', 'fecha', 'hora']
+        ordering = ['fecha', 'hora']
+    
+    def __str__(self):
+        return f"{self.medico.nombre_completo} - {self.fecha} {self.hora}"
+
 class Turno(models.Model):
     ESTADOS = [
         ('pendiente', 'Pendiente'),
         ('confirmado', 'Confirmado'),
         ('cancelado', 'Cancelado'),
         ('completado', 'Completado'),
+        ('ausente', 'Ausente'),
     ]
+    ESTADOS_ACTIVOS = ['pendiente', 'confirmado']
     
     paciente = models.ForeignKey(Paciente, on_delete=models.CASCADE, related_name='turnos', null=True, blank=True)
     paciente_nombre = models.CharField(max_length=200, blank=True, help_text="Para turnos sin registro")
@@ -136,12 +240,43 @@ class Turno(models.Model):
     creado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='turnos_creados')
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_modificacion = models.DateTimeField(auto_now=True)
+    # Paciente y médico del turno, indexados para la búsqueda (ver busqueda.py)
+    documento_busqueda = models.TextField(blank=True, editable=False)
     
     class Meta:
         verbose_name = "Turno"
         verbose_name_plural = "Turnos"
-        unique_together = ['medico', 'fecha', 'hora']
         ordering = ['-fecha', '-hora']
+        constraints = [
+            # Solo un turno activo por horario; los cancelados/completados no bloquean
+            models.UniqueConstraint(
+                fields=['medico', 'fecha', 'hora'],
+                condition=models.Q(estado__in=['pendiente', 'confirmado']),
+                name='turno_activo_unico',
+                violation_error_message='Este horario ya está ocupado.'
+            )
+        ]
+        indexes = [
+            # Horarios ocupados de un médico por día (incluye hora para no leer la tabla)
+            models.Index(fields=['medico', 'fecha', 'estado', 'hora'], name='turno_medico_fecha_estado'),
+            # Turnos de un paciente ordenados por fecha
+            models.Index(fields=['paciente', 'fecha', 'hora'], name='turno_paciente_fecha_hora'),
+            # Listado general y paginación por clave (fecha, hora, id)
+            models.Index(fields=['fecha', 'hora', 'id'], name='turno_fecha_hora_id'),
+            # Índices parciales sobre los turnos activos, que son una fracción chica de la tabla
+            models.Index(
+                fields=['paciente', 'fecha'],
+                condition=models.Q(estado__in=['pendiente', 'confirmado']),
+                name='turno_activo_paciente_fecha'
+            ),
+            models.Index(
+                fields=['fecha', 'hora'],
+                condition=models.Q(estado__in=['pendiente', 'confirmado']),
+                name='turno_activo_fecha_hora'
+            ),
+            # Búsqueda de texto en PostgreSQL (ver busqueda.py)
+            IndiceTrigramas(fields=['documento_busqueda'], opclasses=['gin_trgm_ops'], name='turno_documento_trgm'),
+        ]
     
     def __str__(self):
         paciente = self.paciente.nombre_completo if self.paciente else self.paciente_nombre
@@ -157,4 +292,89 @@ class Turno(models.Model):
         """Permite cancelar turnos con al menos 24hs de anticipación"""
         ahora = datetime.now()
         fecha_hora_turno = datetime.combine(self.fecha, self.hora)
-        return fecha_hora_turno - ahora > timedelta(hours=24)
\ No newline at end of file
+        return fecha_hora_turno - ahora > timedelta(hours=24)
+
+class CambioEstadoTurno(models.Model):
+    """Registro de auditoría de los cambios de estado hechos en bloque (ver cierre.py)"""
+    turno = models.ForeignKey(Turno, on_delete=models.CASCADE, related_name='cambios_estado')
+    estado_anterior = models.CharField(max_length=20, choices=Turno.ESTADOS)
+    estado_nuevo = models.CharField(max_length=20, choices=Turno.ESTADOS)
+    origen = models.CharField(max_length=50, help_text="Proceso que hizo el cambio")
+    ejecucion = models.CharField(max_length=32, db_index=True, help_text="Identificador de la corrida")
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Cambio de estado de turno"
+        verbose_name_plural = "Cambios de estado de turnos"
+        ordering = ['-fecha']
+    
+    def __str__(self):
+        return f"Turno {self.turno_id}: {self.estado_anterior} → {self.estado_nuevo}"
+
+class ReservaTemporal(models.Model):
+    """Retención de un horario por unos minutos mientras el paciente completa la reserva"""
+    medico = models.ForeignKey(Medico, on_delete=models.CASCADE, related_name='reservas_temporales')
+    fecha = models.DateField()
+    hora = models.TimeField()
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reservas_temporales')
+    expira = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        verbose_name = "Reserva temporal"
+        verbose_name_plural = "Reservas temporales"
+        unique_together = ['medico', 'fecha', 'hora']
+    
+    def __str__(self):
+        return f"{self.medico.nombre_completo} - {self.fecha} {self.hora} (hasta {self.expira})"
+
+class Notificacion(models.Model):
+    """
+    Aviso al paciente (confirmación o recordatorio) encolado en la base para que lo
+    envíe el comando procesar_notificaciones, fuera del request. La `clave` es única y
+    hace idempotente el encolado: volver a encolar el mismo aviso no lo duplica.
+    """
+    TIPOS = [
+        ('confirmacion', 'Confirmación'),
+        ('recordatorio', 'Recordatorio'),
+    ]
+    CANALES = [
+        ('email', 'Email'),
+        ('sms', 'SMS'),
+    ]
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('enviada', 'Enviada'),
+        ('fallida', 'Fallida'),
+        ('cancelada', 'Cancelada'),
+    ]
+    
+    clave = models.CharField(max_length=100, unique=True)
+    turno = models.ForeignKey(Turno, on_delete=models.CASCADE, related_name='notificaciones', null=True, blank=True)
+    tipo = models.CharField(max_length=20, choices=TIPOS)
+    canal = models.CharField(max_length=10, choices=CANALES)
+    destinatario = models.CharField(max_length=254)
+    asunto = models.CharField(max_length=200, blank=True)
+    mensaje = models.TextField()
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    programada_para = models.DateTimeField()
+    intentos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+    # Reserva del lote por un worker: evita que dos workers envíen lo mismo
+    tomada_por = models.CharField(max_length=40, blank=True)
+    tomada_hasta = models.DateTimeField(null=True, blank=True)
+    enviada_en = models.DateTimeField(null=True, blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Notificación"
+        verbose_name_plural = "Notificaciones"
+        ordering = ['programada_para']
+        indexes = [
+            models.Index(
+                fields=['programada_para'], name='notificacion_pendiente',
+                condition=models.Q(estado='pendiente')
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_tipo_display()} por {self.get_canal_display()} a {self.destinatario} ({self.estado})"
@@ -0,0 +1,240 @@
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import Notificacion, Turno
+
+ESPERA_MAXIMA = timedelta(hours=1)
+
+# ============= ENVIADORES =============
+
+class Enviador:
+    """
+    Base de los enviadores de notificaciones. Las subclases implementan `enviar` para un
+    aviso o, si el proveedor acepta envíos masivos, `enviar_lote` directamente. La
+    `clave` de cada notificación sirve como clave de idempotencia para el proveedor:
+    si un worker cae después de enviar y antes de guardar, el aviso se reintenta.
+    """
+    def enviar_lote(self, notificaciones):
+        """Envía un lote y devuelve {pk: mensaje de error} con las que fallaron"""
+        errores = {}
+        for notificacion in notificaciones:
+            try:
+                self.enviar(notificacion)
+            except Exception as e:
+                errores[notificacion.pk] = str(e) or e.__class__.__name__
+        return errores
+
+    def enviar(self, notificacion):
+        raise NotImplementedError
+
+class EnviadorConsola(Enviador):
+    """Escribe los avisos en la salida estándar, para desarrollo"""
+    def __init__(self, salida=None):
+        self.salida = salida or sys.stdout
+
+    def enviar(self, notificacion):
+        self.salida.write(
+            f'[{notificacion.get_canal_display()} a {notificacion.destinatario}] '
+            f'{notificacion.asunto}: {notificacion.mensaje}\n'
+        )
+
+class EnviadorArchivo(Enviador):
+    """Agrega los avisos como líneas JSON a NOTIFICACIONES_ARCHIVO, en lugar de un proveedor real"""
+    def __init__(self, ruta=None):
+        self.ruta = ruta or settings.NOTIFICACIONES_ARCHIVO
+
+    def enviar_lote(self, notificaciones):
+        with open(self.ruta, 'a', encoding='utf-8') as archivo:
+            for notificacion in notificaciones:
+                archivo.write(json.dumps({
+                    'clave': notificacion.clave,
+                    'canal': notificacion.canal,
+                    'destinatario': notificacion.destinatario,
+                    'asunto': notificacion.asunto,
+                    'mensaje': notificacion.mensaje,
+                }, ensure_ascii=False) + '\n')
+        return {}
+
+def obtener_enviador(ruta=None):
+    """Instancia el enviador configurado en NOTIFICACIONES_ENVIADOR (ruta de importación)"""
+    return import_string(ruta or settings.NOTIFICACIONES_ENVIADOR)()
+
+# ============= ENCOLADO =============
+
+def _inicio(turno):
+    return timezone.make_aware(datetime.combine(turno.fecha, turno.hora))
+
+def _destinos(turno):
+    """(canal, destinatario) de los avisos de un turno: email del usuario y teléfono"""
+    destinos = []
+    if turno.paciente_id:
+        if turno.paciente.user.email:
+            destinos.append(('email', turno.paciente.user.email))
+        telefono = turno.paciente.telefono
+    else:
+        telefono = turno.paciente_telefono
+    if telefono:
+        destinos.append(('sms', telefono))
+    return destinos
+
+def _clave(tipo, canal, turno):
+    # Incluye fecha y hora: si el turno se mueve, el aviso del nuevo horario es otro
+    return f'{tipo}:{canal}:{turno.pk}:{turno.fecha:%Y%m%d}{turno.hora:%H%M}'
+
+def _avisos(turno, tipo, programada_para):
+    cuando = f'{turno.fecha:%d/%m/%Y} a las {turno.hora:%H:%M}'
+    if tipo == 'confirmacion':
+        asunto = 'Turno reservado'
+        mensaje = f'Tu turno con {turno.medico.nombre_completo} quedó reservado para el {cuando}.'
+    else:
+        asunto = 'Recordatorio de turno'
+        mensaje = f'Te recordamos tu turno con {turno.medico.nombre_completo} el {cuando}.'
+    return [
+        Notificacion(
+            clave=_clave(tipo, canal, turno),
+            turno=turno,
+            tipo=tipo,
+            canal=canal,
+            destinatario=destinatario,
+            asunto=asunto,
+            mensaje=mensaje,
+            programada_para=programada_para
+        )
+        for canal, destinatario in _destinos(turno)
+    ]
+
+def encolar_confirmacion(turno):
+    """Encola la confirmación de un turno recién reservado; es un solo INSERT"""
+    Notificacion.objects.bulk_create(_avisos(turno, 'confirmacion', timezone.now()), ignore_conflicts=True)
+
+def programar_recordatorios(ahora=None, lote=1000):
+    """
+    Encola recordatorios para los turnos activos que empiezan dentro de las próximas
+    NOTIFICACIONES_RECORDATORIO_HORAS. Se puede correr seguido: los avisos cuya clave ya
+    existe se descartan con una consulta por lote, y la clave única cubre dos corridas
+    simultáneas. Un turno reprogramado tiene otra clave, así que recibe su recordatorio.
+    """
+    ahora = ahora or timezone.now()
+    hasta = ahora + timedelta(hours=settings.NOTIFICACIONES_RECORDATORIO_HORAS)
+    turnos = Turno.objects.filter(
+        estado__in=Turno.ESTADOS_ACTIVOS,
+        fecha__range=(timezone.localtime(ahora).date(), timezone.localtime(hasta).date())
+    ).select_related('paciente__user', 'medico')
+
+    creados = 0
+    avisos = []
+    for turno in turnos.iterator(chunk_size=lote):
+        if ahora < _inicio(turno) <= hasta:
+            avisos.extend(_avisos(turno, 'recordatorio', ahora))
+        if len(avisos) >= lote:
+            creados += _guardar_nuevos(avisos)
+            avisos = []
+    creados += _guardar_nuevos(avisos)
+    return creados
+
+def _guardar_nuevos(avisos):
+    """Inserta los avisos cuya clave todavía no existe y devuelve cuántos eran"""
+    if not avisos:
+        return 0
+    existentes = set(Notificacion.objects.filter(
+        clave__in=[aviso.clave for aviso in avisos]
+    ).values_list('clave', flat=True))
+    nuevos = [aviso for aviso in avisos if aviso.clave not in existentes]
+    Notificacion.objects.bulk_create(nuevos, ignore_conflicts=True)
+    return len(nuevos)
+
+# ============= ENVÍO =============
+
+def _espera(intentos):
+    """Espera exponencial con jitter antes del próximo intento"""
+    espera = timedelta(seconds=settings.NOTIFICACIONES_ESPERA_SEGUNDOS * 2 ** (intentos - 1))
+    return min(espera, ESPERA_MAXIMA) * (1 + random.random() / 2)
+
+def _tomar_lote(ahora, lote):
+    """
+    Reserva hasta `lote` notificaciones vencidas para este worker por
+    NOTIFICACIONES_RESERVA_SEGUNDOS y las devuelve. El UPDATE vuelve a evaluar las
+    condiciones, así que dos workers nunca se quedan con la misma notificación.
+    """
+    disponibles = Notificacion.objects.filter(
+        Q(tomada_hasta__isnull=True) | Q(tomada_hasta__lt=ahora),
+        estado='pendiente',
+        programada_para__lte=ahora
+    )
+    ids = list(disponibles.order_by('programada_para').values_list('pk', flat=True)[:lote])
+    if not ids:
+        return []
+
+    trabajador = uuid.uuid4().hex
+    disponibles.filter(pk__in=ids).update(
+        tomada_por=trabajador,
+        tomada_hasta=ahora + timedelta(seconds=settings.NOTIFICACIONES_RESERVA_SEGUNDOS)
+    )
+    return list(Notificacion.objects.filter(pk__in=ids, tomada_por=trabajador).select_related('turno'))
+
+def procesar_notificaciones(enviador=None, lote=500, ahora=None):
+    """
+    Envía un lote de notificaciones vencidas con el enviador dado y guarda el resultado
+    con pocas consultas, sin importar el tamaño del lote. Las que fallan se reprograman con espera exponencial hasta
+    NOTIFICACIONES_MAX_INTENTOS; los recordatorios de turnos cancelados, ya pasados o
+    reprogramados (su clave no coincide con la fecha y hora actuales) se cancelan sin
+    enviarse. Devuelve cuántas terminaron en cada situación.
+    """
+    enviador = enviador or obtener_enviador()
+    ahora = ahora or timezone.now()
+    resultado = {'enviadas': 0, 'reintentos': 0, 'fallidas': 0, 'canceladas': 0}
+
+    notificaciones = _tomar_lote(ahora, lote)
+    if not notificaciones:
+        return resultado
+
+    vigentes, canceladas = [], []
+    for notificacion in notificaciones:
+        turno = notificacion.turno
+        if notificacion.tipo == 'recordatorio' and (
+            turno is None or turno.estado not in Turno.ESTADOS_ACTIVOS or _inicio(turno) <= ahora
+            or notificacion.clave != _clave(notificacion.tipo, notificacion.canal, turno)
+        ):
+            canceladas.append(notificacion.pk)
+        else:
+            vigentes.append(notificacion)
+
+    try:
+        errores = enviador.enviar_lote(vigentes) if vigentes else {}
+    except Exception as e:
+        # El proveedor rechazó el lote entero: se reintentan todas
+        errores = {notificacion.pk: str(e) or e.__class__.__name__ for notificacion in vigentes}
+
+    # Lo habitual (enviadas y canceladas) se guarda con un UPDATE por grupo; solo las
+    # que fallaron, que son pocas, necesitan valores por fila
+    liberar = {'tomada_por': '', 'tomada_hasta': None}
+    enviadas = [notificacion.pk for notificacion in vigentes if notificacion.pk not in errores]
+    Notificacion.objects.filter(pk__in=enviadas).update(
+        estado='enviada', enviada_en=ahora, intentos=F('intentos') + 1, **liberar
+    )
+    Notificacion.objects.filter(pk__in=canceladas).update(estado='cancelada', **liberar)
+    resultado['enviadas'] = len(enviadas)
+    resultado['canceladas'] = len(canceladas)
+
+    fallidas = [notificacion for notificacion in vigentes if notificacion.pk in errores]
+    for notificacion in fallidas:
+        notificacion.intentos += 1
+        notificacion.ultimo_error = errores[notificacion.pk][:1000]
+        notificacion.tomada_por = ''
+        notificacion.tomada_hasta = None
+        if notificacion.intentos >= settings.NOTIFICACIONES_MAX_INTENTOS:
+            notificacion.estado = 'fallida'
+            resultado['fallidas'] += 1
+        else:
+            notificacion.programada_para = ahora + _espera(notificacion.intentos)
+            resultado['reintentos'] += 1
+    Notificacion.objects.bulk_update(fallidas, [
+        'estado', 'intentos', 'ultimo_error', 'programada_para', 'tomada_por', 'tomada_hasta'
+    ], batch_size=100)
+    return resultado
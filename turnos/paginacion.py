@@ -0,0 +1,53 @@
+from datetime import datetime
+from django.db.models import Q
+
+def codificar_cursor(turno):
+    """Arma el cursor de paginación de un turno a partir de (fecha, hora, id)"""
+    return f"{turno.fecha.isoformat()}_{turno.hora.strftime('%H:%M:%S')}_{turno.pk}"
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, hora, id) de un cursor; lanza ValueError si es inválido"""
+    fecha, hora, pk = cursor.split('_')
+    return (
+        datetime.strptime(fecha, '%Y-%m-%d').date(),
+        datetime.strptime(hora, '%H:%M:%S').time(),
+        int(pk)
+    )
+
+def paginar_turnos(turnos, despues=None, antes=None, por_pagina=50):
+    """
+    Paginación por clave (seek) sobre turnos ordenados por fecha, hora e id descendentes.
+    En lugar de OFFSET filtra a partir del último turno visto, así que el costo de cada
+    página no depende de cuántas filas haya antes. Devuelve (turnos, cursor_anterior,
+    cursor_siguiente); los cursores son None cuando no hay más páginas en ese sentido.
+    """
+    cursor = antes or despues
+    if cursor:
+        try:
+            fecha, hora, pk = decodificar_cursor(cursor)
+        except ValueError:
+            # Cursor manipulado o de otra versión: se vuelve a la primera página
+            antes = despues = None
+
+    if antes:
+        # Hacia atrás: se recorre en orden ascendente y se invierte la página
+        turnos = turnos.filter(
+            Q(fecha__gt=fecha) | Q(fecha=fecha, hora__gt=hora) | Q(fecha=fecha, hora=hora, pk__gt=pk)
+        ).order_by('fecha', 'hora', 'pk')
+        pagina = list(turnos[:por_pagina + 1])
+        hay_mas = len(pagina) > por_pagina
+        pagina = pagina[:por_pagina][::-1]
+        anterior = codificar_cursor(pagina[0]) if hay_mas else None
+        siguiente = codificar_cursor(pagina[-1]) if pagina else None
+        return pagina, anterior, siguiente
+
+    if despues:
+        turnos = turnos.filter(
+            Q(fecha__lt=fecha) | Q(fecha=fecha, hora__lt=hora) | Q(fecha=fecha, hora=hora, pk__lt=pk)
+        )
+    pagina = list(turnos.order_by('-fecha', '-hora', '-pk')[:por_pagina + 1])
+    hay_mas = len(pagina) > por_pagina
+    pagina = pagina[:por_pagina]
+    anterior = codificar_cursor(pagina[0]) if despues and pagina else None
+    siguiente = codificar_cursor(pagina[-1]) if hay_mas else None
+    return pagina, anterior, siguiente
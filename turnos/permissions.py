@@ -1,64 +1,99 @@
-from django.contrib.auth.decorators import user_passes_test
+from collections import namedtuple
+from django.contrib.auth.views import redirect_to_login
 from django.core.exceptions import PermissionDenied
+from django.shortcuts import get_object_or_404, resolve_url
+from django.utils.functional import SimpleLazyObject
 from functools import wraps
+from .models import Paciente, Turno
 
-def es_secretaria(user):
-    """Verifica si el usuario es staff (secretaria)"""
-    return user.is_authenticated and user.is_staff
+ROL_SECRETARIA = 'secretaria'
+ROL_PACIENTE = 'paciente'
 
-def es_paciente(user):
-    """Verifica si el usuario es un paciente registrado"""
-    return user.is_authenticated and hasattr(user, 'paciente') and not user.is_staff
+# Rol del usuario del request y su Paciente (None si no es paciente)
+Perfil = namedtuple('Perfil', ['rol', 'paciente'])
+
+def resolver_perfil(user):
+    """
+    Rol y Paciente de un usuario. Los anónimos y la secretaría no hacen consultas; para
+    el resto se trae el Paciente con su cobertura en una sola, y queda también en
+    `user.paciente` para no volver a buscarlo.
+    """
+    if not user.is_authenticated:
+        return Perfil(None, None)
+    if user.is_staff:
+        return Perfil(ROL_SECRETARIA, None)
+    paciente = Paciente.objects.select_related('cobertura').filter(user=user).first()
+    if paciente is None:
+        return Perfil(None, None)
+    paciente.user = user
+    return Perfil(ROL_PACIENTE, paciente)
+
+def perfil_lazy(request):
+    """Perfil que se resuelve recién la primera vez que se usa (ver PerfilMiddleware)"""
+    return SimpleLazyObject(lambda: resolver_perfil(request.user))
+
+def perfil_del_request(request):
+    """Perfil adjuntado por PerfilMiddleware; si el request no pasó por él, se resuelve acá"""
+    if not hasattr(request, 'perfil'):
+        request.perfil = perfil_lazy(request)
+    return request.perfil
+
+def _rol_requerido(rol, function, redirect_field_name, login_url):
+    """Como user_passes_test, pero con el rol ya resuelto en el request"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if perfil_del_request(request).rol == rol:
+                return view_func(request, *args, **kwargs)
+            return redirect_to_login(request.get_full_path(), resolve_url(login_url), redirect_field_name)
+        return wrapper
+    if function:
+        return decorator(function)
+    return decorator
 
 def secretaria_required(function=None, redirect_field_name='next', login_url='/login/'):
     """
     Decorator para vistas que requieren permisos de secretaria
     """
-    actual_decorator = user_passes_test(
-        es_secretaria,
-        login_url=login_url,
-        redirect_field_name=redirect_field_name
-    )
-    if function:
-        return actual_decorator(function)
-    return actual_decorator
+    return _rol_requerido(ROL_SECRETARIA, function, redirect_field_name, login_url)
 
 def paciente_required(function=None, redirect_field_name='next', login_url='/login/'):
     """
     Decorator para vistas que requieren ser paciente
     """
-    actual_decorator = user_passes_test(
-        es_paciente,
-        login_url=login_url,
-        redirect_field_name=redirect_field_name
-    )
-    if function:
-        return actual_decorator(function)
-    return actual_decorator
+    return _rol_requerido(ROL_PACIENTE, function, redirect_field_name, login_url)
 
-def verificar_permiso_turno(view_func):
+def cargar_objeto(queryset, permiso, url_kwarg='pk', nombre=None,
+                  mensaje="No tenés permiso para acceder a este objeto"):
     """
-    Decorator que verifica que un paciente solo pueda ver/modificar sus propios turnos
+    Decorator que carga el objeto de la URL con `queryset` (un modelo o un queryset con
+    los select_related que necesite la vista) en una sola consulta, verifica
+    `permiso(perfil, objeto)` y se lo pasa a la vista como `nombre` en lugar del id.
+    Responde 404 si no existe y PermissionDenied si no hay permiso.
     """
-    @wraps(view_func)
-    def wrapper(request, *args, **kwargs):
-        # Si es staff, tiene acceso total
-        if request.user.is_staff:
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            objeto = get_object_or_404(queryset, pk=kwargs.pop(url_kwarg))
+            if not permiso(perfil_del_request(request), objeto):
+                raise PermissionDenied(mensaje)
+            kwargs[nombre or objeto._meta.model_name] = objeto
             return view_func(request, *args, **kwargs)
-        
-        # Si no es staff, debe ser el dueño del turno
-        turno_id = kwargs.get('turno_id') or kwargs.get('pk')
-        if turno_id:
-            from .models import Turno
-            try:
-                turno = Turno.objects.get(pk=turno_id)
-                if turno.paciente and turno.paciente.user == request.user:
-                    return view_func(request, *args, **kwargs)
-                else:
-                    raise PermissionDenied("No tenés permiso para acceder a este turno")
-            except Turno.DoesNotExist:
-                raise PermissionDenied("El turno no existe")
-        
-        return view_func(request, *args, **kwargs)
-    
-    return wrapper
\ No newline at end of file
+        return wrapper
+    return decorator
+
+def puede_acceder_turno(perfil, turno):
+    """La secretaría accede a todos los turnos; un paciente, solo a los suyos (sin cargar turno.paciente)"""
+    if perfil.rol == ROL_SECRETARIA:
+        return True
+    return perfil.paciente is not None and turno.paciente_id == perfil.paciente.pk
+
+def cargar_turno(*relacionados, url_kwarg='turno_id'):
+    """
+    Decorator para vistas de un turno: lo carga con select_related(*relacionados),
+    verifica que el usuario pueda accederlo y lo pasa a la vista como `turno`.
+    """
+    return cargar_objeto(
+        Turno.objects.select_related(*relacionados), puede_acceder_turno, url_kwarg, 'turno',
+        mensaje="No tenés permiso para acceder a este turno"
+    )
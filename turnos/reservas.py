@@ -0,0 +1,112 @@
+import random
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.utils import timezone
+from .disponibilidad import horarios_disponibles_en_cache
+from .models import Medico, ReservaTemporal, Turno
+from .notificaciones import encolar_confirmacion
+
+class HorarioOcupadoError(Exception):
+    """El horario elegido ya tiene un turno activo"""
+
+class HorarioInvalidoError(Exception):
+    """El horario pedido no existe: médico inexistente o inactivo, fecha pasada o fuera de su atención"""
+
+def _horario_ocupado(turno):
+    return Turno.objects.filter(
+        medico_id=turno.medico_id,
+        fecha=turno.fecha,
+        hora=turno.hora,
+        estado__in=Turno.ESTADOS_ACTIVOS
+    ).exists()
+
+def reservar_turno(turno, intentos=5, espera=0.01, espera_maxima=0.5):
+    """
+    Guarda un turno nuevo con un INSERT atómico que falla si el horario ya está tomado.
+    La exclusión la garantiza la restricción única parcial 'turno_activo_unico', por lo
+    que no hace falta consultar antes ni bloquear filas. Los errores transitorios de la
+    base (bloqueos, deadlocks) se reintentan con espera exponencial y jitter. La
+    confirmación al paciente se encola en la misma transacción y la envía el worker.
+    """
+    for intento in range(intentos):
+        try:
+            try:
+                with transaction.atomic():
+                    turno.save(force_insert=True)
+                    encolar_confirmacion(turno)
+                return turno
+            except IntegrityError:
+                if turno.estado in Turno.ESTADOS_ACTIVOS and _horario_ocupado(turno):
+                    raise HorarioOcupadoError('Este horario ya está ocupado.')
+                raise
+        except OperationalError:
+            if intento == intentos - 1:
+                raise
+            time.sleep(min(espera * 2 ** intento, espera_maxima) * (1 + random.random()))
+
+# ============= RESERVAS TEMPORALES =============
+
+def retener_horario(medico_id, fecha, hora, usuario):
+    """
+    Retiene un horario para el usuario durante RESERVA_TEMPORAL_MINUTOS y devuelve
+    el vencimiento. Si ya lo tenía, lo renueva. Las retenciones vencidas se liberan
+    acá mismo, de forma perezosa, sin depender de un proceso periódico. Lanza
+    HorarioInvalidoError si el horario no es uno de los que ofrece el médico.
+    """
+    if not Medico.objects.filter(pk=medico_id, activo=True).exists():
+        raise HorarioInvalidoError('Médico inexistente o inactivo.')
+    if datetime.combine(fecha, hora) <= datetime.now():
+        raise HorarioInvalidoError('El horario ya pasó.')
+    if hora not in horarios_disponibles_en_cache(medico_id, fecha):
+        if _horario_ocupado(Turno(medico_id=medico_id, fecha=fecha, hora=hora)):
+            raise HorarioOcupadoError('Este horario ya está ocupado.')
+        raise HorarioInvalidoError('El médico no atiende en ese horario.')
+
+    ahora = timezone.now()
+    expira = ahora + timedelta(minutes=settings.RESERVA_TEMPORAL_MINUTOS)
+    ReservaTemporal.objects.filter(expira__lte=ahora).delete()
+
+    propias = ReservaTemporal.objects.filter(medico_id=medico_id, fecha=fecha, hora=hora, usuario=usuario)
+    if not propias.update(expira=expira):
+        try:
+            with transaction.atomic():
+                ReservaTemporal.objects.create(
+                    medico_id=medico_id, fecha=fecha, hora=hora, usuario=usuario, expira=expira
+                )
+        except IntegrityError:
+            raise HorarioOcupadoError('Este horario está siendo reservado por otro paciente.')
+
+    # Cada usuario retiene un solo horario a la vez
+    ReservaTemporal.objects.filter(usuario=usuario).exclude(
+        medico_id=medico_id, fecha=fecha, hora=hora
+    ).delete()
+    return expira
+
+def liberar_horarios(usuario):
+    """Libera las retenciones del usuario, por ejemplo al confirmar la reserva"""
+    ReservaTemporal.objects.filter(usuario=usuario).delete()
+
+def _retenidas(medico_ids, desde, hasta, excepto_usuario=None):
+    retenidas = ReservaTemporal.objects.filter(
+        medico_id__in=medico_ids, fecha__range=(desde, hasta), expira__gt=timezone.now()
+    )
+    if excepto_usuario is not None:
+        retenidas = retenidas.exclude(usuario=excepto_usuario)
+    return retenidas
+
+def horas_retenidas(medico_id, fecha, excepto_usuario=None):
+    """Devuelve las horas de un médico y fecha retenidas (sin vencer) por otros usuarios"""
+    return set(_retenidas([medico_id], fecha, fecha, excepto_usuario).values_list('hora', flat=True))
+
+def horas_retenidas_por_medico(medico_ids, fecha, excepto_usuario=None):
+    """Igual que horas_retenidas para varios médicos, con una sola consulta: {medico_id: horas}"""
+    retenidas = {medico_id: set() for medico_id in medico_ids}
+    for medico_id, hora in _retenidas(medico_ids, fecha, fecha, excepto_usuario).values_list('medico_id', 'hora'):
+        retenidas[medico_id].add(hora)
+    return retenidas
+
+def horarios_retenidos(medico_ids, desde, hasta, excepto_usuario=None):
+    """Horarios retenidos por otros usuarios entre dos fechas, como {(medico_id, fecha, hora)}"""
+    return set(_retenidas(medico_ids, desde, hasta, excepto_usuario).values_list('medico_id', 'fecha', 'hora'))
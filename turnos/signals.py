@@ -0,0 +1,166 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import Cobertura, DisponibilidadMedico, ExcepcionDisponibilidad, Medico, Paciente, Turno
+from .disponibilidad import invalidar_horarios, regenerar_horarios
+from .tablero import invalidar_totales
+from .catalogo import invalidar_catalogo
+from .busqueda import documento_paciente, documento_turno, indexar_turnos, nombre_busqueda
+
+@receiver(post_init, sender=Turno)
+def recordar_horario_original(sender, instance, **kwargs):
+    """Guarda médico y fecha originales para invalidar también el día anterior si cambian"""
+    instance._horario_original = (instance.medico_id, instance.fecha)
+
+@receiver(post_save, sender=Turno)
+@receiver(post_delete, sender=Turno)
+def invalidar_horarios_turno(sender, instance, **kwargs):
+    """Invalida el cache del día del turno al crearlo, modificarlo, cancelarlo o borrarlo"""
+    medico_id, fecha = instance._horario_original
+    if medico_id and fecha and (medico_id, fecha) != (instance.medico_id, instance.fecha):
+        invalidar_horarios(medico_id, fecha)
+    invalidar_horarios(instance.medico_id, instance.fecha)
+    instance._horario_original = (instance.medico_id, instance.fecha)
+
+@receiver(post_init, sender=DisponibilidadMedico)
+def recordar_dia_original(sender, instance, **kwargs):
+    """Guarda médico y día originales para regenerar también el día anterior si cambian"""
+    instance._dia_original = (instance.medico_id, instance.dia_semana)
+
+@receiver(post_save, sender=DisponibilidadMedico)
+@receiver(post_delete, sender=DisponibilidadMedico)
+def regenerar_horarios_disponibilidad(sender, instance, **kwargs):
+    """
+    Regenera los horarios materializados del día de semana afectado (y del anterior si
+    se movió), la cambie quien la cambie: vistas, admin, shell o comandos. También
+    invalida los días cacheados del médico.
+    """
+    medico_id, dia_semana = instance._dia_original
+    if medico_id and dia_semana is not None and (medico_id, dia_semana) != (instance.medico_id, instance.dia_semana):
+        regenerar_horarios(medico_id, dia_semana)
+    regenerar_horarios(instance.medico_id, instance.dia_semana)
+    instance._dia_original = (instance.medico_id, instance.dia_semana)
+
+@receiver(post_save, sender=ExcepcionDisponibilidad)
+@receiver(post_delete, sender=ExcepcionDisponibilidad)
+def invalidar_horarios_excepcion(sender, instance, **kwargs):
+    """Invalida los días cacheados del médico, o de todos si la excepción es de toda la clínica"""
+    if instance.medico_id:
+        invalidar_horarios(instance.medico_id)
+        return
+    for medico_id in Medico.objects.values_list('pk', flat=True):
+        invalidar_horarios(medico_id)
+
+@receiver(post_save, sender=Medico)
+@receiver(post_delete, sender=Medico)
+@receiver(post_save, sender=Paciente)
+@receiver(post_delete, sender=Paciente)
+def invalidar_totales_tablero(sender, instance, **kwargs):
+    """Recalcula los totales del tablero de la secretaría cuando cambian médicos o pacientes"""
+    invalidar_totales()
+
+def tocar_medicos(medicos):
+    """
+    Actualiza fecha_modificacion de los médicos (ids o queryset) para que cambie la
+    versión de sus fragmentos cacheados, y recarga el catálogo de médicos. Es un
+    UPDATE, así que no vuelve a disparar señales.
+    """
+    Medico.objects.filter(pk__in=medicos).update(fecha_modificacion=timezone.now())
+    invalidar_catalogo('medicos')
+
+@receiver(post_save, sender=DisponibilidadMedico)
+@receiver(post_delete, sender=DisponibilidadMedico)
+def tocar_medico_disponibilidad(sender, instance, **kwargs):
+    """Los horarios de atención se muestran en la ficha del médico"""
+    tocar_medicos([instance.medico_id])
+
+@receiver(m2m_changed, sender=Medico.coberturas.through)
+def tocar_medico_coberturas(sender, instance, action, reverse, pk_set, **kwargs):
+    """Coberturas agregadas o quitadas, desde el médico o desde la cobertura"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            tocar_medicos([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        tocar_medicos(pk_set)
+    elif action == 'pre_clear':
+        tocar_medicos(instance.medicos.values('pk'))
+
+@receiver(post_save, sender=Cobertura)
+@receiver(pre_delete, sender=Cobertura)
+def tocar_medicos_cobertura(sender, instance, **kwargs):
+    """El nombre de la cobertura aparece en la ficha de cada médico que la acepta"""
+    tocar_medicos(instance.medicos.values('pk'))
+
+@receiver(post_save, sender=Medico)
+@receiver(post_delete, sender=Medico)
+def invalidar_catalogo_medicos(sender, instance, **kwargs):
+    invalidar_catalogo('medicos')
+
+@receiver(post_save, sender=Cobertura)
+@receiver(post_delete, sender=Cobertura)
+def invalidar_catalogo_coberturas(sender, instance, **kwargs):
+    invalidar_catalogo('coberturas')
+
+# ============= BÚSQUEDA =============
+
+@receiver(pre_save, sender=Paciente)
+def completar_busqueda_paciente(sender, instance, **kwargs):
+    """Calcula nombre y documento de búsqueda; si el documento cambió hay que rehacer el de sus turnos"""
+    documento = documento_paciente(instance)
+    instance._reindexar_turnos = instance.pk is not None and documento != instance.documento_busqueda
+    instance.nombre_busqueda = nombre_busqueda(instance.user)
+    instance.documento_busqueda = documento
+
+@receiver(post_save, sender=Paciente)
+def reindexar_turnos_paciente(sender, instance, **kwargs):
+    if instance._reindexar_turnos:
+        indexar_turnos(Turno.objects.filter(paciente=instance))
+
+@receiver(post_save, sender=User)
+def actualizar_busqueda_usuario(sender, instance, update_fields=None, **kwargs):
+    """El nombre y el email viven en el User: al cambiarlos se reindexa su paciente y sus turnos"""
+    if update_fields is not None and not {'first_name', 'last_name', 'email'} & set(update_fields):
+        # Por ejemplo el last_login del login, que guarda solo ese campo
+        return
+    paciente = Paciente.objects.filter(user=instance).first()
+    if paciente is None:
+        return
+    paciente.user = instance
+    nombre, documento = nombre_busqueda(instance), documento_paciente(paciente)
+    if (nombre, documento) != (paciente.nombre_busqueda, paciente.documento_busqueda):
+        Paciente.objects.filter(pk=paciente.pk).update(
+            nombre_busqueda=nombre, documento_busqueda=documento, fecha_modificacion=timezone.now()
+        )
+        indexar_turnos(Turno.objects.filter(paciente=paciente))
+
+def _claves_busqueda(turno):
+    return (turno.paciente_id, turno.paciente_nombre, turno.paciente_telefono, turno.medico_id)
+
+@receiver(post_init, sender=Turno)
+def recordar_claves_busqueda(sender, instance, **kwargs):
+    instance._claves_busqueda = _claves_busqueda(instance)
+
+@receiver(pre_save, sender=Turno)
+def completar_busqueda_turno(sender, instance, **kwargs):
+    """
+    Recalcula el documento solo si es nuevo o cambió el paciente o el médico: los
+    cambios de estado, que son la mayoría, no consultan paciente ni médico.
+    """
+    if not instance.documento_busqueda or instance._claves_busqueda != _claves_busqueda(instance):
+        instance.documento_busqueda = documento_turno(instance)
+        instance._claves_busqueda = _claves_busqueda(instance)
+
+def _datos_busqueda_medico(medico):
+    return (medico.nombre, medico.apellido, medico.especialidad)
+
+@receiver(post_init, sender=Medico)
+def recordar_datos_busqueda_medico(sender, instance, **kwargs):
+    instance._datos_busqueda = _datos_busqueda_medico(instance)
+
+@receiver(post_save, sender=Medico)
+def reindexar_turnos_medico(sender, instance, created, **kwargs):
+    """Nombre y especialidad del médico forman parte del documento de sus turnos"""
+    if not created and instance._datos_busqueda != _datos_busqueda_medico(instance):
+        indexar_turnos(Turno.objects.filter(medico=instance))
+    instance._datos_busqueda = _datos_busqueda_medico(instance)
@@ -0,0 +1,67 @@
+from datetime import date, datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from .models import Medico, Paciente, Turno
+
+CLAVE_TOTALES = 'tablero:totales'
+
+def consulta_resumen_del_dia(fecha=None, ahora=None):
+    """
+    Consulta del tablero: turnos de un día agrupados por médico, con el total por
+    estado y los ausentes: los marcados como ausentes y los de una hora ya pasada que
+    siguen pendientes o confirmados (nadie los marcó como atendidos y todavía no los
+    cerró `cerrar_turnos`). La usa también verificar_indices.
+    """
+    fecha = fecha or date.today()
+    ahora = ahora or datetime.now()
+    if fecha < ahora.date():
+        vencidos = Q()
+    elif fecha == ahora.date():
+        vencidos = Q(hora__lt=ahora.time())
+    else:
+        vencidos = Q(pk__in=[])
+
+    conteos = {
+        estado: Count('pk', filter=Q(estado=estado))
+        for estado, _ in Turno.ESTADOS
+    }
+    return (
+        Turno.objects.filter(fecha=fecha)
+        .values('medico_id', 'medico__nombre', 'medico__apellido', 'medico__especialidad')
+        .annotate(
+            total=Count('pk'),
+            ausentes=Count('pk', filter=(vencidos & Q(estado__in=Turno.ESTADOS_ACTIVOS)) | Q(estado='ausente')),
+            **conteos
+        )
+        .order_by('-total', 'medico__apellido', 'medico__nombre')
+    )
+
+def resumen_del_dia(fecha=None, ahora=None):
+    """
+    Resumen de turnos de un día para el tablero de la secretaría, en una sola consulta
+    agrupada por médico (consulta_resumen_del_dia).
+    Devuelve (totales por estado, filas por médico ordenadas por carga).
+    """
+    medicos = list(consulta_resumen_del_dia(fecha, ahora))
+    claves = ['total', 'ausentes', *(estado for estado, _ in Turno.ESTADOS)]
+    totales = {clave: sum(fila[clave] for fila in medicos) for clave in claves}
+    return totales, medicos
+
+def totales_generales():
+    """
+    Médicos activos y pacientes registrados. Son COUNT(*) sobre tablas completas, así
+    que se guardan en cache por CACHE_TOTALES_TIMEOUT segundos y se invalidan al crear
+    o borrar médicos y pacientes (ver signals.py).
+    """
+    totales = cache.get(CLAVE_TOTALES)
+    if totales is None:
+        totales = {
+            'medicos_activos': Medico.objects.filter(activo=True).count(),
+            'pacientes_total': Paciente.objects.count(),
+        }
+        cache.set(CLAVE_TOTALES, totales, timeout=settings.CACHE_TOTALES_TIMEOUT)
+    return totales
+
+def invalidar_totales():
+    cache.delete(CLAVE_TOTALES)
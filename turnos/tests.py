@@ -1,3 +1,1736 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, connections
+from django.db.models import QuerySet
+from django.contrib.auth.models import User
+from django.urls import reverse
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from statistics import median
+from time import monotonic, perf_counter
+from .models import (CambioEstadoTurno, Cobertura, Medico, DisponibilidadMedico, ExcepcionDisponibilidad, Horario,
+                     Notificacion, Paciente, ReservaTemporal, Turno)
+from .disponibilidad import (horarios_disponibles, horarios_disponibles_en_cache,
+                             horarios_disponibles_en_cache_por_medico, estadisticas_cache, invalidar_horarios)
+from .reservas import reservar_turno, HorarioOcupadoError
+from . import catalogo
+from .urls import urlpatterns
+from .importacion import importar_pacientes, importar_turnos, leer_csv
+from .tablero import resumen_del_dia, totales_generales
+from .agenda import armar_agenda, rango_agenda, LIBRE, NO_ATIENDE, BLOQUEADO
+from .excepciones import IndiceIntervalos
+from .cierre import cerrar_turnos_vencidos
+from .busqueda import buscar_pacientes, buscar_texto
+from .checks import verificar_triggers_busqueda
+from .forms import DisponibilidadForm, RegistroPacienteForm, TurnoForm, TurnoSecretariaForm
+from .notificaciones import (Enviador, EnviadorArchivo, encolar_confirmacion, procesar_notificaciones,
+                             programar_recordatorios)
 
-# Create your tests here.
+
+def proximo_dia_semana(dia_semana):
+    """Devuelve la próxima fecha futura que cae en el día de semana indicado"""
+    hoy = date.today()
+    return hoy + timedelta(days=(dia_semana - hoy.weekday()) % 7 or 7)
+
+
+class HorariosDisponiblesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('paciente', password='clave')
+        self.client.force_login(self.user)
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.fecha = proximo_dia_semana(0)
+        self.url = reverse('obtener_horarios')
+
+    def consultar(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'medico_id': self.medico.pk, 'fecha': self.fecha.isoformat()})
+        return response, len(ctx.captured_queries)
+
+    def test_excluye_turnos_activos(self):
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=15
+        )
+        Turno.objects.create(medico=self.medico, fecha=self.fecha, hora=time(9, 15), estado='confirmado')
+        Turno.objects.create(medico=self.medico, fecha=self.fecha, hora=time(9, 30), estado='cancelado')
+
+        response, _ = self.consultar()
+
+        self.assertEqual(response.json(), {'horarios': ['09:00', '09:30', '09:45']})
+
+    def test_cantidad_de_consultas_constante(self):
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(8), hora_fin=time(9), duracion_turno=15
+        )
+        _, consultas_dia_corto = self.consultar()
+
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(19), duracion_turno=15
+        )
+        response, consultas_dia_largo = self.consultar()
+
+        self.assertEqual(len(response.json()['horarios']), 44)
+        self.assertEqual(consultas_dia_corto, consultas_dia_largo)
+
+    def test_cache_se_invalida_al_cambiar_turnos(self):
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=30
+        )
+        _, consultas_fallo = self.consultar()
+        response, consultas_acierto = self.consultar()
+        self.assertLess(consultas_acierto, consultas_fallo)
+        self.assertEqual(response.json(), {'horarios': ['09:00', '09:30']})
+
+        turno = Turno.objects.create(medico=self.medico, fecha=self.fecha, hora=time(9))
+        response, _ = self.consultar()
+        self.assertEqual(response.json(), {'horarios': ['09:30']})
+
+        turno.estado = 'cancelado'
+        turno.save()
+        response, _ = self.consultar()
+        self.assertEqual(response.json(), {'horarios': ['09:00', '09:30']})
+
+        self.assertEqual(estadisticas_cache(), {'aciertos': 1, 'fallos': 3, 'tasa_aciertos': 0.25})
+
+    def test_varios_medicos_con_las_consultas_de_uno(self):
+        medicos = [self.medico] + [
+            Medico.objects.create(nombre='Otro', apellido=f'Apellido{i}', especialidad='Clínica Médica',
+                                  matricula=f'MN{i}')
+            for i in range(2, 5)
+        ]
+        for medico in medicos:
+            DisponibilidadMedico.objects.create(
+                medico=medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=30
+            )
+        Turno.objects.create(medico=medicos[1], fecha=self.fecha, hora=time(9))
+        ids = [medico.pk for medico in medicos]
+
+        with CaptureQueriesContext(connection) as ctx:
+            horarios_disponibles_en_cache_por_medico(ids[:1], self.fecha)
+        consultas_uno = len(ctx.captured_queries)
+        cache.clear()
+        with self.assertNumQueries(consultas_uno):
+            horarios = horarios_disponibles_en_cache_por_medico(ids, self.fecha)
+
+        self.assertEqual(horarios[medicos[1].pk], [time(9, 30)])
+        self.assertEqual(
+            horarios, {medico_id: horarios_disponibles(medico_id, self.fecha) for medico_id in ids}
+        )
+        invalidar_horarios(medicos[2].pk)
+        with self.assertNumQueries(consultas_uno):
+            self.assertEqual(horarios_disponibles_en_cache_por_medico(ids, self.fecha), horarios)
+        with self.assertNumQueries(0):
+            horarios_disponibles_en_cache_por_medico(ids, self.fecha)
+
+
+class ProximosHorariosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('paciente', password='clave')
+        self.client.force_login(self.user)
+        self.url = reverse('proximos_horarios')
+        self.lunes = proximo_dia_semana(0)
+        self.martes = self.lunes + timedelta(days=1)
+        self.medicos = []
+        for i, hora_inicio in enumerate([time(10), time(9)]):
+            medico = Medico.objects.create(
+                nombre='Médico', apellido=str(i), especialidad='Cardiología', matricula=f'MN{i}'
+            )
+            DisponibilidadMedico.objects.create(
+                medico=medico, dia_semana=self.lunes.weekday(), hora_inicio=hora_inicio,
+                hora_fin=time(hora_inicio.hour, 30), duracion_turno=15
+            )
+            DisponibilidadMedico.objects.create(
+                medico=medico, dia_semana=self.martes.weekday(), hora_inicio=time(8),
+                hora_fin=time(9), duracion_turno=30
+            )
+            self.medicos.append(medico)
+        Medico.objects.create(nombre='Otro', apellido='X', especialidad='Pediatría', matricula='MN9')
+
+    def test_mezcla_horarios_de_varios_medicos_en_orden(self):
+        primero, segundo = self.medicos
+        Turno.objects.create(medico=segundo, fecha=self.lunes, hora=time(9), estado='pendiente')
+
+        response = self.client.get(self.url, {
+            'especialidad': 'cardiología', 'desde': self.lunes.isoformat(), 'cantidad': 5
+        })
+
+        horarios = [(h['fecha'], h['hora'], h['medico_id']) for h in response.json()['horarios']]
+        lunes, martes = self.lunes.isoformat(), self.martes.isoformat()
+        self.assertEqual(horarios, [
+            (lunes, '09:15', segundo.pk),
+            (lunes, '10:00', primero.pk),
+            (lunes, '10:15', primero.pk),
+            (martes, '08:00', primero.pk),
+            (martes, '08:00', segundo.pk),
+        ])
+
+    def test_usa_horarios_materializados_y_descuenta_retenidos(self):
+        primero, segundo = self.medicos
+        # Con el lunes materializado, el primero ofrece solo lo que está en la tabla
+        Horario.objects.filter(medico=primero, fecha=self.lunes, hora=time(10)).delete()
+        otro = User.objects.create_user('otro')
+        expira = timezone.now() + timedelta(minutes=5)
+        ReservaTemporal.objects.create(medico=segundo, fecha=self.lunes, hora=time(9), usuario=otro, expira=expira)
+        ReservaTemporal.objects.create(medico=segundo, fecha=self.lunes, hora=time(9, 15), usuario=self.user,
+                                       expira=expira)
+
+        response = self.client.get(self.url, {
+            'especialidad': 'Cardiología', 'desde': self.lunes.isoformat(), 'cantidad': 2
+        })
+
+        horarios = [(h['hora'], h['medico_id']) for h in response.json()['horarios']]
+        self.assertEqual(horarios, [('09:15', segundo.pk), ('10:15', primero.pk)])
+
+    def test_cantidad_de_consultas_acotada(self):
+        parametros = {'especialidad': 'Cardiología', 'dias': 90, 'cantidad': 50}
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, parametros)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['horarios']), 50)
+        # sesión + usuario + médicos + retenidos, y por cada ventana de días (7, 14, 28 y
+        # 56 cubren los 90) horarios + disponibilidades + excepciones + turnos
+        self.assertLessEqual(len(ctx.captured_queries), 4 + 4 * 4, [q['sql'][:80] for q in ctx.captured_queries])
+        # Con el cache caliente ya no se calcula ningún día
+        with self.assertNumQueries(4):
+            self.client.get(self.url, parametros)
+
+    def test_requiere_especialidad_o_cobertura(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 400)
+
+    def test_parametros_invalidos(self):
+        for parametros in [{'cobertura_id': 'x'}, {'especialidad': 'Cardiología', 'cantidad': 'diez'},
+                           {'especialidad': 'Cardiología', 'desde': '2024-13-01'}]:
+            with self.subTest(parametros=parametros):
+                self.assertEqual(self.client.get(self.url, parametros).status_code, 400)
+
+        response = self.client.get(self.url, {'especialidad': 'Cardiología', 'desde': self.lunes.isoformat(),
+                                              'cantidad': -3})
+        self.assertEqual(len(response.json()['horarios']), 1)
+
+
+class HorariosMaterializadosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.secretaria = User.objects.create_user('secretaria', password='clave', is_staff=True)
+        self.client.force_login(self.secretaria)
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.lunes = proximo_dia_semana(0)
+
+    def test_alta_y_baja_de_disponibilidad_regeneran_horarios(self):
+        url = reverse('gestionar_disponibilidad', args=[self.medico.pk])
+        self.client.post(url, {
+            'dia_semana': 0, 'hora_inicio': '09:00', 'hora_fin': '10:00', 'duracion_turno': 30
+        })
+
+        horarios = Horario.objects.filter(medico=self.medico, fecha=self.lunes)
+        self.assertEqual(list(horarios.values_list('hora', flat=True)), [time(9), time(9, 30)])
+        self.assertFalse(Horario.objects.exclude(fecha__iso_week_day=1).exists())
+
+        disp = DisponibilidadMedico.objects.get(medico=self.medico)
+        self.client.post(url, {'eliminar_disponibilidad': disp.pk})
+
+        self.assertFalse(Horario.objects.filter(medico=self.medico).exists())
+
+    def test_cambios_fuera_de_la_vista_regeneran_horarios(self):
+        # Como desde el admin o el shell: la regeneración la hacen las señales
+        disp = DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=30
+        )
+        self.assertEqual(horarios_disponibles(self.medico.pk, self.lunes), [time(9), time(9, 30)])
+
+        disp.hora_fin = time(11)
+        disp.save()
+        self.assertEqual(len(horarios_disponibles(self.medico.pk, self.lunes)), 4)
+
+        martes = self.lunes + timedelta(days=1)
+        disp.dia_semana = 1
+        disp.save()
+        self.assertFalse(Horario.objects.filter(medico=self.medico, fecha__iso_week_day=1).exists())
+        self.assertEqual(Horario.objects.filter(medico=self.medico, fecha=martes).count(), 4)
+        self.assertEqual(horarios_disponibles(self.medico.pk, self.lunes), [])
+
+        disp.delete()
+        self.assertEqual(horarios_disponibles(self.medico.pk, martes), [])
+        self.assertFalse(Horario.objects.filter(medico=self.medico).exists())
+
+    def test_horarios_disponibles_lee_la_tabla_materializada(self):
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=30
+        )
+        call_command('generar_horarios', stdout=StringIO())
+        Turno.objects.create(medico=self.medico, fecha=self.lunes, hora=time(9), estado='pendiente')
+
+        lunes_en_horizonte = sum(1 for dias in range(90) if (date.today() + timedelta(days=dias)).weekday() == 0)
+        self.assertEqual(Horario.objects.filter(medico=self.medico).count(), 2 * lunes_en_horizonte)
+        self.assertEqual(horarios_disponibles(self.medico.pk, self.lunes), [time(9, 30)])
+
+
+class ReservaConcurrenteTest(TransactionTestCase):
+    CONCURRENTES = 50
+
+    def setUp(self):
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.fecha = proximo_dia_semana(0)
+
+    def test_un_solo_turno_activo_por_horario(self):
+        resultados = []
+        barrera = threading.Barrier(self.CONCURRENTES)
+
+        def reservar(i):
+            try:
+                barrera.wait()
+                turno = Turno(medico=self.medico, fecha=self.fecha, hora=time(9), paciente_nombre=f'P{i}')
+                reservar_turno(turno, intentos=20)
+                resultados.append('ok')
+            except HorarioOcupadoError:
+                resultados.append('ocupado')
+            except Exception as e:
+                resultados.append(repr(e))
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=reservar, args=(i,)) for i in range(self.CONCURRENTES)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(resultados.count('ok'), 1, resultados)
+        self.assertEqual(resultados.count('ocupado'), self.CONCURRENTES - 1, resultados)
+        self.assertEqual(Turno.objects.filter(estado__in=Turno.ESTADOS_ACTIVOS).count(), 1)
+
+    def test_horario_cancelado_se_puede_volver_a_reservar(self):
+        cancelado = reservar_turno(Turno(medico=self.medico, fecha=self.fecha, hora=time(9)))
+        cancelado.estado = 'cancelado'
+        cancelado.save()
+
+        nuevo = reservar_turno(Turno(medico=self.medico, fecha=self.fecha, hora=time(9)))
+
+        self.assertNotEqual(nuevo.pk, cancelado.pk)
+        with self.assertRaises(HorarioOcupadoError):
+            reservar_turno(Turno(medico=self.medico, fecha=self.fecha, hora=time(9)))
+
+
+class ReservaTemporalTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=30
+        )
+        self.fecha = proximo_dia_semana(0)
+        self.pacientes = []
+        for i in range(2):
+            user = User.objects.create_user(f'paciente{i}', password='clave')
+            Paciente.objects.create(user=user, dni=f'{i}', telefono='1', domicilio='X', numero_afiliado='1')
+            self.pacientes.append(user)
+
+    def retener(self, user, hora='09:00'):
+        self.client.force_login(user)
+        return self.client.post(reverse('retener_horario'), {
+            'medico_id': self.medico.pk, 'fecha': self.fecha.isoformat(), 'hora': hora
+        })
+
+    def horarios(self, user):
+        self.client.force_login(user)
+        response = self.client.get(reverse('obtener_horarios'), {
+            'medico_id': self.medico.pk, 'fecha': self.fecha.isoformat()
+        })
+        return response.json()['horarios']
+
+    def test_horario_retenido_no_se_ofrece_a_otros(self):
+        uno, otro = self.pacientes
+        self.assertEqual(self.retener(uno).status_code, 200)
+
+        self.assertEqual(self.horarios(uno), ['09:00', '09:30'])
+        self.assertEqual(self.horarios(otro), ['09:30'])
+        self.assertEqual(self.retener(otro).status_code, 409)
+
+    def test_rechaza_horarios_que_no_existen(self):
+        uno, _ = self.pacientes
+        self.assertEqual(self.retener(uno, hora='09:10').status_code, 400)
+        self.client.force_login(uno)
+        url = reverse('retener_horario')
+        pasado = proximo_dia_semana(0) - timedelta(days=7)
+        response = self.client.post(url, {'medico_id': self.medico.pk, 'fecha': pasado.isoformat(), 'hora': '09:00'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'medico_id': 999, 'fecha': self.fecha.isoformat(), 'hora': '09:00'})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ReservaTemporal.objects.exists())
+
+        Turno.objects.create(paciente_nombre='Ocupado', medico=self.medico, fecha=self.fecha, hora=time(9))
+        self.assertEqual(self.retener(uno).status_code, 409)
+
+    def test_retencion_vencida_se_libera(self):
+        uno, otro = self.pacientes
+        self.retener(uno)
+        ReservaTemporal.objects.update(expira=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.horarios(otro), ['09:00', '09:30'])
+        self.assertEqual(self.retener(otro).status_code, 200)
+        self.assertEqual(ReservaTemporal.objects.get().usuario, otro)
+
+
+class GestionarTurnosPaginacionTest(TestCase):
+    def setUp(self):
+        self.secretaria = User.objects.create_user('secretaria', password='clave', is_staff=True)
+        self.client.force_login(self.secretaria)
+        cobertura = Cobertura.objects.create(nombre='OSDE')
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        hoy = date.today()
+        for i in range(60):
+            user = User.objects.create_user(f'paciente{i}', first_name='Paciente', last_name=str(i))
+            paciente = Paciente.objects.create(
+                user=user, dni=str(i), telefono='1', domicilio='X', numero_afiliado='1', cobertura=cobertura
+            )
+            # Dos turnos por día y hora repetida en distintos estados para forzar el desempate por id
+            Turno.objects.create(medico=self.medico, paciente=paciente, fecha=hoy - timedelta(days=i // 2),
+                                 hora=time(9), estado='cancelado' if i % 2 else 'completado')
+        for i in range(60):
+            Turno.objects.create(medico=self.medico, paciente_nombre=f'Sin registro {i}',
+                                 fecha=hoy + timedelta(days=i), hora=time(10))
+
+    def pagina(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('gestionar_turnos'), params)
+        return response, len(ctx.captured_queries)
+
+    def test_recorre_todos_los_turnos_sin_repetir_con_consultas_fijas(self):
+        vistos = []
+        consultas = set()
+        self.pagina()  # La primera carga además el catálogo de médicos en memoria
+        response, cantidad = self.pagina()
+        while True:
+            vistos.extend(turno.pk for turno in response.context['turnos'])
+            consultas.add(cantidad)
+            if not response.context['cursor_siguiente']:
+                break
+            response, cantidad = self.pagina(despues=response.context['cursor_siguiente'])
+
+        esperado = list(Turno.objects.order_by('-fecha', '-hora', '-pk').values_list('pk', flat=True))
+        self.assertEqual(vistos, esperado)
+        self.assertEqual(len(consultas), 1)
+
+    def test_volver_a_la_pagina_anterior_y_conservar_filtros(self):
+        primera, _ = self.pagina(estado='cancelado')
+        self.assertIsNone(primera.context['cursor_siguiente'])
+
+        primera, _ = self.pagina()
+        segunda, _ = self.pagina(despues=primera.context['cursor_siguiente'])
+        anterior, _ = self.pagina(antes=segunda.context['cursor_anterior'])
+        self.assertEqual(list(anterior.context['turnos']), list(primera.context['turnos']))
+
+        filtrada, _ = self.pagina(medico=self.medico.pk)
+        self.assertContains(filtrada, f'?medico={self.medico.pk}&despues=')
+
+
+class VerificarIndicesTest(TestCase):
+    def test_consultas_principales_usan_indices(self):
+        salida = StringIO()
+        call_command('verificar_indices', stdout=salida)
+        self.assertNotIn('FALLA', salida.getvalue())
+
+
+class RendimientoVistasTest(TestCase):
+    """
+    Recorre cada URL de turnos/urls.py con cada rol que la usa sobre un conjunto de
+    datos sembrado y verifica una cota de consultas por request. Si se define la variable
+    de entorno REPORTE_RENDIMIENTO, guarda consultas y tiempos en ese archivo JSON para
+    compararlos entre commits con `manage.py comparar_rendimiento`.
+    """
+    MEDICOS = 20
+    PACIENTES = 40
+    REPETICIONES = 5
+
+    # (nombre de URL, rol): (método, cota en frío, cota en caliente). La cota en frío es
+    # para el primer pedido con el cache vacío; la en caliente, para los que le siguen.
+    # Las vistas que atienden a los dos roles se miden con cada uno, porque el perfil
+    # cambia las consultas que hacen.
+    VISTAS = {
+        ('home', 'anonimo'): ('get', 0, 0),
+        ('home', 'paciente'): ('get', 3, 3),
+        ('home', 'secretaria'): ('get', 2, 2),
+        ('registro', 'anonimo'): ('get', 1, 0),
+        ('login', 'anonimo'): ('get', 0, 0),
+        ('logout', 'paciente'): ('get', 4, 4),
+        ('logout', 'secretaria'): ('get', 4, 4),
+        ('paciente_dashboard', 'paciente'): ('get', 4, 4),
+        ('perfil', 'paciente'): ('get', 4, 3),
+        ('mis_turnos', 'paciente'): ('get', 4, 4),
+        ('reservar_turno', 'paciente'): ('get', 5, 3),
+        ('cancelar_turno', 'paciente'): ('get', 4, 4),
+        ('secretaria_dashboard', 'secretaria'): ('get', 5, 3),
+        ('gestionar_medicos', 'secretaria'): ('get', 5, 3),
+        ('crear_medico', 'secretaria'): ('get', 3, 3),
+        ('editar_medico', 'secretaria'): ('get', 5, 5),
+        ('gestionar_disponibilidad', 'secretaria'): ('get', 5, 5),
+        ('gestionar_turnos', 'secretaria'): ('get', 5, 3),
+        ('agenda', 'secretaria'): ('get', 5, 5),
+        ('buscar', 'secretaria'): ('get', 4, 4),
+        ('crear_turno_secretaria', 'secretaria'): ('get', 4, 2),
+        ('importar_csv', 'secretaria'): ('get', 2, 2),
+        ('exportar_turnos', 'secretaria'): ('get', 3, 3),
+        ('obtener_horarios', 'paciente'): ('get', 7, 4),
+        ('obtener_horarios', 'secretaria'): ('get', 7, 4),
+        ('retener_horario', 'paciente'): ('post', 13, 10),
+        ('buscar_pacientes', 'secretaria'): ('get', 3, 3),
+        ('proximos_horarios', 'paciente'): ('get', 8, 4),
+        ('proximos_horarios', 'secretaria'): ('get', 8, 4),
+        ('estadisticas_cache_horarios', 'secretaria'): ('get', 2, 2),
+        ('obtener_horarios_async', 'paciente'): ('get', 7, 4),
+        ('obtener_horarios_async', 'secretaria'): ('get', 7, 4),
+        ('reservar_turno_async', 'paciente'): ('post', 14, 14),
+        ('api_turnos', 'paciente'): ('get', 5, 5),
+        ('api_turnos', 'secretaria'): ('get', 4, 4),
+        ('api_cancelar_turno', 'paciente'): ('post', 5, 5),
+        ('api_cancelar_turno', 'secretaria'): ('post', 4, 4),
+        ('api_medicos', 'paciente'): ('get', 5, 3),
+        ('api_medicos', 'secretaria'): ('get', 4, 2),
+        ('api_coberturas', 'paciente'): ('get', 4, 3),
+        ('api_coberturas', 'secretaria'): ('get', 3, 2),
+    }
+
+    reporte = {}
+
+    @classmethod
+    def setUpTestData(cls):
+        hoy = date.today()
+        coberturas = [Cobertura.objects.create(nombre=f'Cobertura {i}') for i in range(5)]
+        cls.medicos = []
+        for i in range(cls.MEDICOS):
+            medico = Medico.objects.create(
+                nombre=f'Nombre{i}', apellido=f'Apellido{i}', especialidad=f'Especialidad {i % 4}',
+                matricula=f'MN{i}', telefono='11-1234-5678'
+            )
+            medico.coberturas.set(coberturas[:1 + i % 5])
+            for dia in range(5):
+                DisponibilidadMedico.objects.create(
+                    medico=medico, dia_semana=dia, hora_inicio=time(8), hora_fin=time(12), duracion_turno=20
+                )
+            cls.medicos.append(medico)
+
+        pacientes = []
+        for i in range(cls.PACIENTES):
+            user = User.objects.create_user(f'paciente{i}', first_name='Paciente', last_name=str(i))
+            pacientes.append(Paciente.objects.create(
+                user=user, dni=str(i), telefono='1', domicilio='X', numero_afiliado='1',
+                cobertura=coberturas[0]
+            ))
+        cls.paciente = pacientes[0]
+        cls.secretaria = User.objects.create_user('secretaria', is_staff=True)
+
+        for i, paciente in enumerate(pacientes):
+            for j in range(6):
+                Turno.objects.create(
+                    paciente=paciente, medico=cls.medicos[(i + j) % cls.MEDICOS],
+                    fecha=hoy + timedelta(days=j * 3 - 6), hora=time(8 + i // 10, 20 * (j % 3)),
+                    estado='completado' if j < 2 else 'pendiente', motivo='Control'
+                )
+        cls.turno = Turno.objects.filter(paciente=cls.paciente, fecha__gt=hoy + timedelta(days=1)).first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        ruta = os.environ.get('REPORTE_RENDIMIENTO')
+        if ruta and cls.reporte:
+            with open(ruta, 'w') as archivo:
+                json.dump(cls.reporte, archivo, indent=2, sort_keys=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def pedido(self, nombre):
+        """
+        Devuelve (url, datos) para pedir la vista con parámetros válidos del conjunto
+        sembrado. Se llama en cada repetición: las vistas que modifican datos reciben
+        un objeto nuevo para no medirse en el caso en que no hacen nada.
+        """
+        medico = self.medicos[0]
+        fecha = proximo_dia_semana(0).isoformat()
+        argumentos = {
+            'cancelar_turno': [self.turno.pk],
+            'editar_medico': [medico.pk],
+            'gestionar_disponibilidad': [medico.pk],
+        }
+        datos = {
+            'obtener_horarios': {'medico_id': medico.pk, 'fecha': fecha},
+            'retener_horario': {'medico_id': medico.pk, 'fecha': fecha, 'hora': '11:40'},
+            'buscar_pacientes': {'q': '10'},
+            'proximos_horarios': {'cobertura_id': self.paciente.cobertura_id, 'dias': 30},
+            'agenda': {'vista': 'semana'},
+            'buscar': {'q': 'paciente'},
+            'obtener_horarios_async': {'medico_id': f'{medico.pk},{self.medicos[1].pk}', 'fecha': fecha},
+            'reservar_turno_async': {'medico_id': medico.pk, 'fecha': fecha, 'hora': '11:40'},
+            'api_turnos': {'campos': 'id,fecha,hora,estado,medico'},
+        }
+        if nombre == 'api_cancelar_turno':
+            # El de la repetición anterior quedó cancelado y liberó el horario
+            turno = Turno.objects.create(
+                paciente=self.paciente, medico=self.medicos[2], fecha=date.today() + timedelta(days=20),
+                hora=time(9), motivo='Control'
+            )
+            argumentos[nombre] = [turno.pk]
+        return reverse(nombre, args=argumentos.get(nombre)), datos.get(nombre, {})
+
+    def medir(self, nombre, rol):
+        """
+        Pide la vista REPETICIONES veces desde el cache vacío y devuelve las consultas
+        del primer pedido (en frío), el máximo de los siguientes (en caliente) y los tiempos.
+        """
+        metodo, _, _ = self.VISTAS[nombre, rol]
+        usuarios = {'paciente': self.paciente.user, 'secretaria': self.secretaria}
+        if rol in usuarios:
+            self.client.force_login(usuarios[rol])
+        else:
+            self.client.logout()
+        cache.clear()
+
+        consultas, tiempos = [], []
+        for _ in range(self.REPETICIONES):
+            url, datos = self.pedido(nombre)
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = perf_counter()
+                response = getattr(self.client, metodo)(url, datos)
+                if response.streaming:
+                    # Las respuestas por streaming consultan la base recién al consumirse
+                    b''.join(response.streaming_content)
+                tiempos.append((perf_counter() - inicio) * 1000)
+            consultas.append(len(ctx.captured_queries))
+            self.assertLess(response.status_code, 400, (nombre, rol))
+
+            # Las vistas que modifican datos vuelven al estado anterior para que cada
+            # repetición haga el mismo trabajo
+            if nombre == 'logout':
+                self.client.force_login(usuarios[rol])
+            if nombre == 'retener_horario':
+                ReservaTemporal.objects.filter(usuario=usuarios[rol]).delete()
+            if nombre == 'reservar_turno_async':
+                Turno.objects.filter(pk=response.json()['turno_id']).delete()
+        return consultas[0], max(consultas[1:]), tiempos
+
+    def test_todas_las_urls_estan_cubiertas(self):
+        nombres = {patron.name for patron in urlpatterns}
+        self.assertEqual(nombres, {nombre for nombre, _ in self.VISTAS})
+
+    def test_cota_de_consultas_por_vista(self):
+        for (nombre, rol), (_, cota_frio, cota_caliente) in self.VISTAS.items():
+            with self.subTest(vista=nombre, rol=rol):
+                frio, caliente, tiempos = self.medir(nombre, rol)
+                self.reporte[f'{nombre}:{rol}'] = {
+                    'rol': rol,
+                    'consultas': max(frio, caliente),
+                    'consultas_en_caliente': caliente,
+                    'cota_consultas': cota_frio,
+                    'cota_consultas_en_caliente': cota_caliente,
+                    'ms_mediana': round(median(tiempos), 2),
+                    'ms_minimo': round(min(tiempos), 2),
+                }
+                self.assertLessEqual(frio, cota_frio)
+                self.assertLessEqual(caliente, cota_caliente)
+
+
+class SeedClinicTest(TestCase):
+    def test_genera_la_cantidad_pedida_sin_horarios_activos_repetidos(self):
+        cache.clear()
+        # Totales y catálogos ya cacheados antes de generar los datos
+        self.assertEqual(totales_generales(), {'medicos_activos': 0, 'pacientes_total': 0})
+        self.assertEqual(catalogo.medicos(), [])
+        self.assertEqual(catalogo.coberturas(), [])
+        call_command(
+            'seed_clinic', coberturas=3, medicos=4, pacientes=30, turnos=200, lote=50, semilla=1,
+            stdout=StringIO()
+        )
+
+        self.assertEqual(Medico.objects.count(), 4)
+        self.assertEqual(Paciente.objects.count(), 30)
+        self.assertEqual(Turno.objects.count(), 200)
+        self.assertTrue(Horario.objects.exists())
+        self.assertTrue(User.objects.get(username=Paciente.objects.first().user.username).check_password('consultorio'))
+        self.assertEqual(totales_generales(), {'medicos_activos': 4, 'pacientes_total': 30})
+        self.assertEqual(len(catalogo.medicos()), 4)
+        self.assertEqual(len(catalogo.coberturas()), 3)
+
+    def test_rechaza_ocupacion_fuera_de_rango(self):
+        for ocupacion in [0, -0.5, 1.5]:
+            with self.subTest(ocupacion=ocupacion), self.assertRaises(CommandError):
+                call_command('seed_clinic', medicos=1, pacientes=1, turnos=1, ocupacion=ocupacion, stdout=StringIO())
+
+
+class ImportacionCSVTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.secretaria = User.objects.create_user('secretaria', is_staff=True)
+        self.client.force_login(self.secretaria)
+        Cobertura.objects.create(nombre='OSDE')
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+
+    def subir(self, tipo, contenido):
+        archivo = SimpleUploadedFile('datos.csv', contenido.encode('utf-8'), content_type='text/csv')
+        return self.client.post(reverse('importar_csv'), {'tipo': tipo, 'archivo': archivo})
+
+    def test_importa_pacientes_y_reporta_errores_por_fila(self):
+        response = self.subir('pacientes', (
+            'dni,nombre,apellido,email,telefono,domicilio,cobertura,numero_afiliado,categoria\n'
+            '30111222,Ana,Pérez,ana@example.com,11-1,Calle 1,osde,123,A\n'
+            '30111222,Ana,Repetida,,,,,,\n'
+            'abc,Sin,Dni,,,,,,\n'
+            '30333444,Juan,Gómez,,,,Inexistente,,\n'
+            '30555666,Luis,Díaz,,,,,,B\n'
+        ))
+
+        resultado = response.context['resultado']
+        self.assertEqual(resultado.creados, 2)
+        self.assertEqual([linea for linea, _ in resultado.errores], [3, 4, 5])
+        paciente = Paciente.objects.get(dni='30111222')
+        self.assertEqual(paciente.cobertura.nombre, 'OSDE')
+        self.assertFalse(paciente.user.has_usable_password())
+
+    def test_importa_turnos_en_lotes_sin_ocupar_horarios_tomados(self):
+        fecha = proximo_dia_semana(0).isoformat()
+        Turno.objects.create(medico=self.medico, fecha=fecha, hora=time(9), paciente_nombre='Existente')
+        filas = leer_csv(StringIO(
+            'matricula,fecha,hora,dni,paciente_nombre,paciente_telefono,estado,motivo\n'
+            f'MN1,{fecha},09:00,,Ocupado,,,\n'
+            f'MN1,{fecha},09:30,,Nuevo,,,\n'
+            f'MN1,{fecha},09:30,,Repetido,,,\n'
+            f'MN1,{fecha},09:30,,Cancelado,,cancelado,\n'
+            f'MN9,{fecha},10:00,,Sin médico,,,\n'
+            f'MN1,{fecha},10:00,999,,,,\n'
+            f'MN1,{fecha},25:00,,Hora mala,,,\n'
+        ))
+
+        resultado = importar_turnos(filas, lote=2)
+
+        self.assertEqual(resultado.creados, 2)
+        self.assertEqual([linea for linea, _ in resultado.errores], [2, 4, 6, 7, 8])
+        self.assertEqual(Turno.objects.count(), 3)
+
+    def test_rechaza_campos_largos_y_emails_invalidos_por_fila(self):
+        response = self.subir('pacientes', (
+            'dni,nombre,apellido,email,telefono,domicilio,cobertura,numero_afiliado,categoria\n'
+            f'30111222,{"A" * 151},Pérez,,,,,,\n'
+            f'30333444,Juan,Gómez,,{"1" * 21},,,,\n'
+            '30555666,Luis,Díaz,no-es-un-email,,,,,\n'
+            '30777888,Eva,Ruiz,eva@example.com,,,,,\n'
+        ))
+
+        resultado = response.context['resultado']
+        self.assertEqual(resultado.creados, 1)
+        self.assertEqual([linea for linea, _ in resultado.errores], [2, 3, 4])
+
+        fecha = proximo_dia_semana(0).isoformat()
+        resultado = importar_turnos(leer_csv(StringIO(
+            'matricula,fecha,hora,dni,paciente_nombre,paciente_telefono,estado,motivo\n'
+            f'MN1,{fecha},09:00,,{"N" * 201},,,\n'
+        )))
+        self.assertEqual(resultado.creados, 0)
+        self.assertIn('paciente_nombre', resultado.errores[0][1])
+
+    def test_dni_registrado_durante_la_importacion_solo_pierde_su_fila(self):
+        # Otro proceso registra el DNI entre la verificación del lote y el bulk_create
+        User.objects.create_user('30333444')
+        filas = leer_csv(StringIO(
+            'dni,nombre,apellido,email,telefono,domicilio,cobertura,numero_afiliado,categoria\n'
+            '30111222,Ana,Pérez,,,,,,\n'
+            '30333444,Juan,Gómez,,,,,,\n'
+            '30555666,Luis,Díaz,,,,,,\n'
+        ))
+
+        with mock.patch('turnos.importacion._dnis_existentes', return_value=set()):
+            resultado = importar_pacientes(filas)
+
+        self.assertEqual(resultado.creados, 2)
+        self.assertEqual(resultado.errores, [(3, 'Ya existe un paciente con DNI 30333444')])
+        self.assertEqual(set(Paciente.objects.values_list('dni', flat=True)), {'30111222', '30555666'})
+        self.assertEqual(Paciente.objects.get(dni='30555666').nombre_busqueda, 'diaz luis')
+
+    def test_archivo_que_no_es_utf8_es_un_error_del_formulario(self):
+        archivo = SimpleUploadedFile(
+            'datos.csv', 'dni,nombre,apellido\n30111222,José,Pérez\n'.encode('latin-1'), content_type='text/csv'
+        )
+        response = self.client.post(reverse('importar_csv'), {'tipo': 'pacientes', 'archivo': archivo})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['archivo'])
+        self.assertFalse(Paciente.objects.exists())
+
+
+    def importar_archivo(self, contenido, *args):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'pacientes.csv')
+            with open(ruta, 'wb') as archivo:
+                archivo.write(contenido)
+            call_command('importar_csv', 'pacientes', ruta, *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_comando_rechaza_archivo_que_no_es_utf8_antes_de_importar(self):
+        contenido = 'dni,nombre,apellido\n30111222,Ana,Pérez\n'.encode('utf-8') + '30333444,José,Gómez\n'.encode('latin-1')
+        with self.assertRaisesMessage(CommandError, 'no está codificado en UTF-8 (línea 3)'):
+            self.importar_archivo(contenido)
+        self.assertFalse(Paciente.objects.exists())
+
+    def test_comando_informa_lo_importado_si_el_csv_se_corta(self):
+        contenido = f'dni,nombre,apellido\n30111222,Ana,Pérez\n30333444,Juan,"{"x" * 200000}"\n'
+        with self.assertRaisesMessage(CommandError, 'Quedaron importados 1 pacientes'):
+            self.importar_archivo(contenido.encode('utf-8'), '--lote', '1')
+        self.assertTrue(Paciente.objects.filter(dni='30111222').exists())
+
+
+class ExportacionCSVTest(TestCase):
+    def setUp(self):
+        self.secretaria = User.objects.create_user('secretaria', is_staff=True)
+        self.client.force_login(self.secretaria)
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        otro = Medico.objects.create(nombre='Juan', apellido='Pérez', especialidad='Pediatría', matricula='MN2')
+        user = User.objects.create_user('30111222', first_name='Ana', last_name='López')
+        paciente = Paciente.objects.create(
+            user=user, dni='30111222', telefono='1', domicilio='X', numero_afiliado='99',
+            cobertura=Cobertura.objects.create(nombre='OSDE')
+        )
+        hoy = date.today()
+        Turno.objects.create(paciente=paciente, medico=self.medico, fecha=hoy, hora=time(9), estado='completado')
+        Turno.objects.create(paciente_nombre='Sin Registro', medico=self.medico, fecha=hoy, hora=time(10))
+        Turno.objects.create(paciente=paciente, medico=otro, fecha=hoy, hora=time(9))
+
+    def exportar(self, **filtros):
+        response = self.client.get(reverse('exportar_turnos'), filtros)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8').splitlines()
+
+    def test_exporta_con_los_filtros_del_listado(self):
+        lineas = self.exportar(medico=self.medico.pk)
+
+        self.assertEqual(len(lineas), 3)
+        self.assertTrue(lineas[0].startswith('Fecha,Hora,Estado'))
+        self.assertIn('30111222,López,Ana,,OSDE,99', lineas[1])
+        self.assertIn('Sin Registro', lineas[2])
+        self.assertEqual(len(self.exportar(medico=self.medico.pk, estado='pendiente')), 2)
+
+    def test_ignora_parametros_invalidos(self):
+        self.assertEqual(len(self.exportar(fecha='no-es-fecha', medico='abc')), 4)
+
+    def test_comando_escribe_el_mismo_csv(self):
+        salida = StringIO()
+        call_command('exportar_turnos', estado='completado', stdout=salida)
+
+        self.assertEqual(len(salida.getvalue().splitlines()), 2)
+
+
+class TableroSecretariaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.secretaria = User.objects.create_user('secretaria', is_staff=True)
+        self.client.force_login(self.secretaria)
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.otro = Medico.objects.create(nombre='Juan', apellido='Pérez', especialidad='Pediatría', matricula='MN2')
+
+    def crear_turno(self, medico, fecha, hora, estado):
+        return Turno.objects.create(
+            paciente_nombre='Paciente', medico=medico, fecha=fecha, hora=hora, estado=estado
+        )
+
+    def test_resumen_por_estado_medico_y_ausentes(self):
+        hoy = date.today()
+        self.crear_turno(self.medico, hoy, time(8), 'pendiente')
+        self.crear_turno(self.medico, hoy, time(9), 'completado')
+        self.crear_turno(self.medico, hoy, time(11), 'confirmado')
+        self.crear_turno(self.otro, hoy, time(8), 'cancelado')
+        self.crear_turno(self.otro, hoy + timedelta(days=1), time(8), 'pendiente')
+
+        totales, medicos = resumen_del_dia(hoy, ahora=datetime.combine(hoy, time(10)))
+
+        self.assertEqual(totales['total'], 4)
+        self.assertEqual(totales['pendiente'], 1)
+        self.assertEqual(totales['cancelado'], 1)
+        self.assertEqual(totales['ausentes'], 1)
+        self.assertEqual([fila['medico_id'] for fila in medicos], [self.medico.pk, self.otro.pk])
+        self.assertEqual(medicos[0]['total'], 3)
+
+        _, futuros = resumen_del_dia(hoy + timedelta(days=1), ahora=datetime.combine(hoy, time(10)))
+        self.assertEqual(futuros[0]['ausentes'], 0)
+
+        # Los que ya cerró cerrar_turnos siguen contando como ausentes
+        Turno.objects.filter(estado='pendiente', fecha=hoy).update(estado='ausente')
+        totales, _ = resumen_del_dia(hoy, ahora=datetime.combine(hoy, time(10)))
+        self.assertEqual(totales['ausentes'], 1)
+
+    def test_totales_en_cache_se_invalidan_al_crear_pacientes(self):
+        self.assertEqual(self.client.get(reverse('secretaria_dashboard')).context['pacientes_total'], 0)
+        with self.assertNumQueries(0):
+            totales_generales()
+
+        user = User.objects.create_user('30111222')
+        Paciente.objects.create(user=user, dni='30111222', telefono='1', domicilio='X')
+
+        self.assertEqual(self.client.get(reverse('secretaria_dashboard')).context['pacientes_total'], 1)
+
+
+class AgendaTest(TestCase):
+    def setUp(self):
+        self.lunes = proximo_dia_semana(0)
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.otro = Medico.objects.create(nombre='Juan', apellido='Pérez', especialidad='Pediatría', matricula='MN2')
+        Medico.objects.create(nombre='Inactivo', apellido='Ávila', especialidad='X', matricula='MN3', activo=False)
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=30
+        )
+        DisponibilidadMedico.objects.create(
+            medico=self.otro, dia_semana=0, hora_inicio=time(10), hora_fin=time(11), duracion_turno=60
+        )
+        Turno.objects.create(paciente_nombre='Ana López', medico=self.medico, fecha=self.lunes, hora=time(9, 30))
+        # Cargado por fuera de la disponibilidad: igual tiene que aparecer
+        Turno.objects.create(
+            paciente_nombre='Extra', medico=self.otro, fecha=self.lunes + timedelta(days=1), hora=time(18)
+        )
+
+    def test_grilla_con_una_consulta_por_tabla(self):
+        with self.assertNumQueries(3):
+            agenda = armar_agenda(rango_agenda(self.lunes, 'semana'))
+
+        self.assertEqual(len(agenda), 7)
+        lunes = agenda[0]
+        self.assertEqual(lunes['horas'], [time(9), time(9, 30), time(10)])
+        self.assertEqual([medico.pk for medico, _ in lunes['filas']], [self.medico.pk, self.otro.pk])
+        self.assertEqual(lunes['filas'][0][1], [(LIBRE, '', 1), ('pendiente', 'Ana López', 1), (NO_ATIENDE, '', 1)])
+        self.assertEqual(lunes['filas'][1][1], [(NO_ATIENDE, '', 2), (LIBRE, '', 1)])
+
+        martes = agenda[1]
+        self.assertEqual(martes['horas'], [time(18)])
+        self.assertEqual(martes['filas'][0][1], [('pendiente', 'Extra', 1)])
+        self.assertEqual(agenda[2]['filas'], [])
+
+    def test_vista_por_semana(self):
+        self.client.force_login(User.objects.create_user('secretaria', is_staff=True))
+        response = self.client.get(reverse('agenda'), {'vista': 'semana', 'fecha': self.lunes + timedelta(days=3)})
+
+        self.assertEqual(response.context['agenda'][0]['fecha'], self.lunes)
+        self.assertContains(response, 'Ana López')
+
+
+class ExcepcionesDisponibilidadTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lunes = proximo_dia_semana(0)
+        self.medico = Medico.objects.create(
+            nombre='María', apellido='González', especialidad='Clínica Médica', matricula='MN1'
+        )
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(11), duracion_turno=30
+        )
+
+    def test_indice_de_intervalos(self):
+        indice = IndiceIntervalos([(1, 10, 'a'), (3, 4, 'b'), (12, 15, 'c'), (20, 21, 'd')])
+
+        self.assertTrue(indice.superpone(9, 11))
+        self.assertFalse(indice.superpone(10, 12))
+        self.assertFalse(indice.superpone(15, 20))
+        self.assertEqual([dato for _, _, dato in indice.superpuestos(3, 13)], ['a', 'b', 'c'])
+        self.assertEqual(indice.superpuestos(0, 1), [])
+
+    def test_franja_parcial_y_feriado_ocultan_horarios(self):
+        ExcepcionDisponibilidad.objects.create(
+            medico=self.medico, fecha_desde=self.lunes, fecha_hasta=self.lunes,
+            hora_desde=time(9, 45), hora_hasta=time(10, 30)
+        )
+        # El turno de 9:30 dura hasta las 10:00 y se superpone con la franja bloqueada
+        self.assertEqual(horarios_disponibles(self.medico.pk, self.lunes), [time(9), time(10, 30)])
+
+        siguiente = self.lunes + timedelta(days=7)
+        ExcepcionDisponibilidad.objects.create(fecha_desde=siguiente, fecha_hasta=siguiente, motivo='Feriado')
+        self.assertEqual(horarios_disponibles(self.medico.pk, siguiente), [])
+
+    def test_crear_excepcion_invalida_el_cache(self):
+        self.client.force_login(User.objects.create_user('paciente'))
+        url = reverse('obtener_horarios')
+        datos = {'medico_id': self.medico.pk, 'fecha': self.lunes.isoformat()}
+        self.assertEqual(len(self.client.get(url, datos).json()['horarios']), 4)
+
+        ExcepcionDisponibilidad.objects.create(
+            medico=self.medico, fecha_desde=self.lunes - timedelta(days=3), fecha_hasta=self.lunes + timedelta(days=3),
+            motivo='Vacaciones'
+        )
+
+        self.assertEqual(self.client.get(url, datos).json()['horarios'], [])
+        agenda = armar_agenda([self.lunes])
+        self.assertEqual(agenda[0]['filas'][0][1], [(BLOQUEADO, '', 4)])
+
+    def test_formulario_rechaza_franjas_superpuestas(self):
+        form = DisponibilidadForm(
+            {'dia_semana': 0, 'hora_inicio': '10:30', 'hora_fin': '12:00', 'duracion_turno': 30},
+            medico=self.medico
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('09:00 a 11:00', form.non_field_errors()[0])
+
+        form = DisponibilidadForm(
+            {'dia_semana': 0, 'hora_inicio': '11:00', 'hora_fin': '12:00', 'duracion_turno': 30},
+            medico=self.medico
+        )
+        self.assertTrue(form.is_valid())
+
+
+class VistasAsincronasTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lunes = proximo_dia_semana(0)
+        cobertura = Cobertura.objects.create(nombre='OSDE')
+        self.medicos = []
+        for i in range(3):
+            medico = Medico.objects.create(
+                nombre=f'Nombre{i}', apellido=f'Apellido{i}', especialidad='Clínica Médica', matricula=f'MN{i}'
+            )
+            medico.coberturas.add(cobertura)
+            DisponibilidadMedico.objects.create(
+                medico=medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=20
+            )
+            self.medicos.append(medico)
+        Turno.objects.create(paciente_nombre='Ocupado', medico=self.medicos[1], fecha=self.lunes, hora=time(9, 20))
+        user = User.objects.create_user('paciente')
+        Paciente.objects.create(user=user, dni='1', telefono='1', domicilio='X', cobertura=cobertura)
+        self.async_client.force_login(user)
+
+    async def test_horarios_de_varios_medicos(self):
+        ids = ','.join(str(medico.pk) for medico in self.medicos)
+        response = await self.async_client.get(
+            reverse('obtener_horarios_async'), {'medico_id': ids, 'fecha': self.lunes.isoformat()}
+        )
+
+        horarios = response.json()['medicos']
+        self.assertEqual(horarios[str(self.medicos[0].pk)], ['09:00', '09:20', '09:40'])
+        self.assertEqual(horarios[str(self.medicos[1].pk)], ['09:00', '09:40'])
+
+    async def test_reserva_y_rechaza_horario_ocupado(self):
+        url = reverse('reservar_turno_async')
+        datos = {'medico_id': self.medicos[0].pk, 'fecha': self.lunes.isoformat(), 'hora': '09:20'}
+
+        response = await self.async_client.post(url, datos)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await Turno.objects.filter(pk=response.json()['turno_id'], estado='pendiente').aexists())
+
+        self.assertEqual((await self.async_client.post(url, datos)).status_code, 409)
+        self.assertEqual((await self.async_client.post(url, {**datos, 'hora': '09:10'})).status_code, 409)
+        self.assertEqual((await self.async_client.get(url)).status_code, 405)
+
+    async def test_requiere_autenticacion(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(
+            reverse('obtener_horarios_async'), {'medico_id': self.medicos[0].pk, 'fecha': self.lunes.isoformat()}
+        )
+        self.assertEqual(response.status_code, 401)
+
+
+class EnviadorQueFalla(Enviador):
+    def enviar(self, notificacion):
+        raise ConnectionError('proveedor caído')
+
+
+class NotificacionesTest(TestCase):
+    def setUp(self):
+        self.medico = Medico.objects.create(
+            nombre='Juan', apellido='Pérez', especialidad='Clínica Médica', matricula='MN1'
+        )
+        user = User.objects.create_user('paciente', email='paciente@example.com')
+        self.paciente = Paciente.objects.create(user=user, dni='1', telefono='1155550000', domicilio='X')
+        self.ahora = timezone.now()
+        self.archivo = os.path.join(os.path.dirname(__file__), 'notificaciones_test.jsonl')
+        self.addCleanup(lambda: os.path.exists(self.archivo) and os.remove(self.archivo))
+
+    def turno_en(self, horas, **kwargs):
+        inicio = timezone.localtime(self.ahora + timedelta(hours=horas))
+        return Turno.objects.create(
+            paciente=self.paciente, medico=self.medico, fecha=inicio.date(),
+            hora=inicio.time().replace(second=0, microsecond=0), **kwargs
+        )
+
+    def test_reservar_encola_confirmacion_por_email_y_sms(self):
+        manana = timezone.localtime(self.ahora) + timedelta(days=1)
+        turno = reservar_turno(Turno(paciente=self.paciente, medico=self.medico, fecha=manana.date(), hora=time(10)))
+
+        avisos = Notificacion.objects.filter(turno=turno, tipo='confirmacion')
+        self.assertEqual(
+            sorted(avisos.values_list('canal', 'destinatario')),
+            [('email', 'paciente@example.com'), ('sms', '1155550000')]
+        )
+        self.assertTrue(all(aviso.estado == 'pendiente' for aviso in avisos))
+
+    def test_worker_envia_una_sola_vez(self):
+        turno = self.turno_en(48)
+        encolar_confirmacion(turno)
+        encolar_confirmacion(turno)
+
+        resultado = procesar_notificaciones(EnviadorArchivo(self.archivo))
+        self.assertEqual(resultado['enviadas'], 2)
+        self.assertEqual(procesar_notificaciones(EnviadorArchivo(self.archivo))['enviadas'], 0)
+
+        with open(self.archivo, encoding='utf-8') as archivo:
+            lineas = [json.loads(linea) for linea in archivo]
+        self.assertEqual(len(lineas), 2)
+        self.assertIn('Pérez, Juan', lineas[0]['mensaje'])
+        self.assertEqual(Notificacion.objects.filter(estado='enviada').count(), 2)
+
+    def test_reintentos_con_espera_y_fallida(self):
+        encolar_confirmacion(self.turno_en(48))
+        self.ahora = timezone.now()
+
+        resultado = procesar_notificaciones(EnviadorQueFalla(), ahora=self.ahora)
+        self.assertEqual(resultado['reintentos'], 2)
+        aviso = Notificacion.objects.filter(canal='email').get()
+        self.assertEqual(aviso.intentos, 1)
+        self.assertEqual(aviso.ultimo_error, 'proveedor caído')
+        self.assertGreater(aviso.programada_para, self.ahora)
+        # Antes de la espera no se vuelve a intentar
+        self.assertEqual(sum(procesar_notificaciones(EnviadorQueFalla(), ahora=self.ahora).values()), 0)
+
+        momento = self.ahora
+        for _ in range(settings.NOTIFICACIONES_MAX_INTENTOS - 1):
+            momento += timedelta(days=1)
+            procesar_notificaciones(EnviadorQueFalla(), ahora=momento)
+        self.assertEqual(Notificacion.objects.filter(estado='fallida').count(), 2)
+
+    def test_recordatorios_de_las_proximas_24_horas(self):
+        proximo = self.turno_en(3)
+        self.turno_en(30)
+        cancelado = self.turno_en(5, estado='cancelado')
+
+        self.assertEqual(programar_recordatorios(ahora=self.ahora), 2)
+        self.assertEqual(programar_recordatorios(ahora=self.ahora), 0)
+        self.assertEqual(
+            set(Notificacion.objects.filter(tipo='recordatorio').values_list('turno_id', flat=True)), {proximo.pk}
+        )
+        self.assertFalse(Notificacion.objects.filter(turno=cancelado).exists())
+
+        # Si el turno se cancela antes del envío, el recordatorio no sale
+        proximo.estado = 'cancelado'
+        proximo.save()
+        resultado = procesar_notificaciones(EnviadorArchivo(self.archivo), ahora=self.ahora)
+        self.assertEqual(resultado, {'enviadas': 0, 'reintentos': 0, 'fallidas': 0, 'canceladas': 2})
+
+    def test_turno_reprogramado_recibe_recordatorio_del_nuevo_horario(self):
+        turno = self.turno_en(3)
+        self.assertEqual(programar_recordatorios(ahora=self.ahora), 2)
+
+        nuevo = timezone.localtime(self.ahora + timedelta(hours=6))
+        turno.fecha, turno.hora = nuevo.date(), nuevo.time().replace(second=0, microsecond=0)
+        turno.save()
+        self.assertEqual(programar_recordatorios(ahora=self.ahora), 2)
+
+        # Los del horario anterior se cancelan; salen solo los del nuevo
+        resultado = procesar_notificaciones(EnviadorArchivo(self.archivo), ahora=self.ahora)
+        self.assertEqual(resultado, {'enviadas': 2, 'reintentos': 0, 'fallidas': 0, 'canceladas': 2})
+        with open(self.archivo, encoding='utf-8') as archivo:
+            claves = [json.loads(linea)['clave'] for linea in archivo]
+        self.assertTrue(all(clave.endswith(f'{turno.fecha:%Y%m%d}{turno.hora:%H%M}') for clave in claves))
+
+    def test_lotes_con_consultas_constantes(self):
+        Notificacion.objects.bulk_create([
+            Notificacion(
+                clave=f'prueba:{i}', tipo='confirmacion', canal='sms', destinatario='1',
+                asunto='A', mensaje='M', programada_para=self.ahora
+            )
+            for i in range(2000)
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = procesar_notificaciones(EnviadorArchivo(self.archivo), lote=1000, ahora=self.ahora)
+        self.assertEqual(resultado['enviadas'], 1000)
+        # Tomar ids, marcarlos, leerlos y un UPDATE por resultado
+        self.assertLessEqual(len(ctx.captured_queries), 6)
+
+        out = StringIO()
+        with override_settings(NOTIFICACIONES_ARCHIVO=self.archivo):
+            call_command('procesar_notificaciones', '--una-vez', '--lote', '500',
+                         '--enviador', 'turnos.notificaciones.EnviadorArchivo', stdout=out)
+        self.assertIn('1000 enviada(s)', out.getvalue())
+        self.assertFalse(Notificacion.objects.filter(estado='pendiente').exists())
+
+
+class CierreTurnosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.medico = Medico.objects.create(
+            nombre='Juan', apellido='Pérez', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.ahora = timezone.make_aware(datetime.combine(date.today(), time(12)))
+
+    def crear_turno(self, fecha, hora, estado):
+        return Turno.objects.create(paciente_nombre='Paciente', medico=self.medico, fecha=fecha, hora=hora, estado=estado)
+
+    def test_cierra_vencidos_en_lotes_con_auditoria(self):
+        ayer = date.today() - timedelta(days=1)
+        confirmados = [self.crear_turno(ayer, time(8, i), 'confirmado') for i in range(5)]
+        pendiente = self.crear_turno(ayer, time(9), 'pendiente')
+        cancelado = self.crear_turno(ayer, time(10), 'cancelado')
+        reciente = self.crear_turno(date.today(), time(11), 'confirmado')
+        futuro = self.crear_turno(date.today() + timedelta(days=1), time(9), 'pendiente')
+
+        ejecucion, movidos = cerrar_turnos_vencidos(ahora=self.ahora, gracia=2, lote=2)
+
+        self.assertEqual(movidos, {'completado': 5, 'ausente': 1})
+        estados = dict(Turno.objects.values_list('pk', 'estado'))
+        self.assertTrue(all(estados[turno.pk] == 'completado' for turno in confirmados))
+        self.assertEqual(estados[pendiente.pk], 'ausente')
+        self.assertEqual(estados[cancelado.pk], 'cancelado')
+        # Dentro de la gracia o en el futuro no se tocan
+        self.assertEqual(estados[reciente.pk], 'confirmado')
+        self.assertEqual(estados[futuro.pk], 'pendiente')
+
+        cambios = CambioEstadoTurno.objects.filter(ejecucion=ejecucion)
+        self.assertEqual(cambios.count(), 6)
+        self.assertEqual(cambios.get(turno=pendiente).estado_anterior, 'pendiente')
+
+        # Volver a correrlo no encuentra nada
+        self.assertEqual(cerrar_turnos_vencidos(ahora=self.ahora, gracia=2)[1], {'completado': 0, 'ausente': 0})
+
+    def test_audita_solo_los_turnos_que_cambiaron(self):
+        ayer = date.today() - timedelta(days=1)
+        turnos = [self.crear_turno(ayer, time(8, i), 'confirmado') for i in range(3)]
+        update = QuerySet.update
+
+        def cancelar_antes(queryset, **kwargs):
+            # La secretaría cancela uno entre el SELECT del lote y el UPDATE
+            with connection.cursor() as cursor:
+                cursor.execute("UPDATE turnos_turno SET estado = 'cancelado' WHERE id = %s", [turnos[0].pk])
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', cancelar_antes):
+            ejecucion, movidos = cerrar_turnos_vencidos(ahora=self.ahora, gracia=2, lote=3)
+
+        self.assertEqual(movidos['completado'], 2)
+        self.assertEqual(
+            set(CambioEstadoTurno.objects.filter(ejecucion=ejecucion).values_list('turno_id', flat=True)),
+            {turnos[1].pk, turnos[2].pk}
+        )
+
+    def test_invalida_horarios_del_dia(self):
+        hoy = date.today()
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=hoy.weekday(), hora_inicio=time(8), hora_fin=time(9), duracion_turno=30
+        )
+        turno = self.crear_turno(hoy, time(8), 'pendiente')
+        horarios_disponibles_en_cache(self.medico.pk, hoy)
+        with self.assertNumQueries(0):
+            horarios_disponibles_en_cache(self.medico.pk, hoy)
+
+        cerrar_turnos_vencidos(ahora=self.ahora, gracia=2)
+
+        turno.refresh_from_db()
+        self.assertEqual(turno.estado, 'ausente')
+        with CaptureQueriesContext(connection) as ctx:
+            horarios_disponibles_en_cache(self.medico.pk, hoy)
+        self.assertGreater(len(ctx.captured_queries), 0)
+
+    def test_comando(self):
+        self.crear_turno(date.today() - timedelta(days=3), time(9), 'confirmado')
+        out = StringIO()
+        call_command('cerrar_turnos', '--simular', stdout=out)
+        self.assertIn('1 turno(s) confirmado(s) pasarían a completado', out.getvalue())
+        self.assertFalse(CambioEstadoTurno.objects.exists())
+
+        call_command('cerrar_turnos', '--pausa', '0', stdout=out)
+        self.assertIn('1 completado(s), 0 ausente(s)', out.getvalue())
+
+
+class PerfilMiddlewareTest(TestCase):
+    def setUp(self):
+        cobertura = Cobertura.objects.create(nombre='OSDE')
+        self.medico = Medico.objects.create(
+            nombre='Juan', apellido='Pérez', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.pacientes = []
+        for dni in ['1', '2']:
+            user = User.objects.create_user(dni)
+            self.pacientes.append(
+                Paciente.objects.create(user=user, dni=dni, telefono='1', domicilio='X', cobertura=cobertura)
+            )
+        self.turno = Turno.objects.create(
+            paciente=self.pacientes[0], medico=self.medico,
+            fecha=date.today() + timedelta(days=5), hora=time(10)
+        )
+
+    def test_rol_y_paciente_una_sola_vez(self):
+        self.client.force_login(self.pacientes[0].user)
+        response = self.client.get(reverse('perfil'))
+        perfil = response.wsgi_request.perfil
+        self.assertEqual(perfil.rol, 'paciente')
+        self.assertEqual(perfil.paciente, self.pacientes[0])
+        # La cobertura y el usuario vienen con el perfil
+        with self.assertNumQueries(0):
+            perfil.paciente.cobertura.nombre
+            response.wsgi_request.user.paciente
+
+    def test_roles_redirigen_al_login(self):
+        secretaria = User.objects.create_user('secretaria', is_staff=True)
+        self.client.force_login(secretaria)
+        self.assertRedirects(
+            self.client.get(reverse('perfil')), '/login/?next=' + reverse('perfil'), fetch_redirect_response=False
+        )
+        self.assertRedirects(self.client.get(reverse('home')), reverse('secretaria_dashboard'),
+                             fetch_redirect_response=False)
+
+        self.client.force_login(self.pacientes[0].user)
+        self.assertEqual(self.client.get(reverse('secretaria_dashboard')).status_code, 302)
+        self.assertRedirects(self.client.get(reverse('home')), reverse('paciente_dashboard'),
+                             fetch_redirect_response=False)
+
+    def test_turno_de_otro_paciente(self):
+        url = reverse('cancelar_turno', args=[self.turno.pk])
+        self.client.force_login(self.pacientes[1].user)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(reverse('cancelar_turno', args=[9999])).status_code, 404)
+
+        self.client.force_login(self.pacientes[0].user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class FichasMedicosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.osde = Cobertura.objects.create(nombre='OSDE')
+        self.secretaria = User.objects.create_user('secretaria', is_staff=True)
+        self.client.force_login(self.secretaria)
+
+    def crear_medicos(self, cantidad, desde=0):
+        medicos = Medico.objects.bulk_create([
+            Medico(nombre=f'Nombre{i}', apellido=f'Apellido{i:03d}', especialidad='Clínica', matricula=f'MN{i}')
+            for i in range(desde, desde + cantidad)
+        ])
+        Medico.coberturas.through.objects.bulk_create([
+            Medico.coberturas.through(medico_id=medico.pk, cobertura_id=self.osde.pk) for medico in medicos
+        ])
+        DisponibilidadMedico.objects.bulk_create([
+            DisponibilidadMedico(medico=medico, dia_semana=dia, hora_inicio=time(9), hora_fin=time(12), duracion_turno=30)
+            for medico in medicos for dia in range(5)
+        ])
+        return medicos
+
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_consultas_fijas_sin_importar_cantidad_de_medicos(self):
+        url = reverse('gestionar_medicos')
+        self.crear_medicos(2)
+        pocos, _ = self.consultas(url)
+        self.crear_medicos(198, desde=2)
+        cache.clear()
+        muchos, response = self.consultas(url)
+
+        self.assertEqual(muchos, pocos)
+        self.assertContains(response, 'Apellido199, Nombre199')
+        self.assertContains(response, '+2 más', count=200)
+
+    def test_fichas_en_cache_no_consultan_coberturas_ni_disponibilidades(self):
+        url = reverse('gestionar_medicos')
+        self.crear_medicos(20)
+        self.consultas(url)
+        medico = Medico.objects.order_by('apellido').first()
+        medico.especialidad = 'Pediatría'
+        medico.save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        # Solo se prefetchean las relaciones del médico cuya ficha cambió
+        relaciones = [q['sql'] for q in ctx.captured_queries if 'turnos_disponibilidadmedico' in q['sql']]
+        self.assertEqual(len(relaciones), 1)
+        self.assertIn(f'IN ({medico.pk})', relaciones[0])
+        self.assertContains(response, 'Pediatría')
+        self.assertContains(response, 'Apellido019, Nombre19')
+
+    def test_ficha_se_actualiza_al_cambiar_el_medico(self):
+        medico = self.crear_medicos(1)[0]
+        url = reverse('gestionar_medicos')
+        self.assertNotContains(self.client.get(url), 'Swiss Medical')
+
+        medico.coberturas.add(Cobertura.objects.create(nombre='Swiss Medical'))
+        self.assertContains(self.client.get(url), 'Swiss Medical')
+
+        DisponibilidadMedico.objects.filter(medico=medico).delete()
+        self.assertContains(self.client.get(url), 'Sin horarios configurados')
+
+        Cobertura.objects.filter(nombre='OSDE').update(nombre='OSDE Binario')
+        self.osde.refresh_from_db()
+        self.osde.save()
+        self.assertContains(self.client.get(url), 'OSDE Binario')
+
+        medico.especialidad = 'Pediatría'
+        medico.save()
+        self.assertContains(self.client.get(url), 'Pediatría')
+
+    def test_reservar_turno_con_fichas_en_cache(self):
+        self.crear_medicos(30)
+        user = User.objects.create_user('paciente')
+        Paciente.objects.create(user=user, dni='1', telefono='1', domicilio='X', cobertura=self.osde)
+        self.client.force_login(user)
+
+        url = reverse('reservar_turno')
+        self.consultas(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        # Con el catálogo y las fichas en cache, la página no lee médicos ni coberturas
+        self.assertFalse([q for q in ctx.captured_queries if 'turnos_medico' in q['sql']])
+        self.assertContains(response, 'Apellido029, Nombre29')
+
+
+class CatalogosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.osde = Cobertura.objects.create(nombre='OSDE')
+        self.baja = Cobertura.objects.create(nombre='Dada de baja', activa=False)
+        self.medico = Medico.objects.create(
+            nombre='Juan', apellido='Pérez', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.medico.coberturas.add(self.osde)
+        self.otro = Medico.objects.create(nombre='Ana', apellido='Gómez', especialidad='Pediatría', matricula='MN2')
+
+    def test_formularios_sin_consultas_para_las_opciones(self):
+        # La primera vez se cargan los catálogos
+        str(RegistroPacienteForm())
+        str(TurnoForm())
+        with self.assertNumQueries(0):
+            html = str(RegistroPacienteForm())
+            form = TurnoForm(data={
+                'medico': self.medico.pk, 'fecha': date.today().isoformat(), 'hora': '10:00'
+            }, paciente=Paciente(cobertura=self.osde))
+            self.assertEqual(form.fields['medico'].clean(self.medico.pk), self.medico)
+        self.assertIn('OSDE', html)
+        self.assertNotIn('Dada de baja', html)
+        # Solo los médicos que aceptan la cobertura del paciente
+        self.assertEqual([pk for pk, _ in form.fields['medico'].choices if pk], [self.medico.pk])
+        with self.assertRaises(ValidationError):
+            form.fields['medico'].clean(self.otro.pk)
+
+    def test_se_recarga_al_modificar(self):
+        form = RegistroPacienteForm
+        self.assertNotIn('Swiss Medical', str(form()))
+        Cobertura.objects.create(nombre='Swiss Medical')
+        self.assertIn('Swiss Medical', str(form()))
+
+        self.otro.coberturas.add(self.osde)
+        turno_form = TurnoForm(paciente=Paciente(cobertura=self.osde))
+        self.assertEqual(len([pk for pk, _ in turno_form.fields['medico'].choices if pk]), 2)
+
+        self.otro.activo = False
+        self.otro.save()
+        turno_form = TurnoForm(paciente=Paciente(cobertura=self.osde))
+        self.assertEqual([pk for pk, _ in turno_form.fields['medico'].choices if pk], [self.medico.pk])
+
+    def test_cambios_de_otro_proceso(self):
+        # Un UPDATE no dispara señales: es lo que ve un proceso cuando el cambio lo hizo otro
+        self.assertEqual(len(catalogo.medicos()), 2)
+        Medico.objects.filter(pk=self.medico.pk).update(activo=False)
+        self.assertEqual(len(catalogo.medicos()), 2)
+
+        # La reserva se valida contra la base aunque el catálogo siga atrasado
+        form = TurnoForm(data={
+            'medico': self.medico.pk, 'fecha': (date.today() + timedelta(days=1)).isoformat(), 'hora': '10:00'
+        }, paciente=Paciente(cobertura=self.osde))
+        self.assertFalse(form.is_valid())
+        self.assertIn('medico', form.errors)
+
+        # Y la copia en memoria se recarga al vencer, aunque la versión no haya cambiado
+        with mock.patch('turnos.catalogo.time.monotonic', return_value=monotonic() + 3600):
+            self.assertEqual(catalogo.medicos(), [self.otro])
+
+
+class ApiTurnosTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lunes = proximo_dia_semana(0)
+        self.osde = Cobertura.objects.create(nombre='OSDE')
+        self.medico = Medico.objects.create(
+            nombre='Juan', apellido='Pérez', especialidad='Clínica Médica', matricula='MN1'
+        )
+        self.medico.coberturas.add(self.osde)
+        DisponibilidadMedico.objects.create(
+            medico=self.medico, dia_semana=0, hora_inicio=time(9), hora_fin=time(10), duracion_turno=20
+        )
+        user = User.objects.create_user('paciente', first_name='Ana', last_name='López')
+        self.paciente = Paciente.objects.create(user=user, dni='1', telefono='1', domicilio='X', cobertura=self.osde)
+        otro = User.objects.create_user('otro')
+        self.otro = Paciente.objects.create(user=otro, dni='2', telefono='2', domicilio='Y', cobertura=self.osde)
+        self.turnos = [
+            Turno.objects.create(paciente=self.paciente, medico=self.medico, fecha=self.lunes, hora=time(9, 20 * i))
+            for i in range(3)
+        ]
+        Turno.objects.create(paciente=self.otro, medico=self.medico, fecha=self.lunes + timedelta(days=7), hora=time(9))
+        self.client.force_login(user)
+
+    def test_campos_y_cursor(self):
+        url = reverse('api_turnos')
+        datos = self.client.get(url, {'campos': 'id,hora,medico', 'limite': 2}).json()
+        # Solo los turnos del paciente, del más nuevo al más viejo
+        self.assertEqual(datos['resultados'], [
+            {'id': self.turnos[2].pk, 'hora': '09:40', 'medico': 'Pérez, Juan'},
+            {'id': self.turnos[1].pk, 'hora': '09:20', 'medico': 'Pérez, Juan'},
+        ])
+        response = self.client.get(url, {'campos': 'id', 'limite': 2, 'despues': datos['siguiente']})
+        self.assertEqual(response.json()['resultados'], [{'id': self.turnos[0].pk}])
+        self.assertIsNone(response.json()['siguiente'])
+
+        self.assertEqual(self.client.get(url, {'campos': 'id,clave'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limite': 1000}).status_code, 400)
+
+    def test_etag_devuelve_304_hasta_que_cambia_un_turno(self):
+        url = reverse('api_turnos')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(4):
+            # Sesión, usuario, perfil y el agregado del ETag: el listado no se consulta
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.turnos[0].motivo = 'Control'
+        self.turnos[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_cambia_con_el_medico_o_el_paciente_si_se_piden_sus_campos(self):
+        url = reverse('api_turnos')
+        etag_nombres = self.client.get(url, {'campos': 'id,medico,paciente'})['ETag']
+        etag_ids = self.client.get(url, {'campos': 'id,medico_id'})['ETag']
+
+        self.medico.apellido = 'Pereyra'
+        self.medico.save()
+        response = self.client.get(url, {'campos': 'id,medico,paciente'}, HTTP_IF_NONE_MATCH=etag_nombres)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resultados'][0]['medico'], 'Pereyra, Juan')
+        # Sin campos del médico el listado no cambió
+        self.assertEqual(self.client.get(url, {'campos': 'id,medico_id'}, HTTP_IF_NONE_MATCH=etag_ids).status_code, 304)
+
+        etag_nombres = response['ETag']
+        self.paciente.user.first_name = 'Anabel'
+        self.paciente.user.save()
+        response = self.client.get(url, {'campos': 'id,medico,paciente'}, HTTP_IF_NONE_MATCH=etag_nombres)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['resultados'][0]['paciente'], 'Anabel López')
+
+    def test_crear_turno(self):
+        url = reverse('api_turnos')
+        datos = {'medico': self.medico.pk, 'fecha': self.lunes.isoformat(), 'hora': '09:00'}
+        Turno.objects.filter(pk=self.turnos[0].pk).delete()
+
+        response = self.client.post(url, datos)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['paciente_id'], self.paciente.pk)
+        self.assertEqual(self.client.post(url, datos).status_code, 409)
+        response = self.client.post(url, {**datos, 'medico': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('medico', response.json()['campos'])
+
+    def test_cancelar_turno(self):
+        url = reverse('api_cancelar_turno', args=[self.turnos[0].pk])
+        self.assertEqual(self.client.post(url).json()['estado'], 'cancelado')
+        # Repetir el pedido no es un error
+        self.assertEqual(self.client.post(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+    def test_cancelar_turno_ajeno_o_inexistente_responde_json(self):
+        ajeno = Turno.objects.get(paciente=self.otro)
+        response = self.client.post(reverse('api_cancelar_turno', args=[ajeno.pk]))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'error': 'No tenés permiso para acceder a este turno'})
+        ajeno.refresh_from_db()
+        self.assertEqual(ajeno.estado, 'pendiente')
+
+        response = self.client.post(reverse('api_cancelar_turno', args=[9999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'No encontrado'})
+
+    def test_catalogos_sin_consultas_a_la_base(self):
+        self.client.get(reverse('api_medicos'))
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('api_medicos'), {'campos': 'id,coberturas', 'cobertura': self.osde.pk})
+        self.assertEqual(response.json()['resultados'], [{'id': self.medico.pk, 'coberturas': [self.osde.pk]}])
+        response = self.client.get(reverse('api_coberturas'))
+        self.assertEqual(self.client.get(reverse('api_coberturas'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_requiere_autenticacion(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_turnos')).status_code, 401)
+        self.client.force_login(User.objects.create_user('sin_rol'))
+        self.assertEqual(self.client.get(reverse('api_medicos')).status_code, 403)
+
+
+class BusquedaPacientesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.osde = Cobertura.objects.create(nombre='OSDE')
+        self.pacientes = {}
+        for dni, nombre, apellido, afiliado in [
+            ('30111222', 'José', 'Pérez', 'A-100'),
+            ('30111333', 'Ana', 'Perales', 'B-200'),
+            ('40555666', 'Luis', 'Gómez', 'A-300'),
+        ]:
+            user = User.objects.create_user(dni, first_name=nombre, last_name=apellido)
+            self.pacientes[apellido] = Paciente.objects.create(
+                user=user, dni=dni, telefono='1', domicilio='X', numero_afiliado=afiliado, cobertura=self.osde
+            )
+        self.secretaria = User.objects.create_user('secretaria', is_staff=True)
+        self.client.force_login(self.secretaria)
+
+    def buscar(self, termino):
+        return [paciente.user.last_name for paciente in buscar_pacientes(termino)]
+
+    def test_busca_por_apellido_dni_y_afiliado(self):
+        # Sin distinguir mayúsculas ni acentos, ordenados por apellido
+        self.assertEqual(self.buscar('PER'), ['Perales', 'Pérez'])
+        self.assertEqual(self.buscar('pérez jo'), ['Pérez'])
+        self.assertEqual(self.buscar('30111'), ['Perales', 'Pérez'])
+        self.assertEqual(self.buscar('A-'), ['Gómez', 'Pérez'])
+        self.assertEqual(self.buscar('p'), [])
+
+    def test_cambio_de_nombre_actualiza_la_busqueda(self):
+        user = self.pacientes['Gómez'].user
+        user.last_name = 'Álvarez'
+        user.save()
+        self.assertEqual(self.buscar('alva'), ['Álvarez'])
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('buscar_pacientes'), {'q': 'gom'})
+        self.assertEqual(response.json()['pacientes'], [{
+            'id': self.pacientes['Gómez'].pk, 'nombre': 'Luis Gómez', 'dni': '40555666',
+            'numero_afiliado': 'A-300', 'cobertura': 'OSDE',
+        }])
+        self.assertEqual(len(self.client.get(reverse('buscar_pacientes'), {'q': '30', 'limite': 1}).json()['pacientes']), 1)
+        for limite in [0, -3]:
+            response = self.client.get(reverse('buscar_pacientes'), {'q': '30', 'limite': limite})
+            self.assertEqual(len(response.json()['pacientes']), 1)
+
+        self.client.force_login(self.pacientes['Gómez'].user)
+        self.assertEqual(self.client.get(reverse('buscar_pacientes'), {'q': 'gom'}).status_code, 302)
+
+    def test_formulario_no_lista_pacientes(self):
+        response = self.client.get(reverse('crear_turno_secretaria'))
+        self.assertNotContains(response, '30111222')
+
+        medico = Medico.objects.create(nombre='Juan', apellido='Díaz', especialidad='Clínica', matricula='MN1')
+        form = TurnoSecretariaForm(data={
+            'paciente': self.pacientes['Pérez'].pk, 'medico': medico.pk, 'fecha': date.today().isoformat(),
+            'hora': '10:00', 'estado': 'pendiente'
+        })
+        with self.assertNumQueries(1):
+            # Solo el SELECT del paciente elegido, por pk
+            self.assertEqual(form.fields['paciente'].clean(self.pacientes['Pérez'].pk), self.pacientes['Pérez'])
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.paciente_elegido, self.pacientes['Pérez'])
+
+
+class BusquedaTextoTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.medico = Medico.objects.create(
+            nombre='Raúl', apellido='Núñez', especialidad='Cardiología', matricula='MN1'
+        )
+        user = User.objects.create_user('jose', first_name='José', last_name='Pérez', email='jose@example.com')
+        self.paciente = Paciente.objects.create(
+            user=user, dni='30111222', telefono='1', domicilio='X', numero_afiliado='A-100'
+        )
+        self.turno = Turno.objects.create(
+            paciente=self.paciente, medico=self.medico, fecha=date.today(), hora=time(10)
+        )
+        self.sin_registro = Turno.objects.create(
+            paciente_nombre='María Gómez', paciente_telefono='11-5555', medico=self.medico,
+            fecha=date.today(), hora=time(11)
+        )
+
+    def buscar(self, modelo, texto):
+        return set(buscar_texto(modelo.objects.all(), texto))
+
+    def test_sin_acentos_ni_mayusculas(self):
+        self.assertEqual(self.buscar(Paciente, 'PEREZ jose'), {self.paciente})
+        self.assertEqual(self.buscar(Paciente, 'pér 3011'), {self.paciente})
+        self.assertEqual(self.buscar(Paciente, 'jose@example.com'), {self.paciente})
+        self.assertEqual(self.buscar(Paciente, 'perez maria'), set())
+        self.assertEqual(self.buscar(Turno, 'nunez cardio'), {self.turno, self.sin_registro})
+        self.assertEqual(self.buscar(Turno, 'gomez'), {self.sin_registro})
+        self.assertEqual(self.buscar(Turno, '30111222'), {self.turno})
+        self.assertEqual(self.buscar(Turno, ' '), set())
+
+    def test_detecta_y_recrea_triggers_faltantes(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER turnos_turno_fts_ai')
+        errores = verificar_triggers_busqueda(None, databases=['default'])
+        self.assertEqual([error.id for error in errores], ['turnos.W001'])
+        self.assertIn('turnos_turno_fts_ai', errores[0].msg)
+
+        out = StringIO()
+        call_command('indexar_busqueda', stdout=out)
+        self.assertIn('turnos_turno_fts_ai', out.getvalue())
+        self.assertEqual(verificar_triggers_busqueda(None, databases=['default']), [])
+        nuevo = Turno.objects.create(paciente_nombre='Elsa Ibáñez', medico=self.medico, fecha=date.today(), hora=time(12))
+        self.assertEqual(self.buscar(Turno, 'ibanez'), {nuevo})
+
+    def test_se_mantiene_al_guardar(self):
+        user = self.paciente.user
+        user.last_name = 'Álvarez'
+        user.save()
+        self.assertEqual(self.buscar(Turno, 'alvarez'), {self.turno})
+        self.assertEqual(self.buscar(Paciente, 'perez'), set())
+
+        self.medico.apellido = 'Ibáñez'
+        self.medico.save()
+        self.assertEqual(self.buscar(Turno, 'ibanez'), {self.turno, self.sin_registro})
+
+        turno = Turno.objects.get(pk=self.sin_registro.pk)
+        turno.estado = 'cancelado'
+        with self.assertNumQueries(1):
+            # Un cambio de estado no vuelve a armar el documento
+            turno.save()
+
+        self.turno.delete()
+        self.assertEqual(self.buscar(Turno, 'alvarez'), set())
+
+    def test_cargas_masivas_con_indexar_busqueda(self):
+        Turno.objects.bulk_create([
+            Turno(paciente_nombre='Carlos Ruiz', medico=self.medico, fecha=date.today(), hora=time(12))
+        ])
+        self.assertEqual(self.buscar(Turno, 'ruiz'), set())
+        call_command('indexar_busqueda', stdout=StringIO())
+        self.assertEqual(len(self.buscar(Turno, 'ruiz')), 1)
+
+    def test_pagina_de_busqueda_y_admin(self):
+        secretaria = User.objects.create_superuser('secretaria', password='x')
+        self.client.force_login(secretaria)
+
+        response = self.client.get(reverse('buscar'), {'q': 'perez'})
+        self.assertEqual(list(response.context['pacientes']), [self.paciente])
+        self.assertEqual(list(response.context['turnos']), [self.turno])
+
+        response = self.client.get(reverse('admin:turnos_turno_changelist'), {'q': 'gómez'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.sin_registro])
+        response = self.client.get(reverse('admin:turnos_paciente_changelist'), {'q': '30111'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.paciente])
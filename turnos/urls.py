@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 urlpatterns = [
     # Vistas públicas
@@ -23,7 +23,25 @@ urlpatterns = [
     path('secretaria/medicos/<int:medico_id>/disponibilidad/', views.gestionar_disponibilidad_view, name='gestionar_disponibilidad'),
     path('secretaria/turnos/', views.gestionar_turnos_view, name='gestionar_turnos'),
     path('secretaria/turnos/crear/', views.crear_turno_secretaria_view, name='crear_turno_secretaria'),
+    path('secretaria/buscar/', views.buscar_view, name='buscar'),
+    path('secretaria/agenda/', views.agenda_view, name='agenda'),
+    path('secretaria/turnos/exportar/', views.exportar_turnos_view, name='exportar_turnos'),
+    path('secretaria/importar/', views.importar_csv_view, name='importar_csv'),
     
     # API endpoints
     path('api/horarios-disponibles/', views.obtener_horarios_disponibles, name='obtener_horarios'),
+    path('api/retener-horario/', views.retener_horario_view, name='retener_horario'),
+    path('api/pacientes/', views.buscar_pacientes_view, name='buscar_pacientes'),
+    path('api/proximos-horarios/', views.buscar_proximos_horarios, name='proximos_horarios'),
+    path('api/cache-horarios/', views.estadisticas_cache_horarios, name='estadisticas_cache_horarios'),
+    
+    # API asíncrona (ASGI)
+    path('api/async/horarios-disponibles/', views.obtener_horarios_disponibles_async, name='obtener_horarios_async'),
+    path('api/async/reservar-turno/', views.reservar_turno_async, name='reservar_turno_async'),
+    
+    # API v1 (JSON)
+    path('api/v1/turnos/', api.turnos_api, name='api_turnos'),
+    path('api/v1/turnos/<int:turno_id>/cancelar/', api.cancelar_turno_api, name='api_cancelar_turno'),
+    path('api/v1/medicos/', api.medicos_api, name='api_medicos'),
+    path('api/v1/coberturas/', api.coberturas_api, name='api_coberturas'),
 ]
\ No newline at end of file
@@ -1,24 +1,45 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
 from datetime import date, datetime, timedelta
-from .models import Paciente, Medico, Turno, DisponibilidadMedico, Cobertura
+from .models import Paciente, Medico, Turno, DisponibilidadMedico, ExcepcionDisponibilidad, Cobertura
 from .forms import (RegistroPacienteForm, EditarPerfilForm, TurnoForm, 
-                   MedicoForm, DisponibilidadForm, TurnoSecretariaForm)
-from .permissions import secretaria_required, paciente_required, verificar_permiso_turno
-from django.http import JsonResponse
+                   MedicoForm, DisponibilidadForm, ExcepcionDisponibilidadForm, TurnoSecretariaForm,
+                   ImportarCSVForm)
+from .permissions import (secretaria_required, paciente_required, cargar_turno,
+                          perfil_del_request, Perfil, ROL_PACIENTE, ROL_SECRETARIA)
+from .disponibilidad import (horarios_disponibles_en_cache, proximos_horarios,
+                             estadisticas_cache, horarios_disponibles_en_cache_por_medico)
+from .reservas import (reservar_turno, HorarioOcupadoError, HorarioInvalidoError, retener_horario,
+                       liberar_horarios, horas_retenidas, horas_retenidas_por_medico)
+from .paginacion import paginar_turnos
+from .importacion import (importar_pacientes, importar_turnos, leer_csv,
+                          COLUMNAS_PACIENTES, COLUMNAS_TURNOS)
+from .exportacion import filtrar_turnos, filas_csv
+from .tablero import resumen_del_dia, totales_generales
+from .agenda import armar_agenda, rango_agenda
+from .busqueda import buscar_pacientes, buscar_texto, RESULTADOS, RESULTADOS_MAXIMO
+from . import catalogo
+from .catalogo import prefetch_coberturas, prefetch_dias_atencion
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseNotAllowed
+from django.views.decorators.http import require_POST
+
+TURNOS_POR_PAGINA = 50
+RESULTADOS_BUSQUEDA = 50
 
 # ============= VISTAS PÚBLICAS =============
 
 def home(request):
     """Página de inicio - Redirige según tipo de usuario"""
-    if request.user.is_authenticated:
-        if request.user.is_staff:
-            return redirect('secretaria_dashboard')
-        elif hasattr(request.user, 'paciente'):
-            return redirect('paciente_dashboard')
+    rol = request.perfil.rol
+    if rol == ROL_SECRETARIA:
+        return redirect('secretaria_dashboard')
+    elif rol == ROL_PACIENTE:
+        return redirect('paciente_dashboard')
     
     return render(request, 'home.html')
 
@@ -78,12 +99,12 @@ def logout_view(request):
 @paciente_required
 def paciente_dashboard(request):
     """Dashboard del paciente"""
-    paciente = request.user.paciente
+    paciente = request.perfil.paciente
     turnos_futuros = Turno.objects.filter(
         paciente=paciente,
         fecha__gte=date.today(),
         estado__in=['pendiente', 'confirmado']
-    ).order_by('fecha', 'hora')[:5]
+    ).select_related('medico').order_by('fecha', 'hora')[:5]
     
     context = {
         'paciente': paciente,
@@ -95,7 +116,7 @@ def paciente_dashboard(request):
 @paciente_required
 def perfil_view(request):
     """Editar perfil del paciente"""
-    paciente = request.user.paciente
+    paciente = request.perfil.paciente
     
     if request.method == 'POST':
         form = EditarPerfilForm(request.POST, instance=paciente)
@@ -119,8 +140,8 @@ def perfil_view(request):
 @paciente_required
 def mis_turnos_view(request):
     """Ver todos los turnos del paciente"""
-    paciente = request.user.paciente
-    turnos = Turno.objects.filter(paciente=paciente).order_by('-fecha', '-hora')
+    paciente = request.perfil.paciente
+    turnos = Turno.objects.filter(paciente=paciente).select_related('medico').order_by('-fecha', '-hora')
     
     return render(request, 'paciente/mis_turnos.html', {'turnos': turnos})
 
@@ -128,7 +149,7 @@ def mis_turnos_view(request):
 @paciente_required
 def reservar_turno_view(request):
     """Reservar un nuevo turno"""
-    paciente = request.user.paciente
+    paciente = request.perfil.paciente
     
     if request.method == 'POST':
         form = TurnoForm(request.POST, paciente=paciente)
@@ -137,39 +158,29 @@ def reservar_turno_view(request):
             turno.paciente = paciente
             turno.creado_por = request.user
             
-            # Verificar que el turno no esté ocupado
-            existe = Turno.objects.filter(
-                medico=turno.medico,
-                fecha=turno.fecha,
-                hora=turno.hora,
-                estado__in=['pendiente', 'confirmado']
-            ).exists()
-            
-            if existe:
-                messages.error(request, 'Este horario ya está ocupado. Por favor elegí otro.')
-            else:
-                turno.save()
+            try:
+                if turno.hora in horas_retenidas(turno.medico_id, turno.fecha, excepto_usuario=request.user):
+                    raise HorarioOcupadoError('Este horario está siendo reservado por otro paciente.')
+                reservar_turno(turno)
+                liberar_horarios(request.user)
                 messages.success(request, '¡Turno reservado exitosamente!')
                 return redirect('mis_turnos')
+            except HorarioOcupadoError:
+                messages.error(request, 'Este horario ya está ocupado. Por favor elegí otro.')
     else:
         form = TurnoForm(paciente=paciente)
     
-    medicos = Medico.objects.filter(activo=True)
-    if paciente.cobertura:
-        medicos = medicos.filter(coberturas=paciente.cobertura)
-    
     return render(request, 'paciente/reservar_turno.html', {
         'form': form,
-        'medicos': medicos
+        'medicos': catalogo.medicos(cobertura_id=paciente.cobertura_id),
+        'cache_fichas': settings.CACHE_FICHAS_TIMEOUT
     })
 
 @login_required
 @paciente_required
-@verificar_permiso_turno
-def cancelar_turno_view(request, turno_id):
+@cargar_turno('medico')
+def cancelar_turno_view(request, turno):
     """Cancelar un turno"""
-    turno = get_object_or_404(Turno, pk=turno_id)
-    
     if not turno.puede_cancelar():
         messages.error(request, 'No podés cancelar este turno (debe ser con 24hs de anticipación).')
         return redirect('mis_turnos')
@@ -188,14 +199,14 @@ def cancelar_turno_view(request, turno_id):
 @secretaria_required
 def secretaria_dashboard(request):
     """Dashboard de la secretaria"""
-    turnos_hoy = Turno.objects.filter(fecha=date.today()).order_by('hora')
-    medicos_activos = Medico.objects.filter(activo=True).count()
-    pacientes_total = Paciente.objects.count()
+    hoy = date.today()
+    totales_hoy, medicos_hoy = resumen_del_dia(hoy)
     
     context = {
-        'turnos_hoy': turnos_hoy,
-        'medicos_activos': medicos_activos,
-        'pacientes_total': pacientes_total
+        'hoy': hoy,
+        'totales_hoy': totales_hoy,
+        'medicos_hoy': medicos_hoy,
+        **totales_generales()
     }
     return render(request, 'secretaria/dashboard.html', context)
 
@@ -203,8 +214,14 @@ def secretaria_dashboard(request):
 @secretaria_required
 def gestionar_medicos_view(request):
     """Listar y gestionar médicos"""
-    medicos = Medico.objects.all().order_by('apellido', 'nombre')
-    return render(request, 'secretaria/gestionar_medicos.html', {'medicos': medicos})
+    medicos = catalogo.cargar_fichas(
+        Medico.objects.order_by('apellido', 'nombre'), 'ficha_medico',
+        prefetch_coberturas(), prefetch_dias_atencion()
+    )
+    return render(request, 'secretaria/gestionar_medicos.html', {
+        'medicos': medicos,
+        'cache_fichas': settings.CACHE_FICHAS_TIMEOUT
+    })
 
 @login_required
 @secretaria_required
@@ -244,9 +261,12 @@ def editar_medico_view(request, medico_id):
 @login_required
 @secretaria_required
 def gestionar_disponibilidad_view(request, medico_id):
-    """Gestionar disponibilidad de un médico"""
+    """Gestionar disponibilidad y excepciones de un médico"""
     medico = get_object_or_404(Medico, pk=medico_id)
     disponibilidades = medico.disponibilidades.all()
+    excepciones = medico.excepciones.filter(fecha_hasta__gte=date.today())
+    form = DisponibilidadForm(medico=medico)
+    excepcion_form = ExcepcionDisponibilidadForm()
     
     if request.method == 'POST':
         # Verificar si es eliminación
@@ -260,28 +280,86 @@ def gestionar_disponibilidad_view(request, medico_id):
                 messages.error(request, 'No se pudo eliminar la disponibilidad.')
             return redirect('gestionar_disponibilidad', medico_id=medico.id)
         
-        # Si no, es creación
-        form = DisponibilidadForm(request.POST)
-        if form.is_valid():
-            disp = form.save(commit=False)
-            disp.medico = medico
-            disp.save()
-            messages.success(request, 'Disponibilidad agregada correctamente.')
+        if 'eliminar_excepcion' in request.POST:
+            deleted, _ = medico.excepciones.filter(pk=request.POST.get('eliminar_excepcion')).delete()
+            if deleted:
+                messages.success(request, 'Excepción eliminada correctamente.')
+            else:
+                messages.error(request, 'No se pudo eliminar la excepción.')
             return redirect('gestionar_disponibilidad', medico_id=medico.id)
-    else:
-        form = DisponibilidadForm()
+        
+        if 'agregar_excepcion' in request.POST:
+            excepcion_form = ExcepcionDisponibilidadForm(request.POST, instance=ExcepcionDisponibilidad(medico=medico))
+            if excepcion_form.is_valid():
+                excepcion_form.save()
+                messages.success(request, 'Excepción agregada correctamente.')
+                return redirect('gestionar_disponibilidad', medico_id=medico.id)
+        else:
+            # Si no, es creación
+            form = DisponibilidadForm(request.POST, medico=medico)
+            if form.is_valid():
+                disp = form.save(commit=False)
+                disp.medico = medico
+                disp.save()
+                messages.success(request, 'Disponibilidad agregada correctamente.')
+                return redirect('gestionar_disponibilidad', medico_id=medico.id)
     
     return render(request, 'secretaria/gestionar_disponibilidad.html', {
         'medico': medico,
         'disponibilidades': disponibilidades,
-        'form': form
+        'excepciones': excepciones,
+        'form': form,
+        'excepcion_form': excepcion_form
+    })
+
+@login_required
+@secretaria_required
+def buscar_view(request):
+    """Busca pacientes y turnos por nombre, DNI, afiliado o médico con el índice de texto"""
+    texto = request.GET.get('q', '').strip()
+    pacientes = turnos = []
+    if texto:
+        pacientes = buscar_texto(
+            Paciente.objects.select_related('user', 'cobertura'), texto
+        ).order_by('nombre_busqueda', 'pk')[:RESULTADOS_BUSQUEDA]
+        turnos = buscar_texto(
+            Turno.objects.select_related('paciente__user', 'medico'), texto
+        ).order_by('-fecha', '-hora', '-pk')[:RESULTADOS_BUSQUEDA]
+    
+    context = {
+        'texto': texto,
+        'pacientes': pacientes,
+        'turnos': turnos,
+        'limite': RESULTADOS_BUSQUEDA,
+    }
+    return render(request, 'secretaria/buscar.html', context)
+
+@login_required
+@secretaria_required
+def agenda_view(request):
+    """Agenda de todos los médicos activos por día o por semana"""
+    vista = 'semana' if request.GET.get('vista') == 'semana' else 'dia'
+    try:
+        fecha = datetime.strptime(request.GET.get('fecha', ''), '%Y-%m-%d').date()
+    except ValueError:
+        fecha = date.today()
+    
+    dias = rango_agenda(fecha, vista)
+    paso = timedelta(days=len(dias))
+    
+    return render(request, 'secretaria/agenda.html', {
+        'agenda': armar_agenda(dias),
+        'vista': vista,
+        'fecha': fecha,
+        'anterior': fecha - paso,
+        'siguiente': fecha + paso
     })
 
 @login_required
 @secretaria_required
 def gestionar_turnos_view(request):
     """Ver y gestionar todos los turnos"""
-    turnos = Turno.objects.all().order_by('-fecha', '-hora')
+    turnos = Turno.objects.select_related('paciente__user', 'paciente__cobertura', 'medico')
     
     # Filtros
     medico_id = request.GET.get('medico')
@@ -295,11 +373,24 @@ def gestionar_turnos_view(request):
     if estado:
         turnos = turnos.filter(estado=estado)
     
-    medicos = Medico.objects.filter(activo=True)
+    turnos, cursor_anterior, cursor_siguiente = paginar_turnos(
+        turnos,
+        despues=request.GET.get('despues'),
+        antes=request.GET.get('antes'),
+        por_pagina=TURNOS_POR_PAGINA
+    )
+    
+    # Filtros actuales para conservarlos en los links de paginación
+    filtros = request.GET.copy()
+    filtros.pop('despues', None)
+    filtros.pop('antes', None)
     
     return render(request, 'secretaria/gestionar_turnos.html', {
         'turnos': turnos,
-        'medicos': medicos
+        'medicos': catalogo.medicos(),
+        'filtros': filtros.urlencode(),
+        'cursor_anterior': cursor_anterior,
+        'cursor_siguiente': cursor_siguiente
     })
 
 @login_required
@@ -312,25 +403,63 @@ def crear_turno_secretaria_view(request):
             turno = form.save(commit=False)
             turno.creado_por = request.user
             
-            # Verificar que no esté ocupado
-            existe = Turno.objects.filter(
-                medico=turno.medico,
-                fecha=turno.fecha,
-                hora=turno.hora,
-                estado__in=['pendiente', 'confirmado']
-            ).exclude(pk=turno.pk if turno.pk else None).exists()
-            
-            if existe:
-                messages.error(request, 'Este horario ya está ocupado.')
-            else:
-                turno.save()
+            try:
+                reservar_turno(turno)
                 messages.success(request, 'Turno creado exitosamente.')
                 return redirect('gestionar_turnos')
+            except HorarioOcupadoError:
+                messages.error(request, 'Este horario ya está ocupado.')
     else:
         form = TurnoSecretariaForm()
     
     return render(request, 'secretaria/crear_turno.html', {'form': form})
 
+@login_required
+@secretaria_required
+def importar_csv_view(request):
+    """Importar pacientes o turnos desde un archivo CSV"""
+    resultado = None
+    
+    if request.method == 'POST':
+        form = ImportarCSVForm(request.POST, request.FILES)
+        if form.is_valid():
+            # Se lee el archivo subido de a líneas, sin cargarlo entero en memoria
+            filas = leer_csv(form.cleaned_data['archivo'].file)
+            if form.cleaned_data['tipo'] == 'pacientes':
+                resultado = importar_pacientes(filas)
+            else:
+                resultado = importar_turnos(filas, creado_por=request.user)
+            
+            if resultado.creados:
+                messages.success(request, f'Se importaron {resultado.creados} registros.')
+            if resultado.total_errores:
+                messages.warning(request, f'{resultado.total_errores} filas no se pudieron importar.')
+    else:
+        form = ImportarCSVForm()
+    
+    return render(request, 'secretaria/importar_csv.html', {
+        'form': form,
+        'resultado': resultado,
+        'columnas_pacientes': COLUMNAS_PACIENTES,
+        'columnas_turnos': COLUMNAS_TURNOS
+    })
+
+@login_required
+@secretaria_required
+def exportar_turnos_view(request):
+    """Exportar turnos a CSV, con los mismos filtros del listado"""
+    turnos = filtrar_turnos(
+        medico_id=request.GET.get('medico'),
+        fecha=request.GET.get('fecha'),
+        estado=request.GET.get('estado'),
+        desde=request.GET.get('desde'),
+        hasta=request.GET.get('hasta')
+    )
+    
+    response = StreamingHttpResponse(filas_csv(turnos), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="turnos_{date.today().isoformat()}.csv"'
+    return response
+
 # ============= AJAX ENDPOINTS =============
 
 @login_required
@@ -345,32 +474,206 @@ def obtener_horarios_disponibles(request):
     try:
         medico = Medico.objects.get(pk=medico_id)
         fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
-        dia_semana = fecha.weekday()
-        
-        # Obtener disponibilidad del médico para ese día
-        disponibilidades = DisponibilidadMedico.objects.filter(
-            medico=medico,
-            dia_semana=dia_semana
-        )
-        
-        horarios_disponibles = []
-        
-        for disp in disponibilidades:
-            horarios = disp.generar_horarios()
-            
-            # Filtrar horarios ya ocupados
-            for hora in horarios:
-                ocupado = Turno.objects.filter(
-                    medico=medico,
-                    fecha=fecha,
-                    hora=hora,
-                    estado__in=['pendiente', 'confirmado']
-                ).exists()
-                
-                if not ocupado:
-                    horarios_disponibles.append(hora.strftime('%H:%M'))
-        
-        return JsonResponse({'horarios': sorted(horarios_disponibles)})
+
+        horarios = horarios_disponibles_en_cache(medico.pk, fecha)
+        retenidas = horas_retenidas(medico.pk, fecha, excepto_usuario=request.user)
+
+        return JsonResponse({'horarios': [hora.strftime('%H:%M') for hora in horarios if hora not in retenidas]})
     
     except Exception as e:
-        return JsonResponse({'error': str(e)}, status=400)
\ No newline at end of file
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+@secretaria_required
+def buscar_pacientes_view(request):
+    """Endpoint AJAX del autocompletar de pacientes: busca por DNI, apellido o afiliado (`q`)"""
+    try:
+        limite = max(1, min(int(request.GET.get('limite', RESULTADOS)), RESULTADOS_MAXIMO))
+    except ValueError:
+        limite = RESULTADOS
+    pacientes = buscar_pacientes(request.GET.get('q'), limite)
+    return JsonResponse({'pacientes': [
+        {
+            'id': paciente.pk,
+            'nombre': paciente.nombre_completo,
+            'dni': paciente.dni,
+            'numero_afiliado': paciente.numero_afiliado,
+            'cobertura': paciente.cobertura.nombre if paciente.cobertura else None,
+        }
+        for paciente in pacientes
+    ]})
+
+@login_required
+@paciente_required
+@require_POST
+def retener_horario_view(request):
+    """Endpoint AJAX para retener un horario mientras el paciente completa la reserva"""
+    medico_id = request.POST.get('medico_id')
+    fecha_str = request.POST.get('fecha')
+    hora_str = request.POST.get('hora')
+    
+    if not medico_id or not fecha_str or not hora_str:
+        return JsonResponse({'error': 'Faltan parámetros'}, status=400)
+    
+    try:
+        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        hora = datetime.strptime(hora_str, '%H:%M').time()
+        expira = retener_horario(int(medico_id), fecha, hora, request.user)
+        return JsonResponse({'expira': expira.isoformat()})
+    
+    except HorarioOcupadoError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    except (HorarioInvalidoError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+@login_required
+def buscar_proximos_horarios(request):
+    """Endpoint AJAX para buscar los primeros horarios libres entre varios médicos"""
+    especialidad = request.GET.get('especialidad')
+    cobertura_id = request.GET.get('cobertura_id')
+    
+    if not especialidad and not cobertura_id:
+        return JsonResponse({'error': 'Faltan parámetros'}, status=400)
+    
+    try:
+        desde = date.today()
+        if request.GET.get('desde'):
+            desde = max(desde, datetime.strptime(request.GET['desde'], '%Y-%m-%d').date())
+        dias = max(1, min(int(request.GET.get('dias', 30)), 90))
+        cantidad = max(1, min(int(request.GET.get('cantidad', 10)), 50))
+        cobertura_id = int(cobertura_id) if cobertura_id else None
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    medicos = Medico.objects.filter(activo=True)
+    if especialidad:
+        medicos = medicos.filter(especialidad__iexact=especialidad)
+    if cobertura_id:
+        medicos = medicos.filter(coberturas=cobertura_id)
+    medicos = {medico.pk: medico for medico in medicos}
+    
+    horarios = proximos_horarios(
+        medicos.values(), desde, desde + timedelta(days=dias - 1), cantidad, excepto_usuario=request.user
+    )
+    
+    return JsonResponse({'horarios': [
+        {
+            'medico_id': medico_id,
+            'medico': medicos[medico_id].nombre_completo,
+            'especialidad': medicos[medico_id].especialidad,
+            'fecha': fecha.isoformat(),
+            'hora': hora.strftime('%H:%M'),
+        }
+        for fecha, hora, medico_id in horarios
+    ]})
+
+
+@login_required
+@secretaria_required
+def estadisticas_cache_horarios(request):
+    """Endpoint con aciertos y fallos del cache de horarios, para dimensionarlo"""
+    return JsonResponse(estadisticas_cache())
+
+# ============= ASYNC ENDPOINTS =============
+# Versiones asíncronas para correr bajo ASGI (consultorio/asgi.py). Django 4.2 no tiene
+# decoradores de login asíncronos, así que el usuario se resuelve con _ausuario.
+
+MEDICOS_POR_CONSULTA = 20
+
+async def _ausuario(request):
+    """Usuario autenticado del request, o None; la sesión se lee fuera del event loop"""
+    return await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+
+async def _aperfil(request):
+    """Perfil del request (ver PerfilMiddleware) resuelto fuera del event loop"""
+    return await sync_to_async(lambda: Perfil(*perfil_del_request(request)))()
+
+def _horarios_libres(medico_ids, fecha, usuario):
+    """Horarios libres de cada médico sin los retenidos por otros usuarios, como {medico_id: horas}"""
+    horarios = horarios_disponibles_en_cache_por_medico(medico_ids, fecha)
+    retenidas = horas_retenidas_por_medico(medico_ids, fecha, excepto_usuario=usuario)
+    return {pk: [hora for hora in horarios[pk] if hora not in retenidas[pk]] for pk in medico_ids}
+
+async def obtener_horarios_disponibles_async(request):
+    """
+    Versión asíncrona de obtener_horarios_disponibles. Acepta varios médicos separados
+    por coma en `medico_id` y los resuelve juntos, con las mismas consultas que uno solo.
+    En Django 4.2 el ORM y el cache asíncronos pasan todos por el mismo hilo de
+    sync_to_async, así que repartir los médicos en varias corrutinas no los superpone:
+    se calculan en un único salto a ese hilo.
+    """
+    usuario = await _ausuario(request)
+    if usuario is None:
+        return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+    
+    medico_id = request.GET.get('medico_id')
+    fecha_str = request.GET.get('fecha')
+    
+    if not medico_id or not fecha_str:
+        return JsonResponse({'error': 'Faltan parámetros'}, status=400)
+    
+    try:
+        medico_ids = list(dict.fromkeys(int(pk) for pk in medico_id.split(',')))[:MEDICOS_POR_CONSULTA]
+        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    existentes = {pk async for pk in Medico.objects.filter(pk__in=medico_ids).values_list('pk', flat=True)}
+    if len(existentes) != len(medico_ids):
+        return JsonResponse({'error': 'Médico inexistente'}, status=400)
+    
+    libres = await sync_to_async(_horarios_libres)(medico_ids, fecha, usuario)
+    horarios = {str(pk): [hora.strftime('%H:%M') for hora in libres[pk]] for pk in medico_ids}
+    
+    if len(medico_ids) == 1:
+        return JsonResponse({'horarios': horarios[str(medico_ids[0])]})
+    return JsonResponse({'medicos': horarios})
+
+async def reservar_turno_async(request):
+    """
+    Reserva asíncrona de un turno para el paciente logueado. A diferencia del formulario,
+    verifica que la hora esté entre los horarios libres del médico. Django 4.2 no tiene
+    transacciones asíncronas, así que la inserción corre en un hilo con reservar_turno.
+    """
+    if request.method != 'POST':
+        return HttpResponseNotAllowed(['POST'])
+    
+    usuario = await _ausuario(request)
+    if usuario is None:
+        return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+    perfil = await _aperfil(request)
+    if perfil.rol != ROL_PACIENTE:
+        return JsonResponse({'error': 'Solo pacientes'}, status=403)
+    paciente = perfil.paciente
+    
+    try:
+        medico = await Medico.objects.aget(pk=int(request.POST.get('medico_id', '')), activo=True)
+        fecha = datetime.strptime(request.POST.get('fecha', ''), '%Y-%m-%d').date()
+        hora = datetime.strptime(request.POST.get('hora', ''), '%H:%M').time()
+    except (ValueError, Medico.DoesNotExist):
+        return JsonResponse({'error': 'Médico, fecha u hora inválidos'}, status=400)
+    
+    if datetime.combine(fecha, hora) <= datetime.now():
+        return JsonResponse({'error': 'El horario ya pasó'}, status=400)
+    if paciente.cobertura_id and not await medico.coberturas.filter(pk=paciente.cobertura_id).aexists():
+        return JsonResponse({'error': 'El médico no atiende tu cobertura'}, status=400)
+    
+    libres = await sync_to_async(_horarios_libres)([medico.pk], fecha, usuario)
+    if hora not in libres[medico.pk]:
+        return JsonResponse({'error': 'Este horario ya está ocupado. Por favor elegí otro.'}, status=409)
+    
+    turno = Turno(
+        paciente=paciente,
+        medico=medico,
+        fecha=fecha,
+        hora=hora,
+        motivo=request.POST.get('motivo', ''),
+        creado_por=usuario
+    )
+    try:
+        await sync_to_async(reservar_turno)(turno)
+    except HorarioOcupadoError as e:
+        return JsonResponse({'error': str(e)}, status=409)
+    await sync_to_async(liberar_horarios)(usuario)
+    
+    return JsonResponse({'turno_id': turno.pk, 'fecha': fecha.isoformat(), 'hora': hora.strftime('%H:%M')}, status=201)